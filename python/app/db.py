@@ -0,0 +1,154 @@
+"""
+Access to the Science Database.
+
+The Web Manager uses a single aiomysql connection pool per worker process, which is
+created when it is first needed. The database is configured with the settings in
+`app.settings.DatabaseSettings`.
+
+aiomysql is slow to import, and so it is only imported when it is needed. Use the
+aliases `Pool` and `Connection` rather than the aiomysql classes in annotations.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from app.settings import DatabaseSettings
+
+# aliases for the aiomysql connection and pool classes, which are untyped
+Connection = Any
+Pool = Any
+
+_pool: Optional[Pool] = None
+_pool_lock: Optional[asyncio.Lock] = None
+
+# number of coroutines waiting for a connection from the pool
+_waiting = 0
+
+
+async def get_pool() -> Pool:
+    """Get the connection pool for the Science Database."""
+    global _pool, _pool_lock
+
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            import aiomysql
+
+            settings = DatabaseSettings()
+            _pool = await aiomysql.create_pool(
+                host=settings.sdb_host,
+                db=settings.sdb_database,
+                user=settings.sdb_username,
+                password=settings.sdb_password,
+                minsize=settings.sdb_pool_min_size,
+                maxsize=settings.sdb_pool_max_size,
+                charset="utf8",
+                autocommit=True,
+            )
+    return _pool
+
+
+async def close_pool() -> None:
+    """Close the connection pool, if it has been created."""
+    global _pool
+
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+async def acquire(pool: Pool) -> Connection:
+    """Acquire a connection from a pool, keeping track of the waiting coroutines."""
+    global _waiting
+
+    _waiting += 1
+    try:
+        return await pool.acquire()
+    finally:
+        _waiting -= 1
+
+
+def pool_stats() -> Optional[Dict[str, int]]:
+    """
+    Return the number of connections in use and the number of waiting coroutines.
+
+    None is returned if the connection pool hasn't been created yet.
+    """
+    if _pool is None:
+        return None
+    return {
+        "size": _pool.size,
+        "max_size": _pool.maxsize,
+        "in_use": _pool.size - _pool.freesize,
+        "waiting": _waiting,
+    }
+
+
+async def fetch_all(
+    pool: Pool, sql: str, args: Sequence[Any] = ()
+) -> Sequence[Tuple[Any, ...]]:
+    """Execute a query and return all result rows."""
+    connection = await acquire(pool)
+    try:
+        async with connection.cursor() as cur:
+            await cur.execute(sql, args)
+            return await cur.fetchall()  # type: ignore
+    finally:
+        pool.release(connection)
+
+
+async def stream_rows(
+    pool: Pool, sql: str, args: Sequence[Any] = (), batch_size: int = 1000
+) -> AsyncIterator[Sequence[Tuple[Any, ...]]]:
+    """
+    Execute a query and yield the result rows in batches.
+
+    An unbuffered server-side cursor is used, so that rows are read from the server
+    as they are consumed, and memory usage does not depend on the size of the result.
+
+    If the iteration is stopped before all rows have been read (for example, because
+    a client disconnected), the connection is closed rather than returned to the pool,
+    as otherwise the remaining rows would have to be read first.
+    """
+    from aiomysql import SSCursor
+
+    connection = await acquire(pool)
+    finished = False
+    try:
+        cursor = await connection.cursor(SSCursor)
+        await cursor.execute(sql, args)
+        while True:
+            rows = await cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+        await cursor.close()
+        finished = True
+    finally:
+        if not finished:
+            connection.close()
+        pool.release(connection)
+
+
+async def checksum_tables(
+    pool: Pool, tables: Sequence[str]
+) -> Dict[str, Optional[int]]:
+    """
+    Return the checksums of tables.
+
+    The checksum of a table changes whenever its content changes. Computing it
+    requires a table scan (unless the table maintains a live checksum), so this
+    should only be used for small tables. The checksum is None for a table which
+    does not exist.
+    """
+    if not tables:
+        return {}
+    for table in tables:
+        if not table.replace("_", "").isalnum():
+            raise ValueError(f"Invalid table name: {table}")
+    rows = await fetch_all(pool, "CHECKSUM TABLE " + ", ".join(tables))
+    # the returned table names are qualified with the database name
+    return {name.split(".")[-1]: checksum for name, checksum in rows}
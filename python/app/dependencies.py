@@ -1,9 +1,78 @@
 from functools import lru_cache
+from typing import Awaitable, Callable, Optional
 
+from fastapi import Cookie, Depends, HTTPException
+from starlette import status
+
+from app.models.permission import Permission
+from app.models.principal import Principal
 from app.settings import Settings
+from app.util import auth
+from app.util.auth import OAuth2TokenOrCookiePasswordBearer
 
 
 @lru_cache()  # for performance reasons, as the function is called for every request
 def get_settings() -> Settings:
     """Get the Web Manager settings."""
     return Settings()
+
+
+# auto_error is False, as a session cookie may be used instead of a token
+oauth2_scheme = OAuth2TokenOrCookiePasswordBearer(
+    tokenUrl="/api/token", auto_error=False
+)
+
+
+def get_authenticated_user(
+    token: Optional[str] = Depends(oauth2_scheme),
+    session: Optional[str] = Cookie(None, alias=auth.SESSION_COOKIE),
+    settings: Settings = Depends(get_settings),
+) -> Principal:
+    """
+    Get the user making the request, or raise a 401 error.
+
+    The user is authenticated with the session cookie, if there is one. Otherwise,
+    or if the session is invalid, the bearer token is used.
+    """
+    if session:
+        try:
+            return auth.get_current_user_from_session(session)
+        except HTTPException:
+            if token is None:
+                raise
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return auth.get_current_user(settings.secret_key, token)
+
+
+@lru_cache()  # so that routes requiring the same permission share a dependency
+def require_permission(permission: Permission) -> Callable[..., Awaitable[Principal]]:
+    """
+    Return a dependency for getting a user with a permission.
+
+    The dependency raises a 401 error if the user is not authenticated, and a 403
+    error if the user lacks the permission. The permission is checked against the
+    permissions of the authenticated user, without any database access.
+
+    Parameters
+    ----------
+    permission:
+        The required permission. Use the | operator to require several permissions.
+
+    """
+
+    async def get_permitted_user(
+        user: Principal = Depends(get_authenticated_user),
+    ) -> Principal:
+        if not user.has_permission(permission):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You are not allowed to access this resource.",
+            )
+        return user
+
+    return get_permitted_user
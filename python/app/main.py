@@ -1,7 +1,94 @@
+import asyncio
+from logging.handlers import QueueListener
+from typing import List
+
 from fastapi import FastAPI
 
+from app.db import close_pool
+from app.dependencies import get_settings
+from app.middleware.concurrency import ConcurrencyLimitMiddleware
+from app.middleware.response import ETagCompressionMiddleware
+from app.responses import FastJSONResponse
 from app.routers.api import router as api_router
+from app.routers.health import router as health_router
+from app.routers.investigators import router as investigators_router
+from app.routers.status import router as status_router
+from app.routers.targets import router as targets_router
+from app.service.reference import get_reference_data_cache
+from app.settings import CacheSettings, SessionSettings
+from app.util import auth
+from app.util.health import get_event_loop_lag_probe
+from app.util.log import (
+    RequestLoggingMiddleware,
+    configure_logging,
+    get_request_sampler,
+)
+from app.util.read_through import probe_for_changes
+from app.util.session import collect_garbage, get_session_store
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
-app = FastAPI()
+app.add_middleware(ETagCompressionMiddleware)
+# added last, so that excess requests are rejected before any other processing
+app.add_middleware(ConcurrencyLimitMiddleware)
+# outermost, so that every request (including rejected ones) has a request id
+app.add_middleware(RequestLoggingMiddleware, sampler=get_request_sampler())
 
 app.include_router(api_router)
+app.include_router(health_router)
+app.include_router(investigators_router)
+app.include_router(status_router)
+app.include_router(targets_router)
+
+_background_tasks: List["asyncio.Task[None]"] = []
+
+_log_listeners: List[QueueListener] = []
+
+
+@app.on_event("startup")
+async def start_logging() -> None:
+    _log_listeners.append(configure_logging())
+
+
+@app.on_event("shutdown")
+async def stop_logging() -> None:
+    while _log_listeners:
+        _log_listeners.pop().stop()
+
+
+@app.on_event("startup")
+async def start_background_tasks() -> None:
+    interval = SessionSettings().session_garbage_collection_interval
+    _background_tasks.append(
+        asyncio.create_task(collect_garbage(get_session_store(), interval))
+    )
+    probe_interval = CacheSettings().reference_data_probe_interval
+    _background_tasks.append(
+        asyncio.create_task(
+            probe_for_changes(get_reference_data_cache(), probe_interval)
+        )
+    )
+    _background_tasks.append(asyncio.create_task(get_event_loop_lag_probe().run()))
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks() -> None:
+    while _background_tasks:
+        _background_tasks.pop().cancel()
+
+
+@app.on_event("shutdown")
+async def close_database_pool() -> None:
+    await close_pool()
+
+
+def preload() -> None:
+    """
+    Initialise the settings and the authentication backends.
+
+    In preload mode (see gunicorn.conf.py) this function is called once in the master
+    process, so that all the worker processes forked from it share the initialised
+    state instead of creating it themselves.
+    """
+    get_settings()
+    auth.preload()
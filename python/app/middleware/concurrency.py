@@ -0,0 +1,267 @@
+"""
+Middleware for load shedding.
+
+Without a limit, an overloaded worker accepts every request, and the queue in front
+of Starlette's threadpool grows until all requests time out. The
+`ConcurrencyLimitMiddleware` instead limits the number of requests handled
+concurrently, and rejects excess requests right away with a 503 (Service
+Unavailable) response and a Retry-After header.
+
+Requests are grouped by route (see `RouteLimit`), and every group has its own limit,
+so that a low limit can be used for expensive requests such as logins, which hash a
+password with bcrypt, while cheap reads have a high limit.
+
+The limits adapt to the observed latency with an AIMD (additive increase,
+multiplicative decrease) algorithm: if the time until the response starts exceeds
+the group's target latency, the limit is multiplied by a backoff factor (at most once
+per target latency). Otherwise, if at least half of the limit is in use, the limit is
+increased by one per limit's worth of requests. A limit never exceeds its configured
+maximum or drops below its minimum.
+"""
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.settings import ConcurrencySettings
+
+
+@dataclass(frozen=True)
+class RouteLimit:
+    """
+    A concurrency limit for a group of routes.
+
+    Parameters
+    ----------
+    name:
+        The name of the route group.
+    path_prefix:
+        The path prefix of the routes.
+    max_limit:
+        The maximum (and initial) concurrency limit.
+    target_latency:
+        The time (in seconds) until the response starts above which the limit is
+        decreased.
+    min_limit:
+        The minimum concurrency limit.
+    methods:
+        The HTTP methods of the routes. All methods match if this is None.
+
+    """
+
+    name: str
+    path_prefix: str
+    max_limit: int
+    target_latency: float
+    min_limit: int = 1
+    methods: Optional[FrozenSet[str]] = None
+
+    def matches(self, method: str, path: str) -> bool:
+        """Check whether a request matches the route group."""
+        if self.methods is not None and method not in self.methods:
+            return False
+        return path.startswith(self.path_prefix)
+
+
+class AdaptiveLimit:
+    """
+    An AIMD concurrency limit.
+
+    Parameters
+    ----------
+    route:
+        The route group the limit is for.
+    backoff:
+        The factor by which the limit is multiplied if the latency is too high.
+
+    """
+
+    def __init__(self, route: RouteLimit, backoff: float = 0.9) -> None:
+        self.route = route
+        self.backoff = backoff
+        self.limit = float(route.max_limit)
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.decreases = 0
+        self.average_latency: Optional[float] = None
+        self._last_decrease = 0.0
+
+    def try_acquire(self) -> bool:
+        """Take a slot, if the limit allows it."""
+        if self.in_flight >= int(self.limit):
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        self.accepted += 1
+        return True
+
+    def release(self, latency: Optional[float]) -> None:
+        """
+        Release a slot and adjust the limit.
+
+        The limit is not adjusted if the latency is None (for example, because the
+        request failed).
+        """
+        if latency is not None:
+            self._adjust(latency, time.monotonic())
+        self.in_flight -= 1
+
+    def _adjust(self, latency: float, now: float) -> None:
+        if self.average_latency is None:
+            self.average_latency = latency
+        else:
+            self.average_latency = 0.9 * self.average_latency + 0.1 * latency
+
+        route = self.route
+        if latency > route.target_latency:
+            if now - self._last_decrease >= route.target_latency:
+                self.limit = max(float(route.min_limit), self.limit * self.backoff)
+                self._last_decrease = now
+                self.decreases += 1
+        elif self.in_flight >= self.limit / 2:
+            self.limit = min(float(route.max_limit), self.limit + 1 / self.limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current limit and the request counts."""
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.route.min_limit,
+            "max_limit": self.route.max_limit,
+            "in_flight": self.in_flight,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "decreases": self.decreases,
+            "average_latency": self.average_latency,
+        }
+
+
+class ConcurrencyLimiter:
+    """
+    Concurrency limits for route groups.
+
+    A request is counted against the limit of the first matching route group. Requests
+    matching none of the route groups (or with a path starting with one of the exempt
+    prefixes) are not limited.
+
+    Parameters
+    ----------
+    routes:
+        The route groups.
+    exempt_prefixes:
+        Path prefixes of routes which are never limited, such as status endpoints.
+
+    """
+
+    def __init__(
+        self,
+        routes: Sequence[RouteLimit],
+        exempt_prefixes: Sequence[str] = ("/status/", "/health/"),
+    ) -> None:
+        self.limits: List[AdaptiveLimit] = [AdaptiveLimit(route) for route in routes]
+        self.exempt_prefixes = tuple(exempt_prefixes)
+
+    def limit_for(self, method: str, path: str) -> Optional[AdaptiveLimit]:
+        """Return the limit for a request, or None if the request isn't limited."""
+        if path.startswith(self.exempt_prefixes):
+            return None
+        for limit in self.limits:
+            if limit.route.matches(method, path):
+                return limit
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the statistics of all limits, keyed by route group name."""
+        return {limit.route.name: limit.stats() for limit in self.limits}
+
+
+@lru_cache()
+def get_concurrency_limiter() -> ConcurrencyLimiter:
+    """Get the concurrency limiter used by the Web Manager."""
+    settings = ConcurrencySettings()
+    return ConcurrencyLimiter(
+        [
+            RouteLimit(
+                name="login",
+                path_prefix="/api/token",
+                max_limit=settings.login_concurrency_limit,
+                target_latency=settings.login_target_latency,
+            ),
+            RouteLimit(
+                name="session_login",
+                path_prefix="/api/session",
+                methods=frozenset(["POST"]),
+                max_limit=settings.login_concurrency_limit,
+                target_latency=settings.login_target_latency,
+            ),
+            RouteLimit(
+                name="default",
+                path_prefix="/",
+                max_limit=settings.concurrency_limit,
+                target_latency=settings.target_latency,
+                min_limit=max(1, settings.concurrency_limit // 10),
+            ),
+        ]
+    )
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    ASGI middleware rejecting requests which exceed a concurrency limit.
+
+    Parameters
+    ----------
+    app:
+        The ASGI application.
+    limiter:
+        The concurrency limits.
+    retry_after:
+        The value (in seconds) of the Retry-After header of 503 responses.
+
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        retry_after: int = 1,
+    ) -> None:
+        self.app = app
+        self.limiter = limiter if limiter is not None else get_concurrency_limiter()
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limiter.limit_for(scope["method"], scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not limit.try_acquire():
+            response = JSONResponse(
+                {"detail": "The server is overloaded. Please try again later."},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.monotonic()
+        latency: Optional[float] = None
+
+        async def timing_send(message: Message) -> None:
+            nonlocal latency
+            if message["type"] == "http.response.start":
+                latency = time.monotonic() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timing_send)
+        finally:
+            limit.release(latency)
@@ -0,0 +1,266 @@
+"""
+Middleware for conditional GET requests and response compression.
+
+Responses with a known length are buffered, so that a strong ETag can be computed
+from their content. If the request has an If-None-Match header matching that ETag, an
+empty 304 (Not Modified) response without entity headers is returned instead.
+Otherwise the response body is compressed with gzip, provided the client accepts the
+encoding and the body is large enough.
+
+Streaming responses (i.e. responses without a Content-Length header) and responses
+larger than a maximum size are passed on unchanged, so that they are never held in
+memory as a whole.
+"""
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+class CompressionCache:
+    """
+    A size-bounded LRU cache for compressed response bodies.
+
+    The cache is keyed by content hash and encoding, so that an asset is compressed
+    only once, no matter how often it is requested.
+
+    Parameters
+    ----------
+    max_bytes:
+        The maximum total size of the cached bodies, in bytes.
+
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._size = 0
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    def get(self, content_hash: str, encoding: str) -> Optional[bytes]:
+        key = (content_hash, encoding)
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def put(self, content_hash: str, encoding: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        key = (content_hash, encoding)
+        if key in self._entries:
+            return
+        self._entries[key] = body
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _parse_entity_tags(header: str) -> List[str]:
+    """Parse an If-None-Match header value into a list of (strong) entity tags."""
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    """Return the encodings listed in an Accept-Encoding header, ignoring q=0."""
+    encodings = []
+    for item in header.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        if not parts[0]:
+            continue
+        if any(p.replace(" ", "") in ("q=0", "q=0.0", "q=0.00") for p in parts[1:]):
+            continue
+        encodings.append(parts[0].lower())
+    return encodings
+
+
+# Headers describing the response body, which a 304 response must not include (with
+# the exception of Content-Location)
+_ENTITY_HEADERS = (
+    "content-encoding",
+    "content-language",
+    "content-length",
+    "content-md5",
+    "content-range",
+    "content-type",
+    "last-modified",
+)
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    # mtime=0 makes the output deterministic
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class ETagCompressionMiddleware:
+    """
+    ASGI middleware adding ETags, conditional GET support and compression.
+
+    Parameters
+    ----------
+    app:
+        The ASGI application.
+    minimum_size:
+        The minimum body size (in bytes) for which responses are compressed.
+    maximum_size:
+        The maximum body size (in bytes) for which responses are buffered. Larger
+        responses get neither an ETag nor compression.
+    immutable_prefixes:
+        Path prefixes of immutable assets. The compressed bodies of responses for
+        these paths (and of responses with an immutable Cache-Control directive) are
+        cached.
+    cache:
+        The cache for compressed bodies.
+
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        maximum_size: int = 4 * 1024 * 1024,
+        immutable_prefixes: Sequence[str] = ("/static/",),
+        cache: Optional[CompressionCache] = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.maximum_size = maximum_size
+        self.immutable_prefixes = tuple(immutable_prefixes)
+        self.cache = cache if cache is not None else CompressionCache()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        start_message: Message = {}
+        body_parts: List[bytes] = []
+        passthrough = False
+
+        async def buffering_send(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (
+                    "content-length" not in headers
+                    or "content-encoding" in headers
+                    or int(headers["content-length"]) > self.maximum_size
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough:
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            await self._send_response(
+                scope, request_headers, start_message, b"".join(body_parts), send
+            )
+
+        await self.app(scope, receive, buffering_send)
+
+    async def _send_response(
+        self,
+        scope: Scope,
+        request_headers: Headers,
+        start_message: Message,
+        body: bytes,
+        send: Send,
+    ) -> None:
+        headers = MutableHeaders(raw=start_message["headers"])
+        status = start_message["status"]
+        cacheable = scope["method"] == "GET" and status == 200
+
+        content_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+        encoding = self._choose_encoding(request_headers, headers, body)
+        if encoding:
+            headers.add_vary_header("Accept-Encoding")
+
+        if cacheable:
+            if "etag" not in headers:
+                suffix = f"-{encoding}" if encoding else ""
+                headers["ETag"] = f'"{content_hash}{suffix}"'
+            if_none_match = request_headers.get("if-none-match")
+            if if_none_match and self._etag_matches(if_none_match, headers["etag"]):
+                for name in _ENTITY_HEADERS:
+                    del headers[name]
+                await send({**start_message, "status": 304})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        if encoding:
+            body = self._compressed_body(scope, headers, content_hash, body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+
+        await send(start_message)
+        await send({"type": "http.response.body", "body": body})
+
+    def _choose_encoding(
+        self, request_headers: Headers, response_headers: Headers, body: bytes
+    ) -> Optional[str]:
+        if len(body) < self.minimum_size:
+            return None
+        content_type = response_headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return None
+        accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compressed_body(
+        self,
+        scope: Scope,
+        headers: Headers,
+        content_hash: str,
+        body: bytes,
+        encoding: str,
+    ) -> bytes:
+        immutable = "immutable" in headers.get("cache-control", "") or scope[
+            "path"
+        ].startswith(self.immutable_prefixes)
+        if not immutable:
+            return _compress(body, encoding)
+
+        compressed = self.cache.get(content_hash, encoding)
+        if compressed is None:
+            compressed = _compress(body, encoding)
+            self.cache.put(content_hash, encoding, compressed)
+        return compressed
+
+    @staticmethod
+    def _etag_matches(if_none_match: str, etag: str) -> bool:
+        tags = _parse_entity_tags(if_none_match)
+        if etag.startswith("W/"):
+            etag = etag[2:]
+        return "*" in tags or etag in tags
@@ -0,0 +1,62 @@
+"""
+Roles and permissions.
+
+A user's permissions are derived from the user's roles when the user logs in, and
+they are embedded in the access token as a bitmap (see `Permission`), so that
+authorisation decisions need no database access.
+
+The bits of the permissions must never be reused or reassigned, as tokens issued
+before a change would otherwise grant different permissions. New permissions must
+use new bits.
+"""
+from enum import Enum, IntFlag
+from typing import Dict, Iterable
+
+
+class Permission(IntFlag):
+    """Permissions, which can be combined with the | operator."""
+
+    NONE = 0
+    VIEW_INVESTIGATORS = 1
+    VIEW_TARGETS = 2
+    EXPORT_DATA = 4
+    VIEW_ALL_PROPOSALS = 8
+    MANAGE_USERS = 16
+
+
+class Role(str, Enum):
+    """User roles."""
+
+    INVESTIGATOR = "investigator"
+    SALT_ASTRONOMER = "salt_astronomer"
+    TAC_MEMBER = "tac_member"
+    ADMINISTRATOR = "administrator"
+
+
+# The permissions granted by each role. Investigator details (such as email addresses)
+# and bulk exports are only available to SALT staff.
+ROLE_PERMISSIONS: Dict[Role, Permission] = {
+    Role.INVESTIGATOR: Permission.VIEW_TARGETS,
+    Role.SALT_ASTRONOMER: (
+        Permission.VIEW_INVESTIGATORS
+        | Permission.VIEW_TARGETS
+        | Permission.EXPORT_DATA
+        | Permission.VIEW_ALL_PROPOSALS
+    ),
+    Role.TAC_MEMBER: Permission.VIEW_TARGETS | Permission.VIEW_ALL_PROPOSALS,
+    Role.ADMINISTRATOR: (
+        Permission.VIEW_INVESTIGATORS
+        | Permission.VIEW_TARGETS
+        | Permission.EXPORT_DATA
+        | Permission.VIEW_ALL_PROPOSALS
+        | Permission.MANAGE_USERS
+    ),
+}
+
+
+def permissions_for_roles(roles: Iterable[Role]) -> Permission:
+    """Return the combined permissions of roles."""
+    permissions = Permission.NONE
+    for role in roles:
+        permissions |= ROLE_PERMISSIONS[role]
+    return permissions
@@ -0,0 +1,25 @@
+"""
+The principal making a request.
+
+Authentication happens on every request, and so the authenticated user is
+represented by a frozen dataclass with slots rather than a pydantic model. Creating
+it requires neither a dictionary nor any validation, and its attributes cannot be
+changed accidentally while a request is handled.
+"""
+from dataclasses import dataclass
+
+from app.models.permission import Permission
+
+
+@dataclass(frozen=True)
+class Principal:
+    """An authenticated user and the user's permissions."""
+
+    __slots__ = ("username", "permissions")
+
+    username: str
+    permissions: Permission
+
+    def has_permission(self, permission: Permission) -> bool:
+        """Check whether the user has a permission (or all of several ones)."""
+        return self.permissions & permission == permission
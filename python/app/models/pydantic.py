@@ -1,3 +1,6 @@
+from datetime import date, datetime
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
@@ -12,3 +15,44 @@ class User(BaseModel):
 
 class UserInDB(User):
     hashed_password: str
+
+
+class Investigator(BaseModel):
+    id: int
+    first_name: str
+    surname: str
+    email: Optional[str]
+
+
+class InvestigatorPage(BaseModel):
+    items: List[Investigator]
+    next_cursor: Optional[int]
+
+
+class Target(BaseModel):
+    id: int
+    name: str
+    ra: float
+    dec: float
+
+
+class TargetPage(BaseModel):
+    items: List[Target]
+    next_cursor: Optional[int]
+
+
+class VisibilityWindow(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class Semester(BaseModel):
+    year: int
+    semester: int
+    start: date
+    end: date
+
+
+class Partner(BaseModel):
+    code: str
+    name: str
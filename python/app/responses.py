@@ -0,0 +1,58 @@
+"""
+Fast JSON responses.
+
+`FastJSONResponse` is the default response class of the Web Manager. It serialises
+content with orjson, which is considerably faster than the standard library's json
+module, in particular for large lists.
+
+FastAPI always passes the return value of a route through `jsonable_encoder` before
+rendering it. This is avoided if a route returns a `FastJSONResponse` directly, as
+pydantic models are then serialised without the intermediate walk through the whole
+data structure:
+
+```python
+@router.get("/api/targets", response_model=List[Target])
+def targets() -> FastJSONResponse:
+    return FastJSONResponse(get_targets())
+```
+
+Note that in this case the content is not validated against the response model.
+
+Pydantic models are serialised from their field values, without copying them with
+`dict()` first. Field aliases and custom JSON encoders of models are thus ignored.
+Dictionary keys need not be strings; other keys (such as integers) are converted to
+strings, as with the standard library's json module.
+"""
+import datetime
+import decimal
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+def _default(obj: Any) -> Any:
+    """Convert objects which orjson cannot serialise natively."""
+    if isinstance(obj, BaseModel):
+        # the field values; nested models are passed to this function in turn
+        return obj.__dict__
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialise content as JSON."""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
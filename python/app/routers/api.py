@@ -1,13 +1,18 @@
 from datetime import timedelta
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Cookie, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette import status
+from starlette.responses import Response
 
 from app.dependencies import get_settings
 from app.models.pydantic import AccessToken
-from app.settings import Settings
+from app.responses import FastJSONResponse
+from app.service import user as user_service
+from app.settings import SessionSettings, Settings
 from app.util import auth
+from app.util.session import get_session_settings, get_session_store
 
 ACCESS_TOKEN_LIFETIME_HOURS = 24
 
@@ -24,7 +29,7 @@ router = APIRouter()
 def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     settings: Settings = Depends(get_settings),
-) -> AccessToken:
+) -> FastJSONResponse:
     """
     Request an authentication token.
 
@@ -37,7 +42,8 @@ def login_for_access_token(
 
     The token is effectively a password; so keep it safe and don't share it.
 
-    Note that the token expires 24 hours after being issued.
+    Note that the token expires 24 hours after being issued. It also becomes invalid
+    if your permissions change, in which case you have to request a new token.
     """
     user = auth.authenticate_user(form_data.username, form_data.password)
     if user is None:
@@ -47,11 +53,79 @@ def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # the permissions are read after the version, so that a change in between
+    # invalidates the token
+    permission_version = user_service.get_permission_version(user.username)
+    permissions = user_service.get_permissions(user.username)
+
     token_expires = timedelta(hours=ACCESS_TOKEN_LIFETIME_HOURS)
     token = auth.create_jwt_token(
         secret_key=settings.secret_key,
-        payload={"sub": user.username},
+        payload=auth.token_payload(user.username, permissions, permission_version),
         expires_delta=token_expires,
     )
 
-    return AccessToken(access_token=token, token_type="bearer")  # nosec
+    return FastJSONResponse(
+        AccessToken(access_token=token, token_type="bearer")  # nosec
+    )
+
+
+@router.post(
+    "/api/session",
+    summary="Log in with a session cookie",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_class=Response,
+)
+def login_with_session(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    session_settings: SessionSettings = Depends(get_session_settings),
+) -> Response:
+    """
+    Log in and get a session cookie.
+
+    The session id is returned in an HTTP-only cookie named `Session`. The session
+    expires if it isn't used for 24 hours.
+
+    This is an alternative to requesting an authentication token, meant for browsers.
+    Unlike a token, a session can be revoked by logging out.
+    """
+    user = auth.authenticate_user(form_data.username, form_data.password)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+        )
+
+    session_id = get_session_store().create(user.username)
+    response = Response(status_code=status.HTTP_204_NO_CONTENT)
+    response.set_cookie(
+        auth.SESSION_COOKIE,
+        session_id,
+        httponly=True,
+        samesite="lax",
+        # the scheme of the request may be http behind a TLS-terminating proxy
+        secure=session_settings.session_cookie_secure,
+    )
+    return response
+
+
+@router.delete(
+    "/api/session",
+    summary="Log out",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_class=Response,
+)
+def logout(
+    session: Optional[str] = Cookie(None, alias=auth.SESSION_COOKIE)
+) -> Response:
+    """
+    Log out by revoking the session in the session cookie.
+
+    The session cookie is deleted as well.
+    """
+    if session:
+        get_session_store().revoke(session)
+
+    response = Response(status_code=status.HTTP_204_NO_CONTENT)
+    response.delete_cookie(auth.SESSION_COOKIE)
+    return response
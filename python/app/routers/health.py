@@ -0,0 +1,61 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter
+from starlette import status
+
+from app.responses import FastJSONResponse
+from app.service.reference import get_reference_data_cache
+from app.util.cache import get_cache
+from app.util.health import check_readiness
+
+router = APIRouter()
+
+# The endpoints are coroutines, so that they don't have to wait for a thread in a
+# saturated threadpool.
+
+
+@router.get(
+    "/health/live",
+    summary="Liveness check",
+    response_description="The worker process is alive",
+)
+async def live() -> FastJSONResponse:
+    """
+    Check whether the worker process is alive.
+
+    This succeeds as long as the process can handle requests at all, however slowly.
+    """
+    return FastJSONResponse({"status": "ok"})
+
+
+@router.get(
+    "/health/ready",
+    summary="Readiness check",
+    response_description="The worker process is ready to handle requests",
+    responses={503: {"description": "The worker process is saturated"}},
+)
+async def ready() -> FastJSONResponse:
+    """
+    Check whether the worker process is ready to handle requests.
+
+    The response includes saturation signals: the event loop lag, the threadpool
+    queue, the database connection pool usage and the password hashing backlog, as
+    well as the cache hit rates. A 503 (Service Unavailable) error is returned if any
+    of the signals exceeds its threshold, so that a load balancer can move traffic
+    away from the worker process.
+    """
+    is_ready, report = check_readiness()
+    report["cache_hit_rates"] = _cache_hit_rates()
+    return FastJSONResponse(
+        report,
+        status_code=(
+            status.HTTP_200_OK if is_ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+    )
+
+
+def _cache_hit_rates() -> Dict[str, Any]:
+    return {
+        "cache": get_cache().stats()["hit_rate"],
+        "reference_data": get_reference_data_cache().stats()["hit_rate"],
+    }
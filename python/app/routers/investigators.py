@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, Query
+from starlette.responses import StreamingResponse
+
+from app.db import Pool, get_pool
+from app.dependencies import require_permission
+from app.models.permission import Permission
+from app.models.principal import Principal
+from app.models.pydantic import InvestigatorPage
+from app.responses import FastJSONResponse
+from app.service import investigator as investigator_service
+from app.util.export import export_response
+
+router = APIRouter()
+
+
+@router.get(
+    "/api/investigators",
+    summary="List investigators",
+    response_description="A page of investigators",
+    response_model=InvestigatorPage,
+)
+async def list_investigators(
+    after: int = Query(0, description="Id after which the page starts."),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of items."),
+    user: Principal = Depends(require_permission(Permission.VIEW_INVESTIGATORS)),
+    pool: Pool = Depends(get_pool),
+) -> FastJSONResponse:
+    """
+    List investigators, ordered by id.
+
+    The list is paginated. To get the next page, pass the `next_cursor` value of the
+    response as the `after` parameter. `next_cursor` is null for the last page.
+    """
+    investigators = await investigator_service.list_investigators(pool, after, limit)
+    next_cursor = investigators[-1].id if len(investigators) == limit else None
+    return FastJSONResponse(
+        InvestigatorPage(items=investigators, next_cursor=next_cursor)
+    )
+
+
+@router.get(
+    "/api/investigators/export",
+    summary="Export investigators",
+    response_description="All investigators",
+    response_class=StreamingResponse,
+)
+async def export_investigators(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    user: Principal = Depends(
+        require_permission(Permission.VIEW_INVESTIGATORS | Permission.EXPORT_DATA)
+    ),
+    pool: Pool = Depends(get_pool),
+) -> StreamingResponse:
+    """
+    Export all investigators, as newline delimited JSON (ndjson) or CSV.
+
+    The export is streamed while it is read from the database.
+    """
+    return export_response(
+        investigator_service.stream_investigators(pool),
+        investigator_service.INVESTIGATOR_COLUMNS,
+        format,
+        "investigators",
+    )
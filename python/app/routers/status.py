@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends
+
+from app.dependencies import require_permission
+from app.middleware.concurrency import get_concurrency_limiter
+from app.models.permission import Permission
+from app.responses import FastJSONResponse
+from app.service.reference import get_reference_data_cache
+from app.util.cache import get_cache
+from app.util.log import queue_stats
+
+# The statistics reveal details of the deployment, so only administrators may see them
+router = APIRouter(dependencies=[Depends(require_permission(Permission.MANAGE_USERS))])
+
+
+@router.get(
+    "/status/cache",
+    summary="Cache statistics",
+    response_description="Statistics for the caches of the worker process",
+)
+def cache_status() -> FastJSONResponse:
+    """
+    Get statistics for the caches of the worker process handling the request.
+
+    The statistics include hit rates, which may be used for tuning the cache sizes
+    and times to live. As every worker process has its own statistics, successive
+    requests may give different results.
+    """
+    return FastJSONResponse(
+        {
+            "cache": get_cache().stats(),
+            "reference_data": get_reference_data_cache().stats(),
+        }
+    )
+
+
+@router.get(
+    "/status/concurrency",
+    summary="Concurrency limits",
+    response_description="The concurrency limits of the worker process",
+)
+def concurrency_status() -> FastJSONResponse:
+    """
+    Get the concurrency limits of the worker process handling the request.
+
+    For every route group the current limit, the number of requests in progress and
+    the numbers of accepted and rejected requests are returned. The limits adapt to
+    the observed latencies.
+    """
+    return FastJSONResponse(get_concurrency_limiter().stats())
+
+
+@router.get(
+    "/status/logging",
+    summary="Logging statistics",
+    response_description="The log queue statistics of the worker process",
+)
+def logging_status() -> FastJSONResponse:
+    """
+    Get the number of queued and dropped log records of the worker process.
+
+    Log records are dropped if they are logged faster than they can be written.
+    """
+    return FastJSONResponse(queue_stats())
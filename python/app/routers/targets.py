@@ -0,0 +1,120 @@
+from datetime import date
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette import status
+from starlette.responses import StreamingResponse
+
+from app.db import Pool, get_pool
+from app.dependencies import require_permission
+from app.models.permission import Permission
+from app.models.principal import Principal
+from app.models.pydantic import Target, TargetPage, VisibilityWindow
+from app.responses import FastJSONResponse
+from app.service import target as target_service
+from app.util.export import export_response
+
+router = APIRouter()
+
+
+@router.get(
+    "/api/targets",
+    summary="List targets",
+    response_description="A page of targets",
+    response_model=TargetPage,
+)
+async def list_targets(
+    after: int = Query(0, description="Id after which the page starts."),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of items."),
+    user: Principal = Depends(require_permission(Permission.VIEW_TARGETS)),
+    pool: Pool = Depends(get_pool),
+) -> FastJSONResponse:
+    """
+    List targets, ordered by id. Coordinates are given in degrees.
+
+    The list is paginated. To get the next page, pass the `next_cursor` value of the
+    response as the `after` parameter. `next_cursor` is null for the last page.
+    """
+    targets = await target_service.list_targets(pool, after, limit)
+    next_cursor = targets[-1].id if len(targets) == limit else None
+    return FastJSONResponse(TargetPage(items=targets, next_cursor=next_cursor))
+
+
+@router.get(
+    "/api/targets/search",
+    summary="Search targets by position",
+    response_description="The targets within the search radius",
+    response_model=List[Target],
+)
+async def search_targets(
+    ra: float = Query(..., ge=0, lt=360, description="Right ascension, in degrees."),
+    dec: float = Query(..., ge=-90, le=90, description="Declination, in degrees."),
+    radius: float = Query(
+        ..., gt=0, le=10, description="Search radius, in degrees (at most 10)."
+    ),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of items."),
+    user: Principal = Depends(require_permission(Permission.VIEW_TARGETS)),
+    pool: Pool = Depends(get_pool),
+) -> FastJSONResponse:
+    """
+    Find the targets within a radius of a position (a cone search), nearest first.
+    Coordinates are given in degrees.
+
+    The search uses an index of all target positions, which is reloaded every few
+    minutes. Targets added since it has been loaded may thus be missing.
+    """
+    targets = await target_service.search_targets(pool, ra, dec, radius, limit)
+    return FastJSONResponse(targets)
+
+
+@router.get(
+    "/api/targets/export",
+    summary="Export targets",
+    response_description="All targets",
+    response_class=StreamingResponse,
+)
+async def export_targets(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    user: Principal = Depends(
+        require_permission(Permission.VIEW_TARGETS | Permission.EXPORT_DATA)
+    ),
+    pool: Pool = Depends(get_pool),
+) -> StreamingResponse:
+    """
+    Export all targets, as newline delimited JSON (ndjson) or CSV.
+
+    The export is streamed while it is read from the database.
+    """
+    return export_response(
+        target_service.stream_targets(pool),
+        target_service.TARGET_COLUMNS,
+        format,
+        "targets",
+    )
+
+
+@router.get(
+    "/api/targets/{target_id}/visibility",
+    summary="Get the visibility windows of a target",
+    response_description="The visibility windows in the night",
+    response_model=List[VisibilityWindow],
+)
+async def get_visibility_windows(
+    target_id: int,
+    night: date = Query(..., description="Date on which the night starts."),
+    user: Principal = Depends(require_permission(Permission.VIEW_TARGETS)),
+) -> FastJSONResponse:
+    """
+    Get the times (in UTC) during which a target is visible with SALT in a night.
+
+    The windows are read from a cache which is built in advance for a whole semester
+    (see the updatevisibility command). A 404 error is returned if the cache has no
+    windows for the target and night.
+    """
+    windows = await target_service.get_visibility_windows(target_id, night)
+    if windows is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No visibility windows are available for this target and night.",
+        )
+    return FastJSONResponse(windows)
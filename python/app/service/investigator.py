@@ -0,0 +1,57 @@
+"""Investigator service."""
+from typing import Any, AsyncIterator, List, Sequence, Tuple
+
+from app import db
+from app.models.pydantic import Investigator
+
+INVESTIGATOR_COLUMNS = ["id", "first_name", "surname", "email"]
+
+
+async def list_investigators(
+    pool: db.Pool, after: int, limit: int
+) -> List[Investigator]:
+    """
+    Get a page of investigators, ordered by id.
+
+    Parameters
+    ----------
+    pool:
+        The database connection pool.
+    after:
+        Only investigators with an id greater than this value are returned.
+    limit:
+        The maximum number of investigators to return.
+
+    Returns
+    -------
+    list
+        The investigators.
+
+    """
+    sql = """
+SELECT Investigator_Id, FirstName, Surname, Email
+FROM Investigator
+WHERE Investigator_Id > %s
+ORDER BY Investigator_Id
+LIMIT %s
+    """
+    rows = await db.fetch_all(pool, sql, (after, limit))
+    # rows from the database are trusted, so that validation can be skipped
+    return [
+        Investigator.construct(
+            id=row[0], first_name=row[1], surname=row[2], email=row[3]
+        )
+        for row in rows
+    ]
+
+
+def stream_investigators(
+    pool: db.Pool,
+) -> AsyncIterator[Sequence[Tuple[Any, ...]]]:
+    """Stream all investigators, in batches of rows with the INVESTIGATOR_COLUMNS."""
+    sql = """
+SELECT Investigator_Id, FirstName, Surname, Email
+FROM Investigator
+ORDER BY Investigator_Id
+    """
+    return db.stream_rows(pool, sql)
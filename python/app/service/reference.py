@@ -0,0 +1,63 @@
+"""
+Reference data service.
+
+Reference data (such as semesters and partners) hardly ever changes, and it is cached
+in a `ReadThroughCache`. Cached data is invalidated when the checksum of any of the
+tables it has been loaded from changes.
+"""
+from functools import lru_cache
+from typing import Dict, Hashable, List, Sequence
+
+from app import db
+from app.models.pydantic import Partner, Semester
+from app.settings import CacheSettings
+from app.util.read_through import ReadThroughCache
+
+
+async def _checksum_probe(tables: Sequence[str]) -> Dict[str, Hashable]:
+    pool = await db.get_pool()
+    return dict(await db.checksum_tables(pool, tables))
+
+
+@lru_cache()
+def get_reference_data_cache() -> ReadThroughCache:
+    """Get the cache for reference data."""
+    settings = CacheSettings()
+    return ReadThroughCache(
+        max_entries=settings.reference_data_max_entries,
+        default_ttl=settings.reference_data_ttl,
+        probe=_checksum_probe,
+    )
+
+
+async def get_semesters() -> List[Semester]:
+    """Get all semesters, ordered by start date."""
+
+    async def load() -> List[Semester]:
+        sql = """
+SELECT Year, Semester, StartSemester, EndSemester
+FROM Semester
+ORDER BY StartSemester
+        """
+        rows = await db.fetch_all(await db.get_pool(), sql)
+        return [
+            Semester(year=year, semester=semester, start=start, end=end)
+            for year, semester, start, end in rows
+        ]
+
+    return await get_reference_data_cache().get("semesters", load, tables=["Semester"])
+
+
+async def get_partners() -> List[Partner]:
+    """Get all partners, ordered by partner code."""
+
+    async def load() -> List[Partner]:
+        sql = """
+SELECT Partner_Code, Partner_Name
+FROM Partner
+ORDER BY Partner_Code
+        """
+        rows = await db.fetch_all(await db.get_pool(), sql)
+        return [Partner(code=code, name=name) for code, name in rows]
+
+    return await get_reference_data_cache().get("partners", load, tables=["Partner"])
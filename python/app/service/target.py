@@ -0,0 +1,327 @@
+"""
+Target service.
+
+NumPy is slow to import, and so the modules for positional queries and visibility
+windows (which depend on it) are only imported when they are needed.
+"""
+import datetime
+import pathlib
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from starlette.concurrency import run_in_threadpool
+
+from app import db
+from app.models.pydantic import Semester, Target, VisibilityWindow
+from app.service.reference import get_reference_data_cache, get_semesters
+from app.settings import CacheSettings
+
+if TYPE_CHECKING:
+    from app.util.sky import FloatArray, IntArray, SkyIndex
+    from app.util.visibility import VisibilityCache
+
+TARGET_COLUMNS = ["id", "name", "ra", "dec"]
+
+
+@lru_cache()
+def get_cache_settings() -> CacheSettings:
+    """Get the cache settings, such as the time to live of the sky index."""
+    return CacheSettings()
+
+
+_TARGET_SQL = """
+SELECT T.Target_Id, T.Target_Name, RaH, RaM, RaS, DecSign, DecD, DecM, DecS
+FROM Target AS T
+JOIN TargetCoordinates AS TC ON T.TargetCoordinates_Id = TC.TargetCoordinates_Id
+"""
+
+
+def _convert_target_rows(
+    rows: Sequence[Tuple[Any, ...]],
+) -> List[Tuple[int, str, float, float]]:
+    """Convert target rows with sexagesimal coordinates to rows with degrees."""
+    from app.util.sky import sexagesimal_to_degrees
+
+    if not rows:
+        return []
+    columns = list(zip(*rows))
+    ra, dec = sexagesimal_to_degrees(*columns[2:])
+    return list(zip(columns[0], columns[1], ra.tolist(), dec.tolist()))
+
+
+async def list_targets(pool: db.Pool, after: int, limit: int) -> List[Target]:
+    """
+    Get a page of targets, ordered by id.
+
+    Parameters
+    ----------
+    pool:
+        The database connection pool.
+    after:
+        Only targets with an id greater than this value are returned.
+    limit:
+        The maximum number of targets to return.
+
+    Returns
+    -------
+    list
+        The targets, with coordinates in degrees.
+
+    """
+    sql = _TARGET_SQL + "WHERE T.Target_Id > %s ORDER BY T.Target_Id LIMIT %s"
+    rows = await db.fetch_all(pool, sql, (after, limit))
+    # rows from the database are trusted, so that validation can be skipped
+    return [
+        Target.construct(id=id_, name=name, ra=ra, dec=dec)
+        for id_, name, ra, dec in _convert_target_rows(rows)
+    ]
+
+
+async def stream_targets(
+    pool: db.Pool,
+) -> AsyncIterator[Sequence[Tuple[Any, ...]]]:
+    """Stream all targets, in batches of rows with the TARGET_COLUMNS."""
+    async for rows in db.stream_rows(pool, _TARGET_SQL + "ORDER BY T.Target_Id"):
+        yield _convert_target_rows(rows)
+
+
+async def search_targets(
+    pool: db.Pool, ra: float, dec: float, radius: float, limit: int
+) -> List[Target]:
+    """
+    Find the targets within a radius of a position.
+
+    Parameters
+    ----------
+    pool:
+        The database connection pool.
+    ra:
+        The right ascension of the position, in degrees.
+    dec:
+        The declination of the position, in degrees.
+    radius:
+        The search radius, in degrees.
+    limit:
+        The maximum number of targets to return.
+
+    Returns
+    -------
+    list
+        The targets nearest to the position, ordered by their angular separation from
+        it.
+
+    """
+    index = await get_sky_index()
+    ids, _ = index.cone_search(ra, dec, radius)
+    nearest_ids = ids[:limit].tolist()
+    if not nearest_ids:
+        return []
+
+    placeholders = ", ".join(["%s"] * len(nearest_ids))
+    sql = _TARGET_SQL + f"WHERE T.Target_Id IN ({placeholders})"
+    rows = await db.fetch_all(pool, sql, nearest_ids)
+    targets = {
+        id_: Target.construct(id=id_, name=name, ra=ra, dec=dec)
+        for id_, name, ra, dec in _convert_target_rows(rows)
+    }
+    # targets deleted since the index has been loaded are skipped
+    return [targets[id_] for id_ in nearest_ids if id_ in targets]
+
+
+async def get_target_coordinates(
+    connection: Any,
+) -> Tuple["IntArray", "FloatArray", "FloatArray"]:
+    """
+    Get the coordinates of all targets.
+
+    Parameters
+    ----------
+    connection:
+        An aiomysql connection to the Science Database.
+
+    Returns
+    -------
+    tuple
+        The target ids (i.e. the Target_Id values), right ascensions and declinations,
+        as NumPy arrays. The coordinates are in degrees.
+
+    """
+    import numpy as np
+
+    from app.util.sky import sexagesimal_to_degrees
+
+    sql = """
+SELECT T.Target_Id, RaH, RaM, RaS, DecSign, DecD, DecM, DecS
+FROM Target AS T
+JOIN TargetCoordinates AS TC ON T.TargetCoordinates_Id = TC.TargetCoordinates_Id
+    """
+    async with connection.cursor() as cur:
+        await cur.execute(sql)
+        rows = await cur.fetchall()
+
+    if rows:
+        columns = list(zip(*rows))
+    else:
+        columns = [()] * 8
+    ids = np.array(columns[0], dtype=np.int64)
+    ra, dec = sexagesimal_to_degrees(*columns[1:])
+    return ids, ra, dec
+
+
+async def load_sky_index(connection: Any, **kwargs: float) -> "SkyIndex":
+    """
+    Load all target coordinates from the database into a sky index.
+
+    The index is keyed by target id (Target_Id), as are the API's target endpoints.
+
+    Parameters
+    ----------
+    connection:
+        An aiomysql connection to the Science Database.
+    **kwargs:
+        Keyword arguments for the SkyIndex constructor.
+
+    Returns
+    -------
+    SkyIndex
+        The sky index.
+
+    """
+    from app.util.sky import SkyIndex
+
+    ids, ra, dec = await get_target_coordinates(connection)
+    return SkyIndex.from_coordinates(ids, ra, dec, **kwargs)
+
+
+async def get_sky_index() -> "SkyIndex":
+    """
+    Get the sky index of all targets.
+
+    The index is kept in the reference data cache. It is not invalidated when targets
+    change, as the checksum of the Target table would require a table scan; instead
+    it is reloaded after the time to live given by the SKY_INDEX_TTL setting.
+    """
+
+    async def load() -> "SkyIndex":
+        pool = await db.get_pool()
+        connection = await db.acquire(pool)
+        try:
+            return await load_sky_index(connection)
+        finally:
+            pool.release(connection)
+
+    return await get_reference_data_cache().get(
+        "sky_index", load, ttl=get_cache_settings().sky_index_ttl
+    )
+
+
+async def update_visibility_cache(connection: Any, cache: "VisibilityCache") -> int:
+    """
+    Update a visibility cache with the targets in the database.
+
+    The visibility windows are keyed by target id (Target_Id).
+
+    Parameters
+    ----------
+    connection:
+        An aiomysql connection to the Science Database.
+    cache:
+        The visibility cache.
+
+    Returns
+    -------
+    int
+        The number of targets whose visibility windows had to be computed.
+
+    """
+    ids, ra, dec = await get_target_coordinates(connection)
+    return cache.update(ids, ra, dec)
+
+
+# the visibility caches of the worker process, by year and semester
+_visibility_caches: Dict[Tuple[int, int], "VisibilityCache"] = {}
+
+
+def get_visibility_cache(semester: Semester) -> "VisibilityCache":
+    """
+    Get the visibility cache for a semester.
+
+    The caches are kept for the lifetime of the process, and a cache is reloaded if
+    it has been rebuilt (for example by the updatevisibility command) since it was
+    last used.
+    """
+    from app.util.visibility import VisibilityCache
+
+    key = (semester.year, semester.semester)
+    cache = _visibility_caches.get(key)
+    if cache is None:
+        directory = (
+            pathlib.Path(get_cache_settings().visibility_cache_directory)
+            / f"{semester.year}-{semester.semester}"
+        )
+        nights = (semester.end - semester.start).days + 1
+        cache = VisibilityCache(directory, semester.start, nights)
+        _visibility_caches[key] = cache
+    else:
+        cache.refresh()
+    return cache
+
+
+async def get_semester(night: datetime.date) -> Optional[Semester]:
+    """Return the semester containing the night starting on a date, if there is one."""
+    for semester in await get_semesters():
+        if semester.start <= night <= semester.end:
+            return semester
+    return None
+
+
+async def build_visibility_cache(semester: Semester) -> int:
+    """
+    Compute the visibility windows of all targets in the database for a semester.
+
+    Windows are only computed for new targets and for targets whose coordinates have
+    changed since the cache was last built. The number of targets whose windows had
+    to be computed is returned.
+    """
+    cache = get_visibility_cache(semester)
+    pool = await db.get_pool()
+    connection = await db.acquire(pool)
+    try:
+        return await update_visibility_cache(connection, cache)
+    finally:
+        pool.release(connection)
+
+
+async def get_visibility_windows(
+    target_id: int, night: datetime.date
+) -> Optional[List[VisibilityWindow]]:
+    """
+    Get the visibility windows of a target in a night from the visibility cache.
+
+    The windows are read from the cache built by `build_visibility_cache` and are
+    never computed here. None is returned if the cache contains no windows for the
+    target and night, for example because it has not been built for the semester.
+    """
+    semester = await get_semester(night)
+    if semester is None:
+        return None
+    cache = await run_in_threadpool(get_visibility_cache, semester)
+    windows = cache.windows(target_id, night)
+    if windows is None:
+        return None
+    return [
+        VisibilityWindow.construct(
+            start=start.replace(tzinfo=datetime.timezone.utc),
+            end=end.replace(tzinfo=datetime.timezone.utc),
+        )
+        for start, end in windows
+    ]
@@ -1,9 +1,78 @@
 """User service."""
+import json
+from typing import FrozenSet, Optional
+
+from app.models.permission import Permission, Role, permissions_for_roles
 from app.models.pydantic import UserInDB
 from app.util import auth
+from app.util.cache import get_cache
+from app.util.permission_version import get_permission_version_store
+
+# Time (in seconds) for which user details are cached
+USER_CACHE_TTL = 300
+
+
+def _user_cache_key(username: str) -> str:
+    return f"user:{username}"
 
 
 def get_user(username: str) -> UserInDB:
-    return UserInDB(
+    cache = get_cache()
+    cached_user = cache.get(_user_cache_key(username))
+    if cached_user is not None:
+        # the cached value has been validated before it was cached
+        return UserInDB.construct(**json.loads(cached_user))
+
+    user = UserInDB(
         username=username, hashed_password=auth.get_password_hash("!" + username)
     )
+    cache.set(_user_cache_key(username), user.json().encode(), ttl=USER_CACHE_TTL)
+    return user
+
+
+def invalidate_user(username: str) -> None:
+    """Remove a user from the cache, in all worker processes."""
+    get_cache().delete(_user_cache_key(username))
+
+
+def get_roles(username: str) -> FrozenSet[Role]:
+    """Return the roles of a user."""
+    return frozenset([Role.INVESTIGATOR])
+
+
+def get_permissions(username: str) -> Permission:
+    """Return the permissions of a user, as granted by the user's roles."""
+    return permissions_for_roles(get_roles(username))
+
+
+def get_permission_version(username: str) -> int:
+    """
+    Return the version of a user's permissions, for embedding it in a token.
+
+    A version is created if the user has none yet. Access tokens are only accepted
+    with the current version (see `is_current_permission_version`).
+    """
+    return get_permission_version_store().get_or_create(username)
+
+
+def is_current_permission_version(username: str, version: int) -> bool:
+    """
+    Check whether a version is the current version of a user's permissions.
+
+    This is False if the user has no version at all, for example because the
+    permission version store has been lost.
+    """
+    current: Optional[int] = get_permission_version_store().get(username)
+    return current is not None and current == version
+
+
+def permissions_changed(username: str) -> None:
+    """
+    Record that a user's roles or permissions have changed (or the user was deleted).
+
+    This invalidates all access tokens issued for the user before, immediately in
+    this worker process and after a few seconds in all the others, so that the user
+    has to log in again.
+    """
+    get_permission_version_store().change(username)
+    invalidate_user(username)
@@ -1,3 +1,5 @@
+from typing import Dict, Optional
+
 from pydantic import BaseSettings
 
 
@@ -14,3 +16,197 @@ class Settings(BaseSettings):
 
     class Config:
         env_file = "../.env"
+
+
+class CacheSettings(BaseSettings):
+    """
+    Cache settings for the Web Manager.
+
+    The settings are defined in the same way as those of the Settings class, but all of
+    them are optional.
+    """
+
+    # Maximum number of entries in the in-process cache of a worker.
+    cache_max_entries: int = 10000
+
+    # File for the cache shared by all workers on a host, ideally on a RAM disk (such
+    # as /dev/shm/web-manager-cache). No shared cache is used if this is not defined.
+    shared_cache_file: Optional[str] = None
+
+    # URL of a Redis server for a cache shared by all hosts, such as
+    # redis://localhost:6379/0. No Redis cache is used if this is not defined.
+    cache_url: Optional[str] = None
+
+    # Maximum number of entries in the reference data cache of a worker.
+    reference_data_max_entries: int = 1000
+
+    # Time (in seconds) for which reference data is cached at most.
+    reference_data_ttl: float = 3600
+
+    # Interval (in seconds) between checks whether reference data has changed.
+    reference_data_probe_interval: float = 30
+
+    # Time (in seconds) after which the sky index of all targets is reloaded.
+    sky_index_ttl: float = 300
+
+    # Directory for the visibility windows of targets, with a subdirectory per
+    # semester.
+    visibility_cache_directory: str = "visibility-cache"
+
+    class Config:
+        env_file = "../.env"
+
+
+class SessionSettings(BaseSettings):
+    """
+    Settings for server-side sessions.
+
+    The settings are defined in the same way as those of the Settings class, but all of
+    them are optional.
+    """
+
+    # SQLite database file for persisting sessions. All workers on a host should use
+    # the same file. Sessions are not persisted if this is not defined.
+    session_store_file: Optional[str] = None
+
+    # Time (in hours) after which an unused session expires.
+    session_lifetime_hours: float = 24
+
+    # Whether the session cookie is only sent over HTTPS. This should only be disabled
+    # for local development over plain HTTP.
+    session_cookie_secure: bool = True
+
+    # Interval (in seconds) between removals of expired sessions.
+    session_garbage_collection_interval: float = 600
+
+    class Config:
+        env_file = "../.env"
+
+
+class PermissionSettings(BaseSettings):
+    """
+    Settings for the permission versions, which invalidate access tokens.
+
+    The settings are defined in the same way as those of the Settings class, but all of
+    them are optional.
+    """
+
+    # SQLite database file for the permission versions. All workers accepting access
+    # tokens must use the same file. The session store file is used if this is not
+    # defined, and the versions are kept in memory if neither file is defined.
+    permission_store_file: Optional[str] = None
+
+    # Time (in seconds) after which a worker rereads a permission version it knows.
+    permission_revalidate_interval: float = 5
+
+    class Config:
+        env_file = "../.env"
+
+
+class DatabaseSettings(BaseSettings):
+    """
+    Settings for the Science Database connection.
+
+    The settings are defined in the same way as those of the Settings class. They are
+    only read when the database is first accessed.
+    """
+
+    # Host of the Science Database server.
+    sdb_host: str
+
+    # Name of the Science Database.
+    sdb_database: str
+
+    # Username of the database user account.
+    sdb_username: str
+
+    # Password of the database user account.
+    sdb_password: str
+
+    # Minimum and maximum number of connections in the connection pool.
+    sdb_pool_min_size: int = 1
+    sdb_pool_max_size: int = 10
+
+    class Config:
+        env_file = "../.env"
+
+
+class ConcurrencySettings(BaseSettings):
+    """
+    Settings for the concurrency limits of a worker process.
+
+    The settings are defined in the same way as those of the Settings class, but all of
+    them are optional.
+    """
+
+    # Maximum number of concurrent logins (which hash a password).
+    login_concurrency_limit: int = 4
+
+    # Time (in seconds) until the response starts above which the login concurrency
+    # limit is decreased.
+    login_target_latency: float = 2
+
+    # Maximum number of other concurrent requests.
+    concurrency_limit: int = 100
+
+    # Time (in seconds) until the response starts above which the concurrency limit
+    # for other requests is decreased.
+    target_latency: float = 1
+
+    class Config:
+        env_file = "../.env"
+
+
+class HealthSettings(BaseSettings):
+    """
+    Thresholds for the readiness check of a worker process.
+
+    The settings are defined in the same way as those of the Settings class, but all of
+    them are optional. A worker process is not ready if any threshold is exceeded.
+    """
+
+    # Maximum event loop lag (in seconds).
+    max_event_loop_lag: float = 0.5
+
+    # Maximum number of tasks waiting for a thread in the threadpool.
+    max_threadpool_queue: int = 50
+
+    # Maximum number of coroutines waiting for a database connection.
+    max_db_pool_waiting: int = 20
+
+    # Maximum number of password hashing operations in progress.
+    max_hashing_backlog: int = 16
+
+    class Config:
+        env_file = "../.env"
+
+
+class LogSettings(BaseSettings):
+    """
+    Logging settings for the Web Manager.
+
+    The settings are defined in the same way as those of the Settings class, but all of
+    them are optional.
+    """
+
+    # Minimum level of the logged records.
+    log_level: str = "INFO"
+
+    # Maximum number of log records waiting to be written. Further records are dropped.
+    log_queue_size: int = 10000
+
+    # Fraction of successful requests which are logged.
+    log_sample_rate: float = 1
+
+    # Fractions of successful requests which are logged, by path prefix, as a JSON
+    # object such as {"/health/": 0, "/api/targets": 0.1}.
+    log_sample_rates: Dict[str, float] = {}
+
+    # Duration (in seconds) above which requests are always logged.
+    slow_request_threshold: float = 1
+
+    # Status code from which on requests are always logged.
+    log_min_unsampled_status: int = 400
+
+    class Config:
+        env_file = "../.env"
@@ -0,0 +1,75 @@
+"""
+Build the visibility windows of all targets for a semester.
+
+The windows are stored in the visibility cache (see `app.util.visibility`), from which
+the Web Manager reads them. As the cache is updated incrementally, only the windows of
+new targets and of targets whose coordinates have changed are computed. The command
+should be run whenever targets have been added or changed, for example as a nightly
+cron job, and before the start of a semester.
+
+Run it from the python folder:
+
+```shell
+python -m app.update_visibility --semester 2021-1
+```
+
+If no semester is given, the current semester is used.
+"""
+import argparse
+import asyncio
+import datetime
+import sys
+import time
+from typing import Optional
+
+from app import db
+from app.models.pydantic import Semester
+from app.service import target as target_service
+from app.service.reference import get_semesters
+
+
+async def find_semester(name: Optional[str]) -> Semester:
+    """Return a semester, given as year and semester (such as 2021-1)."""
+    if name is None:
+        semester = await target_service.get_semester(datetime.date.today())
+        if semester is None:
+            raise ValueError("There is no current semester.")
+        return semester
+
+    for semester in await get_semesters():
+        if f"{semester.year}-{semester.semester}" == name:
+            return semester
+    raise ValueError(f"Unknown semester: {name}")
+
+
+async def update(semester_name: Optional[str]) -> None:
+    """Update the visibility cache for a semester."""
+    try:
+        semester = await find_semester(semester_name)
+        start = time.perf_counter()
+        computed = await target_service.build_visibility_cache(semester)
+        print(  # noqa
+            f"Semester {semester.year}-{semester.semester}: computed the visibility "
+            f"windows of {computed} targets in {time.perf_counter() - start:.1f} s."
+        )
+    finally:
+        await db.close_pool()
+
+
+def main() -> None:
+    """Build the visibility windows of all targets for a semester."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--semester",
+        help="The semester, such as 2021-1. The default is the current semester.",
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(update(args.semester))
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,23 +4,49 @@ Utility functions for authentication and authorization.
 The code in this module has in wide oparts been taken from the FastAPI tutorial,
 https://fastapi.tiangolo.com/tutorial/security/oauth2-jwt/.
 """
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, cast
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Optional, cast
 
 from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.security.utils import get_authorization_scheme_param
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from starlette import status
 from starlette.requests import Request
 from starlette.status import HTTP_401_UNAUTHORIZED
 
-from app.models.pydantic import User
+from app.models.permission import Permission
+from app.models.principal import Principal
+from app.models.pydantic import UserInDB
 from app.service import user as user_service
+from app.util.cache import get_cache
+from app.util.session import get_session_store
+from app.util.single_flight import ThreadSingleFlight
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
 
 ALGORITHM = "HS256"
 
+# Name of the cookie containing a session id
+SESSION_COOKIE = "Session"
+
+# Maximum time (in seconds) for which the result of verifying a token is cached
+TOKEN_CACHE_TTL = 300
+
+# Names of the token claims for the permissions bitmap and the permission version
+PERMISSIONS_CLAIM = "perm"
+PERMISSION_VERSION_CLAIM = "pv"
+
+# Concurrent lookups of the same user (in Starlette's threadpool) share a single call
+# of user_service.get_user
+_user_lookups: ThreadSingleFlight[UserInDB] = ThreadSingleFlight()
+
 
 class OAuth2TokenOrCookiePasswordBearer(OAuth2PasswordBearer):
     """
@@ -53,20 +79,61 @@ class OAuth2TokenOrCookiePasswordBearer(OAuth2PasswordBearer):
         return param
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib and python-jose (with its cryptography backend) are imported only when they
+# are needed, as importing them is slow. Call preload() to import them eagerly.
+
+
+@lru_cache()
+def get_password_context() -> "CryptContext":
+    """Get the passlib context for hashing and verifying passwords."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def preload() -> None:
+    """Import and initialise the password hashing and JWT backends."""
+    from jose import jwt  # noqa: F401
+
+    get_password_context().handler().get_backend()
+
+
+# Number of password hashing operations in progress (in any thread)
+_hashing_backlog = 0
+_hashing_backlog_lock = threading.Lock()
+
+
+def hashing_backlog() -> int:
+    """Return the number of password hashing operations in progress."""
+    return _hashing_backlog
+
+
+def _count_hashing(delta: int) -> None:
+    global _hashing_backlog
+
+    with _hashing_backlog_lock:
+        _hashing_backlog += delta
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
     """Check a plain text password against a hash."""
-    return cast(bool, pwd_context.verify(password, hashed_password))
+    _count_hashing(1)
+    try:
+        return cast(bool, get_password_context().verify(password, hashed_password))
+    finally:
+        _count_hashing(-1)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a plain text password."""
-    return cast(str, pwd_context.hash(password))
+    _count_hashing(1)
+    try:
+        return cast(str, get_password_context().hash(password))
+    finally:
+        _count_hashing(-1)
 
 
-def authenticate_user(username: str, password: str) -> Optional[User]:
+def authenticate_user(username: str, password: str) -> Optional[Principal]:
     """
     Authenticate a user with a username and password.
 
@@ -78,13 +145,15 @@ def authenticate_user(username: str, password: str) -> Optional[User]:
         return None
     if not verify_password(password, user.hashed_password):
         return None
-    return User(**user.dict())  # turn UserInDB into User
+    return Principal(user.username, user_service.get_permissions(user.username))
 
 
 def create_jwt_token(
     secret_key: str, payload: Dict[str, Any], expires_delta: Optional[timedelta] = None
 ) -> str:
     """Create a JWT token."""
+    from jose import jwt
+
     to_encode = payload.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -96,21 +165,155 @@ def create_jwt_token(
     return cast(str, encoded_jwt)
 
 
-def get_current_user(secret_key: str, token: str) -> User:
+def _token_cache_key(secret_key: str, token: str) -> str:
+    # the secret key is included so that changing it invalidates all cached tokens
+    digest = hashlib.sha256(f"{secret_key}:{token}".encode()).hexdigest()
+    return f"token:{digest}"
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    """
+    The claims of a verified JWT token.
+
+    The permissions and permission version are None for tokens issued without them.
+    """
+
+    __slots__ = ("username", "permissions", "permission_version")
+
+    username: str
+    permissions: Optional[Permission]
+    permission_version: Optional[int]
+
+
+def token_payload(
+    username: str, permissions: Permission, version: int
+) -> Dict[str, Any]:
+    """Return the payload of a JWT token for a user with permissions."""
+    return {
+        "sub": username,
+        PERMISSIONS_CLAIM: int(permissions),
+        PERMISSION_VERSION_CLAIM: version,
+    }
+
+
+def verify_token_claims(secret_key: str, token: str) -> Optional[TokenClaims]:
+    """
+    Verify a JWT token and return its claims.
+
+    None is returned if the token is invalid or has expired. The results for valid
+    tokens are cached until the token expires (or for at most TOKEN_CACHE_TTL
+    seconds).
+    """
+    from jose import JWTError, jwt
+
+    cache = get_cache()
+    cache_key = _token_cache_key(secret_key, token)
+    cached_claims = cache.get(cache_key)
+    if cached_claims is not None:
+        username, permissions, version = json.loads(cached_claims)
+        return TokenClaims(
+            username,
+            Permission(permissions) if permissions is not None else None,
+            version,
+        )
+
+    try:
+        payload = jwt.decode(token, secret_key, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    permissions = payload.get(PERMISSIONS_CLAIM)
+    version = payload.get(PERMISSION_VERSION_CLAIM)
+    if not isinstance(permissions, int) or not isinstance(version, int):
+        permissions = version = None
+    claims = TokenClaims(
+        str(username),
+        Permission(permissions) if permissions is not None else None,
+        version,
+    )
+
+    ttl = float(TOKEN_CACHE_TTL)
+    if "exp" in payload:
+        ttl = min(ttl, float(payload["exp"]) - time.time())
+    if ttl > 0:
+        cache.set(
+            cache_key,
+            json.dumps([claims.username, permissions, version]).encode(),
+            ttl=ttl,
+        )
+    return claims
+
+
+def verify_token(secret_key: str, token: str) -> Optional[str]:
+    """
+    Verify a JWT token and return the username it was issued for.
+
+    None is returned if the token is invalid or has expired.
+    """
+    claims = verify_token_claims(secret_key, token)
+    return claims.username if claims is not None else None
+
+
+def _get_user(username: str) -> UserInDB:
+    return _user_lookups.do(username, lambda: user_service.get_user(username))
+
+
+def get_current_user(secret_key: str, token: str) -> Principal:
+    """
+    Get the user for a JWT token.
+
+    If the token contains the user's permissions, these are used without any further
+    lookup, unless the user's permissions have changed since the token was issued. In
+    this case an authentication error is raised, so that the client requests a new
+    token. For tokens without permissions, the user and the user's permissions are
+    looked up.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials.",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, secret_key, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
+    claims = verify_token_claims(secret_key, token)
+    if claims is None:
+        raise credentials_exception
+
+    if claims.permissions is None or claims.permission_version is None:
+        # the token was issued without permissions, which must be looked up
+        user = _get_user(claims.username)
+        if user is None:
             raise credentials_exception
-    except JWTError:
+        return Principal(user.username, user_service.get_permissions(user.username))
+
+    if not user_service.is_current_permission_version(
+        claims.username, claims.permission_version
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="The permissions have changed. Please request a new token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return Principal(claims.username, claims.permissions)
+
+
+def get_current_user_from_session(session_id: str) -> Principal:
+    """
+    Get the user for a session id.
+
+    The lifetime of the session is extended. An authentication error is raised if the
+    session does not exist, has expired or has been revoked.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials.",
+    )
+    username = get_session_store().get_username(session_id)
+    if username is None:
         raise credentials_exception
-    user = user_service.get_user(username)
+    user = _get_user(username)
     if user is None:
         raise credentials_exception
 
-    return User(**user.dict())  # turn UserInDB into User instance
+    return Principal(user.username, user_service.get_permissions(user.username))
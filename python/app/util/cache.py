@@ -0,0 +1,513 @@
+"""
+Cache backends.
+
+The Web Manager usually runs with several worker processes, and a cache private to a
+worker would have to be warmed up in every worker, with invalidations reaching only a
+single worker. Hence there are three kinds of cache backend:
+
+* `LRUCache`: An in-process LRU cache. This is the fastest backend, but it is private
+  to a process.
+* `SharedMemoryCache`: A hash table in a memory-mapped file, which is shared by all
+  the processes on a host.
+* `RedisCache`: A cache on a Redis server, which is shared by all hosts. This backend
+  requires the redis package.
+
+These can be combined in a `TieredCache`. Every backend has an invalidation
+generation, which is incremented whenever an entry is deleted or the cache is
+cleared. A tiered cache clears its faster layers whenever the generation of a slower
+(shared) layer changes, so that an invalidation in any process reaches all processes.
+
+Keys are strings and values are bytes; it is up to the caller to serialise values.
+
+Use `get_cache` to get the cache used by the Web Manager. It is configured with the
+settings in `app.settings.CacheSettings`.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import pathlib
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from app.settings import CacheSettings
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+
+class CacheBackend(ABC):
+    """Abstract base class for cache backends."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value for a key, or None if there is no (unexpired) value."""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    @abstractmethod
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        """
+        Return the value and expiry time for a key.
+
+        The expiry time is a Unix timestamp, or None if the value does not expire.
+        None is returned if there is no (unexpired) value.
+        """
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store a value, which expires after ttl seconds (if ttl is not None)."""
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a value and increment the invalidation generation."""
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all values and increment the invalidation generation."""
+        ...
+
+    @abstractmethod
+    def generation(self) -> int:
+        """Return the invalidation generation."""
+        ...
+
+    def _record(
+        self, entry: Optional[Tuple[bytes, Optional[float]]]
+    ) -> Optional[Tuple[bytes, Optional[float]]]:
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+class LRUCache(CacheBackend):
+    """
+    An in-process LRU cache.
+
+    Parameters
+    ----------
+    max_entries:
+        The maximum number of entries.
+
+    """
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._generation = 0
+        # the cache may be accessed from the threads of Starlette's threadpool
+        self._lock = threading.Lock()
+
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return self._record(None)
+            if entry[1] is not None and entry[1] < time.time():
+                del self._entries[key]
+                return self._record(None)
+            self._entries.move_to_end(key)
+            return self._record(entry)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expiry = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expiry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def generation(self) -> int:
+        return self._generation
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedMemoryCache(CacheBackend):
+    """
+    A hash table in a memory-mapped file, shared by all processes on a host.
+
+    The file consists of a header and a fixed number of slots of a fixed size. Keys
+    are hashed, and a key is stored in one of the `max_probes` slots following the
+    slot given by its hash. If all of these are taken, the first of them is
+    overwritten. Values too large for a slot are not cached.
+
+    Access is synchronised between processes with file locks, so the file should be on
+    a local file system. Ideally it should be on a RAM disk such as /dev/shm. As a
+    file lock is held by the file descriptor rather than the thread, threads of the
+    same process are synchronised with a thread lock in addition.
+
+    Parameters
+    ----------
+    path:
+        The path of the memory-mapped file. The file is created if it doesn't exist.
+    slots:
+        The number of slots.
+    slot_size:
+        The size of a slot, in bytes. This includes a slot header of 32 bytes.
+    max_probes:
+        The maximum number of slots to check for a key.
+
+    """
+
+    MAGIC = b"WMCACHE1"
+    # magic, generation, number of slots, slot size
+    HEADER = struct.Struct("<8sQQQ")
+    # state, value length, key digest, expiry time (or 0 for no expiry)
+    SLOT_HEADER = struct.Struct("<B3xI16sd")
+
+    EMPTY = 0
+    USED = 1
+    DELETED = 2
+
+    def __init__(
+        self,
+        path: Union[str, pathlib.Path],
+        slots: int = 4096,
+        slot_size: int = 1024,
+        max_probes: int = 8,
+    ) -> None:
+        super().__init__()
+        if slot_size <= self.SLOT_HEADER.size:
+            raise ValueError(
+                f"The slot size must be larger than {self.SLOT_HEADER.size} bytes."
+            )
+        self.path = pathlib.Path(path)
+        self.slots = slots
+        self.slot_size = slot_size
+        self.max_probes = min(max_probes, slots)
+        size = self.HEADER.size + slots * slot_size
+
+        self._thread_lock = threading.Lock()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(
+                    self._fd, self.HEADER.pack(self.MAGIC, 0, slots, slot_size), 0
+                )
+            magic, _, file_slots, file_slot_size = self.HEADER.unpack(
+                os.pread(self._fd, self.HEADER.size, 0)
+            )
+            if (magic, file_slots, file_slot_size) != (self.MAGIC, slots, slot_size):
+                raise ValueError(
+                    f"{self.path} is not a cache file with {slots} slots of "
+                    f"{slot_size} bytes."
+                )
+            self._mmap = mmap.mmap(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        """Unmap and close the cache file."""
+        self._mmap.close()
+        os.close(self._fd)
+
+    def _lock(self, exclusive: bool) -> "_FileLock":
+        return _FileLock(self._fd, exclusive, self._thread_lock)
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+    def _offset(self, slot: int) -> int:
+        return self.HEADER.size + slot * self.slot_size
+
+    def _read_slot_header(self, slot: int) -> Tuple[int, int, bytes, float]:
+        return self.SLOT_HEADER.unpack_from(self._mmap, self._offset(slot))
+
+    def _probe(self, digest: bytes) -> List[int]:
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        return [(start + i) % self.slots for i in range(self.max_probes)]
+
+    def _find(self, digest: bytes) -> Optional[int]:
+        for slot in self._probe(digest):
+            state, _, slot_digest, _ = self._read_slot_header(slot)
+            if state == self.EMPTY:
+                return None
+            if state == self.USED and slot_digest == digest:
+                return slot
+        return None
+
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        digest = self._digest(key)
+        with self._lock(exclusive=False):
+            slot = self._find(digest)
+            if slot is None:
+                return self._record(None)
+            _, length, _, expiry = self._read_slot_header(slot)
+            if expiry and expiry < time.time():
+                return self._record(None)
+            start = self._offset(slot) + self.SLOT_HEADER.size
+            end = start + length
+            value = bytes(self._mmap[start:end])
+            return self._record((value, expiry or None))
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if len(value) > self.slot_size - self.SLOT_HEADER.size:
+            return
+        digest = self._digest(key)
+        expiry = time.time() + ttl if ttl is not None else 0.0
+        now = time.time()
+        with self._lock(exclusive=True):
+            slots = self._probe(digest)
+            target = self._find(digest)
+            if target is None:
+                # use the first free (or expired) slot, or else overwrite the first
+                target = slots[0]
+                for slot in slots:
+                    state, _, _, slot_expiry = self._read_slot_header(slot)
+                    if state != self.USED or (slot_expiry and slot_expiry < now):
+                        target = slot
+                        break
+            offset = self._offset(target)
+            start = offset + self.SLOT_HEADER.size
+            end = start + len(value)
+            self._mmap[start:end] = value
+            self.SLOT_HEADER.pack_into(
+                self._mmap, offset, self.USED, len(value), digest, expiry
+            )
+
+    def delete(self, key: str) -> None:
+        digest = self._digest(key)
+        with self._lock(exclusive=True):
+            slot = self._find(digest)
+            if slot is not None:
+                self.SLOT_HEADER.pack_into(
+                    self._mmap, self._offset(slot), self.DELETED, 0, b"", 0.0
+                )
+            self._increment_generation()
+
+    def clear(self) -> None:
+        with self._lock(exclusive=True):
+            empty_slot = self.SLOT_HEADER.pack(self.EMPTY, 0, b"", 0.0)
+            for slot in range(self.slots):
+                self._mmap.seek(self._offset(slot))
+                self._mmap.write(empty_slot)
+            self._increment_generation()
+
+    def _increment_generation(self) -> None:
+        struct.pack_into("<Q", self._mmap, 8, self.generation() + 1)
+
+    def generation(self) -> int:
+        return struct.unpack_from("<Q", self._mmap, 8)[0]  # type: ignore
+
+
+class _FileLock:
+    # The thread lock must be held while the file is locked, as all threads of a
+    # process share the file descriptor (and hence the file lock).
+
+    def __init__(self, fd: int, exclusive: bool, thread_lock: threading.Lock) -> None:
+        self.fd = fd
+        self.operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        self.thread_lock = thread_lock
+
+    def __enter__(self) -> None:
+        self.thread_lock.acquire()
+        try:
+            fcntl.flock(self.fd, self.operation)
+        except BaseException:
+            self.thread_lock.release()
+            raise
+
+    def __exit__(self, *args: Any) -> None:
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        finally:
+            self.thread_lock.release()
+
+
+class RedisCache(CacheBackend):
+    """
+    A cache on a Redis server.
+
+    The invalidation generation is stored on the server as well. To avoid a network
+    round trip for every lookup in a tiered cache, it is only fetched if it hasn't
+    been fetched for `generation_check_interval` seconds.
+
+    Parameters
+    ----------
+    url:
+        The Redis URL, such as redis://localhost:6379/0.
+    prefix:
+        A prefix for all keys.
+    generation_check_interval:
+        The time (in seconds) for which a fetched invalidation generation is used.
+
+    """
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "web-manager:",
+        generation_check_interval: float = 1,
+    ) -> None:
+        if redis is None:
+            raise ImportError("The redis package is required for a Redis cache.")
+        super().__init__()
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.generation_check_interval = generation_check_interval
+        self._generation = 0
+        self._generation_fetched_at = 0.0
+
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        pipeline = self.client.pipeline()
+        pipeline.get(self.prefix + key)
+        pipeline.pttl(self.prefix + key)
+        value, pttl = pipeline.execute()
+        if value is None:
+            return self._record(None)
+        expiry = time.time() + pttl / 1000 if pttl >= 0 else None
+        return self._record((value, expiry))
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        px = int(ttl * 1000) if ttl is not None else None
+        self.client.set(self.prefix + key, value, px=px)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+        self._increment_generation()
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+        self._increment_generation()
+
+    def _increment_generation(self) -> None:
+        self._generation = int(self.client.incr(self.prefix + "__generation__"))
+        self._generation_fetched_at = time.monotonic()
+
+    def generation(self) -> int:
+        now = time.monotonic()
+        if now - self._generation_fetched_at > self.generation_check_interval:
+            self._generation = int(self.client.get(self.prefix + "__generation__") or 0)
+            self._generation_fetched_at = now
+        return self._generation
+
+
+class TieredCache(CacheBackend):
+    """
+    A cache consisting of several layers, ordered from fastest to slowest.
+
+    Values are looked up layer by layer, and a value found in a slower layer is copied
+    to the faster layers. Values are stored in and deleted from all layers. Whenever
+    the invalidation generation of a layer changes (because a value has been deleted
+    in another process, for example), all the faster layers are cleared.
+
+    Parameters
+    ----------
+    layers:
+        The cache layers, ordered from fastest to slowest.
+
+    """
+
+    def __init__(self, layers: Sequence[CacheBackend]) -> None:
+        super().__init__()
+        if not layers:
+            raise ValueError("A tiered cache needs at least one layer.")
+        self.layers = list(layers)
+        self._generations = [layer.generation() for layer in self.layers]
+
+    def _synchronise(self) -> None:
+        # the generation of the fastest layer is irrelevant
+        for i in range(len(self.layers) - 1, 0, -1):
+            generation = self.layers[i].generation()
+            if generation != self._generations[i]:
+                for layer in self.layers[:i]:
+                    layer.clear()
+                self._generations = [layer.generation() for layer in self.layers]
+                return
+
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        self._synchronise()
+        for i, layer in enumerate(self.layers):
+            entry = layer.get_entry(key)
+            if entry is not None:
+                value, expiry = entry
+                ttl = expiry - time.time() if expiry is not None else None
+                for faster_layer in self.layers[:i]:
+                    faster_layer.set(key, value, ttl)
+                return self._record(entry)
+        return self._record(None)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        for layer in self.layers:
+            layer.set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        for layer in reversed(self.layers):
+            layer.delete(key)
+        self._generations = [layer.generation() for layer in self.layers]
+
+    def clear(self) -> None:
+        for layer in reversed(self.layers):
+            layer.clear()
+        self._generations = [layer.generation() for layer in self.layers]
+
+    def generation(self) -> int:
+        return sum(layer.generation() for layer in self.layers)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["layers"] = [layer.stats() for layer in self.layers]
+        return stats
+
+
+@lru_cache()
+def get_cache() -> CacheBackend:
+    """
+    Get the cache used by the Web Manager.
+
+    The cache always includes an in-process LRU cache. If a shared cache file is
+    defined in the settings, a shared memory cache is added, and if a cache URL is
+    defined, a Redis cache is added.
+    """
+    settings = CacheSettings()
+    layers: List[CacheBackend] = [LRUCache(max_entries=settings.cache_max_entries)]
+    if settings.shared_cache_file:
+        layers.append(SharedMemoryCache(settings.shared_cache_file))
+    if settings.cache_url:
+        layers.append(RedisCache(settings.cache_url))
+    if len(layers) == 1:
+        return layers[0]
+    return TieredCache(layers)
@@ -0,0 +1,75 @@
+"""
+Encoders for streaming exports.
+
+The encoders take an asynchronous iterator of row batches (as returned by
+`app.db.stream_rows`) and yield one chunk of bytes per batch, either as newline
+delimited JSON (NDJSON) or as CSV with a header line.
+"""
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, Sequence
+
+from starlette.responses import StreamingResponse
+
+from app.responses import dumps
+
+MEDIA_TYPES: Dict[str, str] = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def ndjson_chunks(
+    batches: AsyncIterator[Sequence[Sequence[Any]]], columns: Sequence[str]
+) -> AsyncIterator[bytes]:
+    """Encode row batches as newline delimited JSON."""
+    async for rows in batches:
+        yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+async def csv_chunks(
+    batches: AsyncIterator[Sequence[Sequence[Any]]], columns: Sequence[str]
+) -> AsyncIterator[bytes]:
+    """Encode row batches as CSV, preceded by a header line."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    async for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def encode(
+    batches: AsyncIterator[Sequence[Sequence[Any]]],
+    columns: Sequence[str],
+    export_format: str,
+) -> AsyncIterator[bytes]:
+    """Encode row batches in an export format ("ndjson" or "csv")."""
+    if export_format == "csv":
+        return csv_chunks(batches, columns)
+    if export_format == "ndjson":
+        return ndjson_chunks(batches, columns)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def export_response(
+    batches: AsyncIterator[Sequence[Sequence[Any]]],
+    columns: Sequence[str],
+    export_format: str,
+    filename: str,
+) -> StreamingResponse:
+    """
+    Create a streaming response for an export.
+
+    The response is sent chunk by chunk as the rows are read from the database. As
+    sending a chunk only completes when the server has passed it on, a slow client
+    slows down reading from the database rather than data piling up in memory.
+    """
+    return StreamingResponse(
+        encode(batches, columns, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{export_format}"'
+        },
+    )
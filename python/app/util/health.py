@@ -0,0 +1,129 @@
+"""
+Saturation signals for health checks.
+
+A worker process may be alive but so busy that its requests time out. The functions
+in this module collect signals indicating such saturation:
+
+* The event loop lag, i.e. how much later than scheduled a sleeping coroutine wakes
+  up. It is measured by an `EventLoopLagProbe` running as a background task. A high
+  lag means that something is blocking the event loop.
+* The number of tasks waiting for a thread in the threadpool used by Starlette for
+  synchronous dependencies and path operations.
+* The number of coroutines waiting for a database connection.
+* The number of password hashing operations in progress.
+
+`check_readiness` compares the signals with the thresholds defined in
+`app.settings.HealthSettings`.
+"""
+import asyncio
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app import db
+from app.settings import HealthSettings
+from app.util import auth
+
+
+class EventLoopLagProbe:
+    """
+    A probe measuring the event loop lag.
+
+    Parameters
+    ----------
+    interval:
+        The time (in seconds) between measurements.
+    window:
+        The number of recent measurements from which the maximum lag is computed.
+
+    """
+
+    def __init__(self, interval: float = 0.25, window: int = 20) -> None:
+        self.interval = interval
+        self._lags: Deque[float] = deque(maxlen=window)
+
+    async def run(self) -> None:
+        """Measure the lag every `interval` seconds, forever."""
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._lags.append(max(0.0, time.monotonic() - start - self.interval))
+
+    @property
+    def lag(self) -> Optional[float]:
+        """The most recent lag, or None if there is no measurement yet."""
+        return self._lags[-1] if self._lags else None
+
+    @property
+    def max_lag(self) -> Optional[float]:
+        """The maximum of the recent lags, or None if there is no measurement yet."""
+        return max(self._lags) if self._lags else None
+
+
+@lru_cache()
+def get_event_loop_lag_probe() -> EventLoopLagProbe:
+    """Get the event loop lag probe of the worker process."""
+    return EventLoopLagProbe()
+
+
+def threadpool_stats() -> Optional[Dict[str, int]]:
+    """
+    Return the number of threads and queued tasks of the threadpool.
+
+    The threadpool is the event loop's default executor, which Starlette uses for
+    running synchronous code. None is returned if the executor hasn't been created yet.
+    """
+    loop = asyncio.get_event_loop()
+    executor = getattr(loop, "_default_executor", None)
+    if executor is None:
+        return None
+    return {
+        "threads": len(getattr(executor, "_threads", ())),
+        "max_threads": getattr(executor, "_max_workers", 0),
+        "queued": executor._work_queue.qsize(),
+    }
+
+
+@lru_cache()
+def get_health_settings() -> HealthSettings:
+    """Get the thresholds for the readiness check."""
+    return HealthSettings()
+
+
+def check_readiness() -> Tuple[bool, Dict[str, Any]]:
+    """
+    Check whether the worker process is ready to handle requests.
+
+    Returns
+    -------
+    tuple
+        Whether the process is ready, and a report with the saturation signals and
+        the exceeded thresholds.
+
+    """
+    settings = get_health_settings()
+    probe = get_event_loop_lag_probe()
+    threadpool = threadpool_stats()
+    pool = db.pool_stats()
+    hashing_backlog = auth.hashing_backlog()
+
+    failures: List[str] = []
+    if probe.max_lag is not None and probe.max_lag > settings.max_event_loop_lag:
+        failures.append("event_loop_lag")
+    if threadpool is not None and threadpool["queued"] > settings.max_threadpool_queue:
+        failures.append("threadpool_queue")
+    if pool is not None and pool["waiting"] > settings.max_db_pool_waiting:
+        failures.append("db_pool_waiting")
+    if hashing_backlog > settings.max_hashing_backlog:
+        failures.append("hashing_backlog")
+
+    report = {
+        "status": "ok" if not failures else "saturated",
+        "failures": failures,
+        "event_loop_lag": {"latest": probe.lag, "max": probe.max_lag},
+        "threadpool": threadpool,
+        "db_pool": pool,
+        "hashing_backlog": hashing_backlog,
+    }
+    return not failures, report
@@ -0,0 +1,299 @@
+"""
+Structured, non-blocking logging.
+
+Writing log records to a stream or file from the event loop (or from the threads of
+Starlette's threadpool) would add I/O latency to every request. Instead, log records
+are put into a bounded queue by a `BoundedQueueHandler` and written by a background
+thread, as JSON objects with one object per line. If the queue is full, records are
+dropped (and counted) rather than blocking the caller.
+
+Requests are logged by the `RequestLoggingMiddleware`, which also assigns every
+request an id. The id is taken from the request's X-Request-ID header (if it has a
+valid one), returned in the X-Request-ID header of the response, and added to all
+records logged while the request is handled. Successful requests may be sampled per
+route (see `RequestSampler`), but failed and slow requests are always logged.
+
+Use `configure_logging` to set up logging for a worker process. It is configured
+with the settings in `app.settings.LogSettings`.
+"""
+import copy
+import logging
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Mapping, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.responses import dumps
+from app.settings import LogSettings
+
+# The id of the request being handled
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Attributes of every log record, which are not included as extra fields
+_STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "request_id",
+}
+
+# The logger for the request log
+request_logger = logging.getLogger("app.requests")
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    A formatter turning log records into JSON objects.
+
+    The objects contain the time, level, logger name, message and request id, as well
+    as all the extra fields passed with the `extra` argument of the logging call.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None) is not None:
+            entry["request_id"] = record.request_id  # type: ignore
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        try:
+            return dumps(entry).decode()
+        except TypeError:
+            # an extra field can't be serialised
+            return dumps(
+                {key: _loggable(value) for key, value in entry.items()}
+            ).decode()
+
+
+def _loggable(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    A handler putting log records into a bounded queue.
+
+    Records which don't fit into the queue are dropped, and the number of dropped
+    records is counted. The id of the current request is added to the records.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[Any]") -> None:
+        super().__init__(log_queue)
+        self.log_queue = log_queue
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The message and exception are formatted here rather than in the writer
+        # thread, as the arguments might be changed after the logging call. Unlike
+        # QueueHandler.prepare this keeps the exception separate from the message.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.log_queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestSampler:
+    """
+    A sampler deciding which requests are logged.
+
+    Parameters
+    ----------
+    rates:
+        Sampling rates (between 0 and 1) for successful requests, keyed by path
+        prefix. If several prefixes match, the longest one is used.
+    default_rate:
+        The sampling rate for successful requests matching none of the prefixes.
+    slow_request_threshold:
+        The duration (in seconds) above which a request is always logged.
+    min_unsampled_status:
+        The status code from which on requests are always logged. By default all
+        client and server errors (such as failed authentications) are logged.
+
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Mapping[str, float]] = None,
+        default_rate: float = 1,
+        slow_request_threshold: float = 1,
+        min_unsampled_status: int = 400,
+    ) -> None:
+        self.rates = sorted(
+            (rates or {}).items(), key=lambda item: len(item[0]), reverse=True
+        )
+        self.default_rate = default_rate
+        self.slow_request_threshold = slow_request_threshold
+        self.min_unsampled_status = min_unsampled_status
+
+    def rate(self, path: str) -> float:
+        """Return the sampling rate for successful requests to a path."""
+        for prefix, rate in self.rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def should_log(self, path: str, status: int, duration: float) -> bool:
+        """Decide whether a request is logged."""
+        if (
+            status >= self.min_unsampled_status
+            or duration > self.slow_request_threshold
+        ):
+            return True
+        rate = self.rate(path)
+        return rate >= 1 or random.random() < rate  # nosec
+
+
+class RequestLoggingMiddleware:
+    """
+    ASGI middleware assigning request ids and logging requests.
+
+    Parameters
+    ----------
+    app:
+        The ASGI application.
+    sampler:
+        The sampler deciding which requests are logged. All requests are logged if
+        this is None.
+
+    """
+
+    def __init__(self, app: ASGIApp, sampler: Optional[RequestSampler] = None) -> None:
+        self.app = app
+        self.sampler = sampler if sampler is not None else RequestSampler()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming_id = Headers(scope=scope).get(REQUEST_ID_HEADER)
+        if incoming_id is not None and _VALID_REQUEST_ID.match(incoming_id):
+            current_id = incoming_id
+        else:
+            current_id = uuid.uuid4().hex
+        token = request_id.set(current_id)
+
+        start = time.monotonic()
+        status = 500
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers[REQUEST_ID_HEADER] = current_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception:
+            self._log(scope, 500, time.monotonic() - start, exc_info=True)
+            raise
+        else:
+            self._log(scope, status, time.monotonic() - start)
+        finally:
+            request_id.reset(token)
+
+    def _log(
+        self, scope: Scope, status: int, duration: float, exc_info: bool = False
+    ) -> None:
+        if not self.sampler.should_log(scope["path"], status, duration):
+            return
+        level = logging.ERROR if status >= 500 else logging.INFO
+        request_logger.log(
+            level,
+            "%s %s %d",
+            scope["method"],
+            scope["path"],
+            status,
+            exc_info=exc_info,
+            extra={
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round(1000 * duration, 3),
+            },
+        )
+
+
+def get_request_sampler() -> RequestSampler:
+    """Get the request sampler configured in the log settings."""
+    settings = LogSettings()
+    return RequestSampler(
+        rates=settings.log_sample_rates,
+        default_rate=settings.log_sample_rate,
+        slow_request_threshold=settings.slow_request_threshold,
+        min_unsampled_status=settings.log_min_unsampled_status,
+    )
+
+
+def configure_logging() -> QueueListener:
+    """
+    Configure the root logger to log JSON records via a background thread.
+
+    The background thread is started, and the returned listener should be stopped
+    (with its stop method) when the worker process shuts down, so that all queued
+    records are written. This function should be called in every worker process, as
+    threads don't survive forking.
+    """
+    settings = LogSettings()
+    writer = logging.StreamHandler(sys.stderr)
+    writer.setFormatter(JSONFormatter())
+    log_queue: "queue.Queue[Any]" = queue.Queue(maxsize=settings.log_queue_size)
+    handler = BoundedQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    for existing_handler in root.handlers[:]:
+        if isinstance(existing_handler, BoundedQueueHandler):
+            root.removeHandler(existing_handler)
+    root.addHandler(handler)
+    root.setLevel(settings.log_level.upper())
+
+    listener = QueueListener(log_queue, writer, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def queue_stats() -> Dict[str, int]:
+    """Return the number of queued log records and of dropped log records."""
+    handlers = [
+        handler
+        for handler in logging.getLogger().handlers
+        if isinstance(handler, BoundedQueueHandler)
+    ]
+    return {
+        "queued": sum(handler.log_queue.qsize() for handler in handlers),
+        "dropped": sum(handler.dropped for handler in handlers),
+    }
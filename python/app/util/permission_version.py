@@ -0,0 +1,167 @@
+"""
+Permission versions for invalidating access tokens.
+
+An access token contains the user's permissions, which are not looked up again while
+the token is valid. To invalidate the tokens of a user whose permissions have changed,
+every user has a permission version, which is embedded in the token as well. A token
+is only accepted if its version is the user's current version.
+
+The versions are stored in an SQLite database, which all workers must share, and
+never expire. Every worker keeps the versions it has read in a dictionary and
+rereads a version if it hasn't done so for `revalidate_interval` seconds. A change
+thus invalidates the tokens immediately in the worker making it, and after at most
+`revalidate_interval` seconds in all the other workers.
+
+Every database has a random epoch, which is created with the database and is part
+of every version (see `version_epoch`). If the database is lost, the versions handed
+out by its replacement therefore differ from those in old tokens, which are rejected.
+"""
+import secrets
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from app.settings import PermissionSettings, SessionSettings
+
+# number of bits of a version used for counting changes; the epoch is stored above them
+_COUNTER_BITS = 32
+
+# number of bits of an epoch
+_EPOCH_BITS = 30
+
+
+def _new_epoch() -> int:
+    """Return a random epoch for a new database."""
+    return secrets.randbits(_EPOCH_BITS)
+
+
+def version_epoch(version: int) -> int:
+    """Return the epoch of the database which created a version."""
+    return version >> _COUNTER_BITS
+
+
+class PermissionVersionStore:
+    """
+    A store for the permission versions of users.
+
+    Parameters
+    ----------
+    database:
+        The SQLite database file for the versions. The versions are kept in memory
+        only if this is ":memory:".
+    revalidate_interval:
+        The time (in seconds) after which a version is reread from the database.
+
+    """
+
+    def __init__(
+        self, database: str = ":memory:", revalidate_interval: float = 5
+    ) -> None:
+        self.revalidate_interval = revalidate_interval
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            database, check_same_thread=False, isolation_level=None
+        )
+        if database != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        sql = """
+CREATE TABLE IF NOT EXISTS permission_versions (
+    username TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+)
+        """
+        self._connection.execute(sql)
+        sql = """
+CREATE TABLE IF NOT EXISTS permission_store (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    epoch INTEGER NOT NULL
+)
+        """
+        self._connection.execute(sql)
+        # if several workers create the database at once, only one epoch is stored
+        self._connection.execute(
+            "INSERT OR IGNORE INTO permission_store (id, epoch) VALUES (1, ?)",
+            (_new_epoch(),),
+        )
+        self.epoch: int = self._connection.execute(
+            "SELECT epoch FROM permission_store"
+        ).fetchone()[0]
+
+    def get(self, username: str) -> Optional[int]:
+        """Return the current version for a user, or None if the user has none."""
+        now = time.monotonic()
+        with self._lock:
+            known = self._versions.get(username)
+            if known is not None and now - known[1] <= self.revalidate_interval:
+                return known[0]
+            row = self._connection.execute(
+                "SELECT version FROM permission_versions WHERE username = ?",
+                (username,),
+            ).fetchone()
+            if row is None:
+                self._versions.pop(username, None)
+                return None
+            self._versions[username] = (int(row[0]), now)
+            return int(row[0])
+
+    def get_or_create(self, username: str) -> int:
+        """Return the current version for a user, creating one if need be."""
+        version = self.get(username)
+        if version is not None:
+            return version
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO permission_versions (username, version) "
+                "VALUES (?, ?)",
+                (username, self._new_version(0)),
+            )
+        version = self._reload(username)
+        assert version is not None  # nosec
+        return version
+
+    def change(self, username: str) -> int:
+        """Give a user a new version and return it."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT version FROM permission_versions WHERE username = ?",
+                (username,),
+            ).fetchone()
+            version = self._new_version(int(row[0]) if row is not None else 0)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO permission_versions (username, version) "
+                "VALUES (?, ?)",
+                (username, version),
+            )
+            self._versions[username] = (version, time.monotonic())
+        return version
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._connection.close()
+
+    def _reload(self, username: str) -> Optional[int]:
+        with self._lock:
+            self._versions.pop(username, None)
+        return self.get(username)
+
+    def _new_version(self, previous: int) -> int:
+        if version_epoch(previous) == self.epoch:
+            return previous + 1
+        return (self.epoch << _COUNTER_BITS) + 1
+
+
+@lru_cache()
+def get_permission_version_store() -> PermissionVersionStore:
+    """Get the permission version store used by the Web Manager."""
+    settings = PermissionSettings()
+    database = (
+        settings.permission_store_file
+        or SessionSettings().session_store_file
+        or ":memory:"
+    )
+    return PermissionVersionStore(
+        database=database, revalidate_interval=settings.permission_revalidate_interval
+    )
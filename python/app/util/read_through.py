@@ -0,0 +1,262 @@
+"""
+A read-through cache for reference data.
+
+Reference tables in the Science Database (such as the semesters and partners) hardly
+ever change, but they are needed by many requests. A `ReadThroughCache` keeps the
+results of loading such data in memory. Every entry has a time to live, and it is
+tagged with the database tables it has been loaded from.
+
+Rather than relying on the time to live alone, the cache can detect changes with a
+cheap probe, which returns a version (such as a table checksum) for every table. The
+probe is called with `check_for_changes` (usually every few seconds, see
+`probe_for_changes`), and all entries tagged with a table whose version has changed
+are removed in one go.
+
+Concurrent requests for the same missing entry share a single load, so that an
+expired entry doesn't cause a stampede of identical database queries. The number of
+entries is bounded, and the least recently used entries are evicted.
+
+The cache stores Python objects rather than bytes and is private to a worker
+process. It is meant to be used from the event loop only.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from app.util.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# A probe is called with table names and returns a version for each table.
+Probe = Callable[[Sequence[str]], Awaitable[Dict[str, Hashable]]]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+    tables: Tuple[str, ...]
+
+
+class ReadThroughCache:
+    """
+    A read-through cache with per-entry TTLs and change-based invalidation.
+
+    Parameters
+    ----------
+    max_entries:
+        The maximum number of entries.
+    default_ttl:
+        The default time to live (in seconds) of an entry.
+    probe:
+        An awaitable function returning a version for each of the tables it is
+        passed. Changes are not detected if this is None.
+
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        default_ttl: float = 3600,
+        probe: Optional[Probe] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.probe = probe
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._keys_by_table: Dict[str, Set[str]] = {}
+        self._versions: Dict[str, Hashable] = {}
+        self._loads: SingleFlight[Any] = SingleFlight()
+        # incremented whenever entries are invalidated, so that a load which was
+        # started before an invalidation doesn't store an outdated value
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.load_errors = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.probes = 0
+
+    async def get(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        tables: Sequence[str] = (),
+        ttl: Optional[float] = None,
+    ) -> T:
+        """
+        Return the value for a key, loading it if necessary.
+
+        Parameters
+        ----------
+        key:
+            The cache key.
+        loader:
+            An awaitable function loading the value.
+        tables:
+            The database tables the value is loaded from.
+        ttl:
+            The time to live (in seconds) of the value. The default time to live is
+            used if this is None.
+
+        Returns
+        -------
+        Any
+            The (cached or loaded) value.
+
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value  # type: ignore
+            self.expirations += 1
+            self._remove(key)
+
+        self.misses += 1
+
+        async def load() -> T:
+            generation = self._generation
+            try:
+                # record the versions before loading, so that changes made during or
+                # after the load are detected
+                unversioned = [t for t in tables if t not in self._versions]
+                if self.probe is not None and unversioned:
+                    self.probes += 1
+                    self._versions.update(await self.probe(unversioned))
+                value = await loader()
+            except Exception:
+                self.load_errors += 1
+                raise
+            if generation == self._generation:
+                self._store(key, value, tables, ttl)
+            return value
+
+        value: T = await self._loads.do(key, load)
+        return value
+
+    def _store(
+        self, key: str, value: Any, tables: Sequence[str], ttl: Optional[float]
+    ) -> None:
+        if ttl is None:
+            ttl = self.default_ttl
+        self._remove(key)
+        self._entries[key] = _Entry(value, time.monotonic() + ttl, tuple(tables))
+        for table in tables:
+            self._keys_by_table.setdefault(table, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self.evictions += 1
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table in entry.tables:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+                    self._versions.pop(table, None)
+
+    def invalidate(self, key: str) -> None:
+        """Remove an entry."""
+        self._generation += 1
+        if key in self._entries:
+            self.invalidations += 1
+            self._remove(key)
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """Remove all entries loaded from any of the given tables."""
+        self._generation += 1
+        keys: Set[str] = set()
+        for table in tables:
+            keys.update(self._keys_by_table.get(table, ()))
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._generation += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._keys_by_table.clear()
+        self._versions.clear()
+
+    async def check_for_changes(self) -> int:
+        """
+        Probe the tables of the cached entries for changes.
+
+        Entries loaded from a table whose version has changed since the last check are
+        removed. The number of removed entries is returned.
+        """
+        if self.probe is None or not self._keys_by_table:
+            return 0
+        tables = sorted(self._keys_by_table)
+        self.probes += 1
+        versions = await self.probe(tables)
+        changed = [
+            table
+            for table in tables
+            if table in self._versions and versions.get(table) != self._versions[table]
+        ]
+        for table in tables:
+            if table in self._keys_by_table and table in versions:
+                self._versions[table] = versions[table]
+        if not changed:
+            return 0
+        logger.info("Reference data changed in tables %s.", ", ".join(changed))
+        return self.invalidate_tables(changed)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "shared_loads": self._loads.shared,
+            "load_errors": self.load_errors,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "probes": self.probes,
+        }
+
+
+async def probe_for_changes(cache: ReadThroughCache, interval: float) -> None:
+    """Check a read-through cache for changes every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await cache.check_for_changes()
+        except Exception:
+            logger.exception("Probing reference data for changes failed.")
@@ -0,0 +1,228 @@
+"""
+Server-side sessions for cookie authentication.
+
+Instead of a JWT token, a browser may store an opaque session id in a cookie. The
+session id refers to a session in a `SessionStore`, which keeps all sessions in a
+dictionary (so that looking up and revoking a session is an O(1) operation) and
+persists them in an SQLite database.
+
+Sessions have a sliding expiry: whenever a session is used, its expiry time is
+extended. To avoid a database write for every request, the new expiry time is only
+persisted if it has moved by more than a tenth of the session lifetime.
+
+Every worker process has its own dictionary, but all workers on a host should share
+the same database file. A worker looks up sessions it doesn't know in the database,
+and it revalidates a known session against the database if it hasn't done so for
+`revalidate_interval` seconds. A revoked session is thus rejected immediately by the
+worker revoking it, and after at most `revalidate_interval` seconds by all the other
+workers.
+
+Only a hash of the session id is stored.
+"""
+import asyncio
+import hashlib
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from app.settings import SessionSettings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Session:
+    """A server-side session."""
+
+    username: str
+    expires_at: float
+    persisted_expires_at: float
+    checked_at: float
+
+
+class SessionStore:
+    """
+    A store for server-side sessions.
+
+    Parameters
+    ----------
+    database:
+        The SQLite database file for persisting the sessions. The sessions are kept in
+        memory only if this is ":memory:".
+    lifetime:
+        The time (in seconds) after which an unused session expires.
+    revalidate_interval:
+        The time (in seconds) after which a session is revalidated against the
+        database.
+
+    """
+
+    def __init__(
+        self,
+        database: str = ":memory:",
+        lifetime: float = 24 * 3600,
+        revalidate_interval: float = 5,
+    ) -> None:
+        self.lifetime = lifetime
+        self.revalidate_interval = revalidate_interval
+        self._sessions: Dict[str, Session] = {}
+        self._user_sessions: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(
+            database, check_same_thread=False, isolation_level=None
+        )
+        if database != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        sql = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    expires_at REAL NOT NULL
+)
+        """
+        self._connection.execute(sql)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_username ON sessions (username)"
+        )
+
+    @staticmethod
+    def _hash(session_id: str) -> str:
+        return hashlib.sha256(session_id.encode()).hexdigest()
+
+    def create(self, username: str) -> str:
+        """Create a session for a user and return the session id."""
+        session_id = secrets.token_urlsafe(32)
+        key = self._hash(session_id)
+        now = time.time()
+        expires_at = now + self.lifetime
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO sessions (id, username, expires_at) VALUES (?, ?, ?)",
+                (key, username, expires_at),
+            )
+            self._remember(key, Session(username, expires_at, expires_at, now))
+        return session_id
+
+    def get_username(self, session_id: str) -> Optional[str]:
+        """
+        Return the username for a session id, and extend the session's lifetime.
+
+        None is returned if the session does not exist or has expired.
+        """
+        key = self._hash(session_id)
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None or now - session.checked_at > self.revalidate_interval:
+                session = self._load(key, now)
+                if session is None:
+                    return None
+            if session.expires_at < now:
+                self._forget(key)
+                return None
+
+            session.expires_at = now + self.lifetime
+            if session.expires_at - session.persisted_expires_at > 0.1 * self.lifetime:
+                self._connection.execute(
+                    "UPDATE sessions SET expires_at = ? WHERE id = ?",
+                    (session.expires_at, key),
+                )
+                session.persisted_expires_at = session.expires_at
+            return session.username
+
+    def revoke(self, session_id: str) -> None:
+        """Revoke a session."""
+        key = self._hash(session_id)
+        with self._lock:
+            self._connection.execute("DELETE FROM sessions WHERE id = ?", (key,))
+            self._forget(key)
+
+    def revoke_user(self, username: str) -> None:
+        """Revoke all sessions of a user."""
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM sessions WHERE username = ?", (username,)
+            )
+            for key in list(self._user_sessions.get(username, set())):
+                self._forget(key)
+
+    def remove_expired(self) -> int:
+        """Remove all expired sessions and return the number of removed sessions."""
+        now = time.time()
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM sessions WHERE expires_at < ?", (now,)
+            )
+            for key in [k for k, s in self._sessions.items() if s.expires_at < now]:
+                self._forget(key)
+            return int(cursor.rowcount)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _load(self, key: str, now: float) -> Optional[Session]:
+        row = self._connection.execute(
+            "SELECT username, expires_at FROM sessions WHERE id = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._forget(key)
+            return None
+        username, persisted_expires_at = row
+        session = self._sessions.get(key)
+        expires_at = persisted_expires_at
+        if session is not None:
+            expires_at = max(session.expires_at, persisted_expires_at)
+        session = Session(username, expires_at, persisted_expires_at, now)
+        self._remember(key, session)
+        return session
+
+    def _remember(self, key: str, session: Session) -> None:
+        self._sessions[key] = session
+        self._user_sessions.setdefault(session.username, set()).add(key)
+
+    def _forget(self, key: str) -> None:
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            keys = self._user_sessions.get(session.username)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._user_sessions[session.username]
+
+
+@lru_cache()
+def get_session_settings() -> SessionSettings:
+    """Get the session settings."""
+    return SessionSettings()
+
+
+@lru_cache()
+def get_session_store() -> SessionStore:
+    """Get the session store used by the Web Manager."""
+    settings = get_session_settings()
+    return SessionStore(
+        database=settings.session_store_file or ":memory:",
+        lifetime=settings.session_lifetime_hours * 3600,
+    )
+
+
+async def collect_garbage(store: SessionStore, interval: float) -> None:
+    """Remove expired sessions from a session store every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # the database query blocks, so it must not run on the event loop
+            await run_in_threadpool(store.remove_expired)
+        except Exception:
+            logger.exception("Removing expired sessions failed.")
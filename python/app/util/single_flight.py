@@ -0,0 +1,198 @@
+"""
+Request coalescing.
+
+If many requests need the same expensive result at the same time (for example, the
+details of a user right after a proposal deadline), only one of them should compute
+it. A single-flight group shares one in-flight computation among all concurrent
+callers with the same key: the first caller starts the computation, and callers
+arriving while it is running wait for its result. Results are not cached; a caller
+arriving after the computation has finished starts a new one.
+
+There are two variants:
+
+* `SingleFlight` for coroutines running on the event loop.
+* `ThreadSingleFlight` for functions running in threads, such as synchronous
+  dependencies and path operations, which Starlette runs in a threadpool.
+
+An exception raised by the computation is raised for all the callers waiting for
+it.
+"""
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Optional,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+
+class _Group(ABC):
+    def __init__(self) -> None:
+        self.calls = 0
+        self.shared = 0
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Return the number of in-flight computations."""
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of calls, shared calls and in-flight computations."""
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self)}
+
+
+class SingleFlight(_Group, Generic[T]):
+    """
+    A single-flight group for coroutines.
+
+    The computation runs in a task of its own, so that cancelling a caller (for
+    example, because its client has disconnected) does not cancel the computation
+    for the other callers. The computation is only cancelled if all its callers have
+    been cancelled.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._tasks: Dict[Hashable, "asyncio.Task[T]"] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return the result of a coroutine function, sharing it with concurrent calls.
+
+        Parameters
+        ----------
+        key:
+            The key identifying the computation.
+        function:
+            A coroutine function performing the computation.
+
+        Returns
+        -------
+        Any
+            The result of the computation.
+
+        """
+        self.calls += 1
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(function())
+            self._tasks[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.shared += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._tasks.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0:
+                    task.cancel()
+            raise
+
+    def _finish(self, key: Hashable, task: "asyncio.Task[T]") -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+            del self._waiters[key]
+        # avoid "exception was never retrieved" warnings if nobody is waiting
+        if not task.cancelled():
+            task.exception()
+
+    def forget(self, key: Hashable) -> None:
+        """
+        Forget an in-flight computation.
+
+        Callers arriving afterwards start a new computation, while the callers already
+        waiting still get the result of the current one.
+        """
+        if key in self._tasks:
+            del self._tasks[key]
+            del self._waiters[key]
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+
+class _Call(Generic[T]):
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
+
+class ThreadSingleFlight(_Group, Generic[T]):
+    """A single-flight group for functions called from multiple threads."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._calls: Dict[Hashable, _Call[T]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        """
+        Return the result of a function, sharing it with concurrent calls.
+
+        Parameters
+        ----------
+        key:
+            The key identifying the computation.
+        function:
+            A function performing the computation.
+
+        Returns
+        -------
+        Any
+            The result of the computation.
+
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result  # type: ignore
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def forget(self, key: Hashable) -> None:
+        """
+        Forget an in-flight computation.
+
+        Callers arriving afterwards start a new computation, while the callers already
+        waiting still get the result of the current one.
+        """
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._calls)
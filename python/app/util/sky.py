@@ -0,0 +1,265 @@
+"""
+Positional queries for targets.
+
+Target positions are stored as unit vectors in NumPy arrays, and a `SkyIndex` buckets
+them into cells of roughly equal size: the sky is divided into declination zones, and
+each zone is divided into right ascension cells. The index is sorted by cell, so that
+the candidates for a cone search can be found with a few binary searches, after which
+the exact angular separations are computed for the candidates only.
+
+Updated and added targets go into a small delta buffer, which is searched by brute
+force, and removed targets are masked. The index is rebuilt when the delta buffer
+becomes large.
+
+All angles are in degrees.
+"""
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+
+FloatArray = npt.NDArray[np.float64]
+IntArray = npt.NDArray[np.int64]
+ArrayLike = Union[npt.ArrayLike, float]
+
+
+def sexagesimal_to_degrees(
+    ra_h: npt.ArrayLike,
+    ra_m: npt.ArrayLike,
+    ra_s: npt.ArrayLike,
+    dec_sign: npt.ArrayLike,
+    dec_d: npt.ArrayLike,
+    dec_m: npt.ArrayLike,
+    dec_s: npt.ArrayLike,
+) -> Tuple[FloatArray, FloatArray]:
+    """
+    Convert sexagesimal right ascensions and declinations to degrees.
+
+    The arguments correspond to the columns of the TargetCoordinates table. The sign
+    of the declination is given as "+" or "-".
+    """
+    ra = 15 * (
+        np.asarray(ra_h, dtype=np.float64)
+        + np.asarray(ra_m, dtype=np.float64) / 60
+        + np.asarray(ra_s, dtype=np.float64) / 3600
+    )
+    sign = np.where(np.asarray(dec_sign) == "-", -1.0, 1.0)
+    dec = sign * (
+        np.asarray(dec_d, dtype=np.float64)
+        + np.asarray(dec_m, dtype=np.float64) / 60
+        + np.asarray(dec_s, dtype=np.float64) / 3600
+    )
+    return ra, dec
+
+
+def unit_vectors(ra: ArrayLike, dec: ArrayLike) -> FloatArray:
+    """Convert right ascensions and declinations to unit vectors."""
+    ra_rad = np.radians(np.asarray(ra, dtype=np.float64))
+    dec_rad = np.radians(np.asarray(dec, dtype=np.float64))
+    cos_dec = np.cos(dec_rad)
+    return np.stack(
+        [cos_dec * np.cos(ra_rad), cos_dec * np.sin(ra_rad), np.sin(dec_rad)], axis=-1
+    )
+
+
+def angular_separation(vectors: FloatArray, center: FloatArray) -> FloatArray:
+    """Return the angular separations between unit vectors and a center vector."""
+    return np.degrees(np.arccos(np.clip(vectors @ center, -1.0, 1.0)))
+
+
+class SkyIndex:
+    """
+    A spatial index of targets for cone searches.
+
+    Parameters
+    ----------
+    zone_height:
+        The height of a declination zone, and the approximate width of a cell.
+    max_delta_fraction:
+        The size of the delta buffer (as a fraction of the number of targets) above
+        which the index is rebuilt.
+
+    """
+
+    # minimum size of the delta buffer before a rebuild is considered
+    MIN_DELTA_SIZE = 1000
+
+    def __init__(self, zone_height: float = 0.5, max_delta_fraction: float = 0.1):
+        self.zone_height = zone_height
+        self.max_delta_fraction = max_delta_fraction
+        self.zones = int(np.ceil(180 / zone_height))
+        self._max_cells = int(np.ceil(360 / zone_height))
+        # number of RA cells per zone, chosen so that cells are roughly square
+        zone_edges = np.linspace(-90, 90, self.zones + 1)
+        max_cos = np.maximum(
+            np.cos(np.radians(zone_edges[:-1])), np.cos(np.radians(zone_edges[1:]))
+        )
+        max_cos[(zone_edges[:-1] <= 0) & (zone_edges[1:] >= 0)] = 1
+        self._cells_per_zone = np.maximum(
+            1, np.floor(360 * max_cos / zone_height)
+        ).astype(np.int64)
+
+        self._ids: IntArray = np.empty(0, dtype=np.int64)
+        self._vectors: FloatArray = np.empty((0, 3))
+        self._keys: IntArray = np.empty(0, dtype=np.int64)
+        self._alive = np.empty(0, dtype=bool)
+        self._row_of_id: Dict[int, int] = {}
+        self._delta: Dict[int, FloatArray] = {}
+
+    @classmethod
+    def from_coordinates(
+        cls, ids: npt.ArrayLike, ra: npt.ArrayLike, dec: npt.ArrayLike, **kwargs: float
+    ) -> "SkyIndex":
+        """Create an index for targets with the given ids and positions."""
+        index = cls(**kwargs)
+        index._build(np.asarray(ids, dtype=np.int64), unit_vectors(ra, dec))
+        return index
+
+    def __len__(self) -> int:
+        return int(self._alive.sum()) + len(self._delta)
+
+    def _cell_keys(self, vectors: FloatArray) -> IntArray:
+        dec = np.degrees(np.arcsin(np.clip(vectors[:, 2], -1, 1)))
+        ra = np.degrees(np.arctan2(vectors[:, 1], vectors[:, 0])) % 360
+        zones = np.clip(
+            np.floor((dec + 90) / self.zone_height).astype(np.int64), 0, self.zones - 1
+        )
+        cells_per_zone = self._cells_per_zone[zones]
+        cells = np.minimum(
+            np.floor(ra / 360 * cells_per_zone).astype(np.int64), cells_per_zone - 1
+        )
+        return zones * self._max_cells + cells
+
+    def _build(self, ids: IntArray, vectors: FloatArray) -> None:
+        keys = self._cell_keys(vectors)
+        order = np.argsort(keys, kind="stable")
+        self._ids = ids[order]
+        self._vectors = vectors[order]
+        self._keys = keys[order]
+        self._alive = np.ones(len(ids), dtype=bool)
+        self._row_of_id = {int(id_): row for row, id_ in enumerate(self._ids)}
+        self._delta = {}
+
+    def rebuild(self) -> None:
+        """Merge the delta buffer into the index and drop removed targets."""
+        ids = [self._ids[self._alive]]
+        vectors = [self._vectors[self._alive]]
+        if self._delta:
+            ids.append(np.fromiter(self._delta.keys(), dtype=np.int64))
+            vectors.append(np.array(list(self._delta.values())))
+        self._build(np.concatenate(ids), np.concatenate(vectors))
+
+    def upsert(self, ids: npt.ArrayLike, ra: ArrayLike, dec: ArrayLike) -> None:
+        """Add targets, or update the positions of existing targets."""
+        ids_array = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        vectors = unit_vectors(np.atleast_1d(ra), np.atleast_1d(dec))
+        for id_, vector in zip(ids_array.tolist(), vectors):
+            row = self._row_of_id.pop(id_, None)
+            if row is not None:
+                self._alive[row] = False
+            self._delta[id_] = vector
+        self._maybe_rebuild()
+
+    def remove(self, ids: Iterable[int]) -> None:
+        """Remove targets. Unknown ids are ignored."""
+        for id_ in ids:
+            row = self._row_of_id.pop(int(id_), None)
+            if row is not None:
+                self._alive[row] = False
+            self._delta.pop(int(id_), None)
+        self._maybe_rebuild()
+
+    def _maybe_rebuild(self) -> None:
+        removed = len(self._alive) - len(self._row_of_id)
+        changes = len(self._delta) + removed
+        if changes > max(self.MIN_DELTA_SIZE, self.max_delta_fraction * len(self)):
+            self.rebuild()
+
+    def _candidate_rows(self, ra: float, dec: float, radius: float) -> IntArray:
+        first_zone = max(0, int(np.floor((dec - radius + 90) / self.zone_height)))
+        last_zone = min(
+            self.zones - 1, int(np.floor((dec + radius + 90) / self.zone_height))
+        )
+        if abs(dec) + radius >= 90:
+            half_width = 180.0
+        else:
+            half_width = float(
+                np.degrees(
+                    np.arcsin(
+                        min(1.0, np.sin(np.radians(radius)) / np.cos(np.radians(dec)))
+                    )
+                )
+            )
+
+        key_ranges: List[Tuple[int, int]] = []
+        for zone in range(first_zone, last_zone + 1):
+            cells = int(self._cells_per_zone[zone])
+            base = zone * self._max_cells
+            first = int(np.floor((ra - half_width) / 360 * cells))
+            last = int(np.floor((ra + half_width) / 360 * cells))
+            if last - first + 1 >= cells:
+                key_ranges.append((base, base + cells - 1))
+            elif first < 0:
+                key_ranges.append((base + first % cells, base + cells - 1))
+                key_ranges.append((base, base + last))
+            elif last >= cells:
+                key_ranges.append((base + first, base + cells - 1))
+                key_ranges.append((base, base + last % cells))
+            else:
+                key_ranges.append((base + first, base + last))
+
+        bounds = np.array(key_ranges, dtype=np.int64)
+        starts = np.searchsorted(self._keys, bounds[:, 0], side="left")
+        ends = np.searchsorted(self._keys, bounds[:, 1], side="right")
+        rows = np.concatenate(
+            [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+            or [np.empty(0, dtype=np.int64)]
+        )
+        alive_rows: IntArray = rows[self._alive[rows]]
+        return alive_rows
+
+    def cone_search(
+        self, ra: float, dec: float, radius: float
+    ) -> Tuple[IntArray, FloatArray]:
+        """
+        Find the targets within a radius of a position.
+
+        The ids of the targets and their angular separations from the position are
+        returned, sorted by separation.
+        """
+        center = unit_vectors(ra, dec)
+        min_cos = np.cos(np.radians(radius))
+
+        rows = self._candidate_rows(ra % 360, dec, radius)
+        candidate_vectors = self._vectors[rows]
+        dots = candidate_vectors @ center
+        inside = dots >= min_cos
+        ids = self._ids[rows[inside]]
+        dots = dots[inside]
+
+        if self._delta:
+            delta_ids = np.fromiter(self._delta.keys(), dtype=np.int64)
+            delta_dots = np.array(list(self._delta.values())) @ center
+            delta_inside = delta_dots >= min_cos
+            ids = np.concatenate([ids, delta_ids[delta_inside]])
+            dots = np.concatenate([dots, delta_dots[delta_inside]])
+
+        separations = np.degrees(np.arccos(np.clip(dots, -1.0, 1.0)))
+        order = np.argsort(separations, kind="stable")
+        return ids[order], separations[order]
+
+    def nearest(
+        self, ra: float, dec: float, count: int = 10, max_radius: float = 180
+    ) -> Tuple[IntArray, FloatArray]:
+        """
+        Find the targets nearest to a position.
+
+        The search radius is increased until `count` targets are found or the maximum
+        radius is reached. The ids and separations are returned as for `cone_search`.
+        """
+        radius = min(max_radius, 4 * self.zone_height)
+        while True:
+            ids, separations = self.cone_search(ra, dec, radius)
+            if len(ids) >= count or radius >= max_radius:
+                return ids[:count], separations[:count]
+            radius = min(max_radius, 2 * radius)
@@ -0,0 +1,430 @@
+"""
+SALT visibility windows.
+
+SALT's primary mirror is fixed at an altitude of 53 degrees, and the tracker can only
+follow a target while its altitude is between 47 and 59 degrees. Whether a target is
+visible is therefore a deterministic function of its position and the time, and the
+visibility windows of all targets can be computed in bulk.
+
+A target is visible while its altitude is in SALT's range and the Sun is below the
+twilight altitude. The hour angle ranges for SALT's altitude range follow analytically
+from a target's declination, and they are converted to time windows for all targets
+at once with NumPy. A target usually has two visibility windows per night, one as it
+rises through the annulus in the east and one as it sets in the west; only the first
+two windows are kept.
+
+The windows are stored in a `VisibilityCache`, a directory of NumPy files which are
+memory-mapped for lookups. Windows are stored as minutes since the start of the night
+(noon in South Africa, 10:00 UTC), and the cache is updated incrementally, so that
+windows are only recomputed for new targets and targets whose position has changed.
+"""
+import datetime
+import json
+import os
+import pathlib
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+
+# SALT's location
+SALT_LATITUDE = -32.3759
+SALT_LONGITUDE = 20.8107
+
+# SALT's altitude range, in degrees
+MIN_ALTITUDE = 47.0
+MAX_ALTITUDE = 59.0
+
+# maximum altitude of the Sun during the night
+TWILIGHT_ALTITUDE = -18.0
+
+# UTC time at which a night starts (noon in South Africa)
+NIGHT_START_UTC = datetime.time(10, 0)
+
+# value for missing windows
+NO_WINDOW = np.iinfo(np.uint16).max
+
+WINDOWS_PER_NIGHT = 2
+
+_J2000 = 2451545.0
+_UNIX_EPOCH_JD = 2440587.5
+
+
+def _julian_dates(start: datetime.datetime, minutes: npt.NDArray[np.float64]) -> Any:
+    unix_time = start.replace(tzinfo=datetime.timezone.utc).timestamp()
+    return _UNIX_EPOCH_JD + (unix_time + 60 * minutes) / 86400
+
+
+def local_sidereal_time(julian_dates: npt.NDArray[np.float64]) -> Any:
+    """Return the local sidereal time at SALT (in degrees) for Julian dates."""
+    gmst = 280.46061837 + 360.98564736629 * (julian_dates - _J2000)
+    return (gmst + SALT_LONGITUDE) % 360
+
+
+def sun_position(julian_dates: npt.NDArray[np.float64]) -> Tuple[Any, Any]:
+    """
+    Return the right ascension and declination (in degrees) of the Sun.
+
+    The low-precision formulae of the Astronomical Almanac are used, which are
+    accurate to about 0.01 degrees.
+    """
+    n = julian_dates - _J2000
+    mean_longitude = 280.460 + 0.9856474 * n
+    mean_anomaly = np.radians(357.528 + 0.9856003 * n)
+    ecliptic_longitude = np.radians(
+        mean_longitude + 1.915 * np.sin(mean_anomaly) + 0.020 * np.sin(2 * mean_anomaly)
+    )
+    obliquity = np.radians(23.439 - 0.0000004 * n)
+    ra = np.degrees(
+        np.arctan2(
+            np.cos(obliquity) * np.sin(ecliptic_longitude), np.cos(ecliptic_longitude)
+        )
+    )
+    dec = np.degrees(np.arcsin(np.sin(obliquity) * np.sin(ecliptic_longitude)))
+    return ra % 360, dec
+
+
+def altitude(ra: Any, dec: Any, lst: Any) -> Any:
+    """Return the altitude (in degrees) at SALT for positions and sidereal times."""
+    latitude = np.radians(SALT_LATITUDE)
+    hour_angle = np.radians(lst - ra)
+    dec_rad = np.radians(dec)
+    return np.degrees(
+        np.arcsin(
+            np.sin(latitude) * np.sin(dec_rad)
+            + np.cos(latitude) * np.cos(dec_rad) * np.cos(hour_angle)
+        )
+    )
+
+
+def night_start(night: datetime.date) -> datetime.datetime:
+    """Return the start (in UTC) of the night beginning on a date."""
+    return datetime.datetime.combine(night, NIGHT_START_UTC)
+
+
+def dark_time(night: datetime.date) -> Tuple[int, int]:
+    """
+    Return the start and end of the dark time in a night.
+
+    The times are given in minutes since the start of the night, with a resolution of
+    one minute.
+    """
+    minutes = np.arange(0, 24 * 60, dtype=np.float64)
+    julian_dates = _julian_dates(night_start(night), minutes)
+    sun_ra, sun_dec = sun_position(julian_dates)
+    dark = np.nonzero(
+        altitude(sun_ra, sun_dec, local_sidereal_time(julian_dates)) < TWILIGHT_ALTITUDE
+    )[0]
+    if len(dark) == 0:
+        return 0, 0
+    return int(dark[0]), int(dark[-1]) + 1
+
+
+def _hour_angle_ranges(
+    dec: npt.NDArray[np.float64],
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Return the hour angle ranges (in degrees) in which targets are in SALT's range.
+
+    Two ranges are returned for every target, as arrays of shape (targets, 2, 2), the
+    last axis containing the start and end of a range. Missing ranges have a start
+    and end of NaN.
+    """
+    latitude = np.radians(SALT_LATITUDE)
+    dec_rad = np.radians(dec)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # cos(H) for which the altitude is equal to the minimum or maximum altitude
+        denominator = np.cos(latitude) * np.cos(dec_rad)
+        cos_h_min = (
+            np.sin(np.radians(MIN_ALTITUDE)) - np.sin(latitude) * np.sin(dec_rad)
+        ) / denominator
+        cos_h_max = (
+            np.sin(np.radians(MAX_ALTITUDE)) - np.sin(latitude) * np.sin(dec_rad)
+        ) / denominator
+    h_min = np.degrees(np.arccos(np.clip(cos_h_min, -1, 1)))
+    h_max = np.degrees(np.arccos(np.clip(cos_h_max, -1, 1)))
+
+    # In general the target is in range for H_max <= |H| <= H_min, i.e. while rising
+    # in the east and while setting in the west. If it never rises above the maximum
+    # altitude (H_max = 0) or never sinks below the minimum altitude (H_min = 180), the
+    # two ranges merge.
+    ranges = np.full((len(dec), 2, 2), np.nan)
+    never = (cos_h_min > 1) | (cos_h_max < -1) | (h_max >= h_min)
+    merged_at_transit = ~never & (h_max == 0)
+    merged_at_antitransit = ~never & ~merged_at_transit & (h_min == 180)
+    separate = ~never & ~merged_at_transit & ~merged_at_antitransit
+
+    ranges[merged_at_transit, 0, 0] = -h_min[merged_at_transit]
+    ranges[merged_at_transit, 0, 1] = h_min[merged_at_transit]
+    ranges[merged_at_antitransit, 0, 0] = h_max[merged_at_antitransit]
+    ranges[merged_at_antitransit, 0, 1] = 360 - h_max[merged_at_antitransit]
+    ranges[separate, 0, 0] = -h_min[separate]
+    ranges[separate, 0, 1] = -h_max[separate]
+    ranges[separate, 1, 0] = h_max[separate]
+    ranges[separate, 1, 1] = h_min[separate]
+    return ranges[..., 0], ranges[..., 1]
+
+
+def compute_windows(
+    ra: npt.ArrayLike,
+    dec: npt.ArrayLike,
+    first_night: datetime.date,
+    nights: int,
+) -> npt.NDArray[np.uint16]:
+    """
+    Compute the visibility windows of targets.
+
+    The hour angle ranges in which a target is in SALT's altitude range are computed
+    analytically, and they are converted into time windows for every night. The cost
+    is thus proportional to the number of targets times the number of nights.
+
+    Parameters
+    ----------
+    ra:
+        The right ascensions of the targets, in degrees.
+    dec:
+        The declinations of the targets, in degrees.
+    first_night:
+        The date on which the first night starts.
+    nights:
+        The number of nights.
+
+    Returns
+    -------
+    array
+        An array of shape (targets, nights, 2, 2) with the start and end of the first
+        two visibility windows of each target in each night. Times are given in minutes
+        since the start of the night. Missing windows have the value NO_WINDOW.
+
+    """
+    ra_array = np.asarray(ra, dtype=np.float64).reshape(-1)
+    dec_array = np.asarray(dec, dtype=np.float64).reshape(-1)
+    targets = len(ra_array)
+    windows = np.full(
+        (targets, nights, WINDOWS_PER_NIGHT, 2), NO_WINDOW, dtype=np.uint16
+    )
+
+    range_starts, range_ends = _hour_angle_ranges(dec_array)
+    # sidereal degrees per minute
+    rate = 360.98564736629 / 1440
+    sidereal_day = 360 / rate
+
+    for night in range(nights):
+        date = first_night + datetime.timedelta(days=night)
+        dusk, dawn = dark_time(date)
+        if dusk == dawn or targets == 0:
+            continue
+        lst_at_dusk = local_sidereal_time(
+            _julian_dates(night_start(date), np.array([float(dusk)]))
+        )[0]
+
+        # minutes after dusk at which the hour angle next reaches the range start
+        # (H = LST - RA), and the minutes for which it stays in the range
+        first = ((range_starts + ra_array[:, np.newaxis] - lst_at_dusk) % 360) / rate
+        duration = (range_ends - range_starts) / rate
+
+        # the preceding occurrence may still be in progress at dusk
+        starts = np.concatenate([first - sidereal_day, first], axis=1)
+        ends = starts + np.concatenate([duration, duration], axis=1)
+        starts = np.clip(starts, 0, dawn - dusk)
+        ends = np.clip(ends, 0, dawn - dusk)
+        valid = ends > starts  # False for NaN
+        starts = np.where(valid, starts, np.inf)
+
+        order = np.argsort(starts, axis=1)[:, :WINDOWS_PER_NIGHT]
+        sorted_starts = np.take_along_axis(starts, order, axis=1)
+        sorted_ends = np.take_along_axis(ends, order, axis=1)
+        found = np.isfinite(sorted_starts)
+        windows[:, night, :, 0] = np.where(
+            found, np.round(dusk + np.where(found, sorted_starts, 0)), NO_WINDOW
+        )
+        windows[:, night, :, 1] = np.where(
+            found, np.round(dusk + np.where(found, sorted_ends, 0)), NO_WINDOW
+        )
+
+    return windows
+
+
+class VisibilityCache:
+    """
+    A cache of visibility windows, stored as memory-mapped NumPy files.
+
+    The cache directory contains the target ids (ids.npy), the target positions
+    (positions.npy), the windows (windows.npy) and some metadata (metadata.json).
+
+    Parameters
+    ----------
+    directory:
+        The cache directory. It is created if it doesn't exist.
+    first_night:
+        The date on which the first night starts.
+    nights:
+        The number of nights, such as the number of nights in a semester.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, pathlib.Path],
+        first_night: datetime.date,
+        nights: int,
+    ) -> None:
+        self.directory = pathlib.Path(directory)
+        self.first_night = first_night
+        self.nights = nights
+        self._ids: npt.NDArray[np.int64] = np.empty(0, dtype=np.int64)
+        self._positions: npt.NDArray[np.float64] = np.empty((0, 2))
+        self._windows: npt.NDArray[np.uint16] = np.empty(
+            (0, nights, WINDOWS_PER_NIGHT, 2), dtype=np.uint16
+        )
+        self._row_of_id: Dict[int, int] = {}
+        self._metadata_version: Optional[Tuple[int, int]] = None
+        self._load()
+
+    @property
+    def _metadata(self) -> Dict[str, object]:
+        return {
+            "first_night": self.first_night.isoformat(),
+            "nights": self.nights,
+            "site": [SALT_LATITUDE, SALT_LONGITUDE, MIN_ALTITUDE, MAX_ALTITUDE],
+        }
+
+    def _path(self, name: str) -> pathlib.Path:
+        return self.directory / name
+
+    def _load(self) -> None:
+        try:
+            with open(self._path("metadata.json")) as f:
+                self._metadata_version = self._file_version(os.fstat(f.fileno()))
+                metadata = json.load(f)
+        except FileNotFoundError:
+            return
+        if metadata != self._metadata:
+            # the cache is for another semester or configuration
+            return
+        self._ids = np.load(self._path("ids.npy"))
+        self._positions = np.load(self._path("positions.npy"))
+        self._windows = np.load(self._path("windows.npy"), mmap_mode="r")
+        self._row_of_id = {int(id_): row for row, id_ in enumerate(self._ids)}
+
+    def _save(
+        self,
+        ids: npt.NDArray[np.int64],
+        positions: npt.NDArray[np.float64],
+        windows: npt.NDArray[np.uint16],
+    ) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # write to temporary files first, so that readers never see partial files
+        for name, array in (
+            ("ids.npy", ids),
+            ("positions.npy", positions),
+            ("windows.npy", windows),
+        ):
+            tmp_path = self._path(f".{name}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, self._path(name))
+        tmp_path = self._path(".metadata.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._metadata, f)
+        os.replace(tmp_path, self._path("metadata.json"))
+        self._load()
+
+    @staticmethod
+    def _file_version(stat: os.stat_result) -> Tuple[int, int]:
+        # The metadata file is replaced last whenever the cache is saved, so that its
+        # inode and modification time change.
+        return stat.st_ino, stat.st_mtime_ns
+
+    def refresh(self) -> bool:
+        """
+        Reload the cache if it has been saved by another process (or cache object).
+
+        Whether the cache has been reloaded is returned.
+        """
+        try:
+            version = self._file_version(os.stat(self._path("metadata.json")))
+        except FileNotFoundError:
+            return False
+        if version == self._metadata_version:
+            return False
+        self._load()
+        return True
+
+    def update(self, ids: npt.ArrayLike, ra: npt.ArrayLike, dec: npt.ArrayLike) -> int:
+        """
+        Update the cache for a set of targets.
+
+        Windows are computed for targets which are not in the cache or whose position
+        has changed. Targets not included in the given set are removed from the cache.
+        The number of targets for which windows have been computed is returned.
+        """
+        ids_array = np.asarray(ids, dtype=np.int64)
+        positions = np.stack(
+            [np.asarray(ra, dtype=np.float64), np.asarray(dec, dtype=np.float64)],
+            axis=-1,
+        ).reshape(-1, 2)
+
+        windows = np.empty(
+            (len(ids_array), self.nights, WINDOWS_PER_NIGHT, 2), dtype=np.uint16
+        )
+        cached_rows = np.array(
+            [self._row_of_id.get(int(id_), -1) for id_ in ids_array], dtype=np.int64
+        )
+        unchanged = cached_rows >= 0
+        unchanged[unchanged] = np.all(
+            self._positions[cached_rows[unchanged]] == positions[unchanged], axis=1
+        )
+        windows[unchanged] = self._windows[cached_rows[unchanged]]
+
+        changed = ~unchanged
+        if changed.any():
+            windows[changed] = compute_windows(
+                positions[changed, 0],
+                positions[changed, 1],
+                self.first_night,
+                self.nights,
+            )
+
+        unchanged_set = (
+            len(ids_array) == len(self._ids)
+            and not changed.any()
+            and np.array_equal(ids_array, self._ids)
+        )
+        if not unchanged_set:
+            self._save(ids_array, positions, windows)
+        return int(changed.sum())
+
+    def windows(
+        self, target_id: int, night: datetime.date
+    ) -> Optional[List[Tuple[datetime.datetime, datetime.datetime]]]:
+        """
+        Return the visibility windows of a target in a night.
+
+        The start and end times of the windows are returned as naive UTC datetimes.
+        None is returned if the target or night is not in the cache.
+        """
+        row = self._row_of_id.get(target_id)
+        night_index = (night - self.first_night).days
+        if row is None or not 0 <= night_index < self.nights:
+            return None
+
+        start = night_start(night)
+        return [
+            (
+                start + datetime.timedelta(minutes=int(window_start)),
+                start + datetime.timedelta(minutes=int(window_end)),
+            )
+            for window_start, window_end in self._windows[row, night_index]
+            if window_start != NO_WINDOW
+        ]
+
+    def visible_minutes(self, night: datetime.date) -> Dict[int, int]:
+        """Return the total visibility time in a night (in minutes) for all targets."""
+        night_index = (night - self.first_night).days
+        if not 0 <= night_index < self.nights:
+            return {}
+        windows = self._windows[:, night_index].astype(np.int64)
+        durations = np.where(
+            windows[..., 0] != NO_WINDOW, windows[..., 1] - windows[..., 0], 0
+        ).sum(axis=1)
+        return dict(zip(self._ids.tolist(), durations.tolist()))
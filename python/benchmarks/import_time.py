@@ -0,0 +1,93 @@
+"""
+Measure the time it takes to import the Web Manager app.
+
+The import is done in fresh Python processes with Python's -X importtime option. The
+script outputs the best total import time and the slowest top-level imports, and it
+exits with a non-zero status if the import time exceeds the budget.
+
+Run it from the python folder:
+
+```shell
+python -m benchmarks.import_time --budget 400
+```
+"""
+import argparse
+import re
+import subprocess  # nosec
+import sys
+from typing import Dict, Tuple
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module: str) -> Tuple[int, Dict[str, int]]:
+    """
+    Import a module in a new process and return its import time.
+
+    A tuple of the cumulative import time and a dictionary of the cumulative import
+    times of the modules imported directly by the module is returned. All times are
+    in microseconds.
+    """
+    completed = subprocess.run(  # nosec
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Python lists a module after all the modules it imports
+    children: Dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        depth = len(match.group(3)) // 2
+        name = match.group(4)
+        cumulative_time = int(match.group(2))
+        if depth == 0:
+            if name == module:
+                return cumulative_time, children
+            children = {}
+        elif depth == 1:
+            children[name] = cumulative_time
+    raise ValueError(f"No import time found for {module}.")
+
+
+def main() -> None:
+    """Measure the import time of a module and check it against a budget."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--module", default="app.main", help="The module to import.")
+    parser.add_argument(
+        "--budget",
+        default=400,
+        type=int,
+        help="The import time budget, in milliseconds.",
+    )
+    parser.add_argument(
+        "--repeat", default=5, type=int, help="The number of measurements."
+    )
+    parser.add_argument(
+        "--top", default=10, type=int, help="The number of imports to list."
+    )
+    args = parser.parse_args()
+
+    best_total = None
+    best_times: Dict[str, int] = {}
+    for _ in range(args.repeat):
+        total, times = measure(args.module)
+        if best_total is None or total < best_total:
+            best_total = total
+            best_times = times
+
+    assert best_total is not None  # nosec
+    print(f"Slowest imports of {args.module}:")  # noqa
+    for name, t in sorted(best_times.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"  {t / 1000:8.1f} ms  {name}")  # noqa
+    print(f"Total: {best_total / 1000:.1f} ms (budget: {args.budget} ms)")  # noqa
+
+    if best_total / 1000 > args.budget:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark for serialising API responses.
+
+The benchmark compares FastAPI's default path (jsonable_encoder followed by
+Starlette's JSONResponse) with returning a FastJSONResponse directly, for lists of
+pydantic models of various sizes.
+
+Run it from the python folder:
+
+```shell
+python -m benchmarks.json_response
+```
+"""
+import timeit
+from typing import Any, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from app.responses import FastJSONResponse
+
+
+class Target(BaseModel):
+    id: int
+    name: str
+    ra: float
+    dec: float
+    magnitude: float
+    is_standard: bool
+
+
+class Proposal(BaseModel):
+    code: str
+    title: str
+    principal_investigator: str
+    targets: List[Target]
+
+
+def make_proposals(count: int) -> List[Proposal]:
+    return [
+        Proposal(
+            code=f"2021-1-SCI-{i:03d}",
+            title=f"A survey of interesting objects, part {i}",
+            principal_investigator=f"Investigator {i}",
+            targets=[
+                Target(
+                    id=10 * i + j,
+                    name=f"Target {10 * i + j}",
+                    ra=(i * 1.7) % 360,
+                    dec=-(j * 3.1) % 90,
+                    magnitude=12.5,
+                    is_standard=j == 0,
+                )
+                for j in range(10)
+            ],
+        )
+        for i in range(count)
+    ]
+
+
+def default_path(content: Any) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_path(content: Any) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def main() -> None:
+    header = f"{'proposals':>10} {'default (ms)':>14} {'fast (ms)':>11} {'speedup':>9}"
+    print(header)  # noqa
+    for count in (10, 100, 1000, 10000):
+        proposals = make_proposals(count)
+        number = max(1, 1000 // count)
+        default = min(
+            timeit.repeat(lambda: default_path(proposals), number=number, repeat=3)
+        )
+        fast = min(timeit.repeat(lambda: fast_path(proposals), number=number, repeat=3))
+        print(  # noqa
+            f"{count:>10} {1000 * default / number:>14.2f} "
+            f"{1000 * fast / number:>11.2f} {default / fast:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark for creating model instances on hot paths.
+
+The benchmark compares
+
+* turning a UserInDB into a User with `User(**user.dict())` with creating a
+  Principal, as done for every authenticated request,
+* parsing a cached user with `UserInDB.parse_raw` with trusted construction from
+  the decoded JSON, and
+* creating validated pydantic models with trusted construction, as done for every
+  row read from the database by the investigator and target services.
+
+Run it from the python folder:
+
+```shell
+python -m benchmarks.principal
+```
+"""
+import json
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.models.permission import Permission
+from app.models.principal import Principal
+from app.models.pydantic import Investigator, Target, User, UserInDB
+
+user = UserInDB(username="jane", hashed_password="$2b$12$" + 53 * "x")
+cached_user = user.json().encode()
+investigator: Dict[str, Any] = dict(
+    id=42, first_name="Jane", surname="Doe", email="jane.doe@example.com"
+)
+target: Dict[str, Any] = dict(id=42, name="NGC 104", ra=6.0223, dec=-72.0814)
+
+CASES: List[Tuple[str, Callable[[], Any], Callable[[], Any]]] = [
+    (
+        "principal",
+        lambda: User(**user.dict()),
+        lambda: Principal(user.username, Permission.NONE),
+    ),
+    (
+        "cached user",
+        lambda: UserInDB.parse_raw(cached_user),
+        lambda: UserInDB.construct(**json.loads(cached_user)),
+    ),
+    (
+        "investigator row",
+        lambda: Investigator(**investigator),
+        lambda: Investigator.construct(**investigator),
+    ),
+    (
+        "target row",
+        lambda: Target(**target),
+        lambda: Target.construct(**target),
+    ),
+]
+
+
+def main() -> None:
+    number = 100000
+    header = f"{'case':>16} {'validated (µs)':>15} {'trusted (µs)':>13} {'speedup':>9}"
+    print(header)  # noqa
+    for name, validated, trusted in CASES:
+        slow = min(timeit.repeat(validated, number=number, repeat=3))
+        fast = min(timeit.repeat(trusted, number=number, repeat=3))
+        print(  # noqa
+            f"{name:>16} {1e6 * slow / number:>15.2f} "
+            f"{1e6 * fast / number:>13.2f} {slow / fast:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
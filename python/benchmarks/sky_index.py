@@ -0,0 +1,109 @@
+"""
+Benchmark for cone searches.
+
+The benchmark compares cone searches with a SkyIndex against a naive scan, which
+converts the sexagesimal coordinates of every row of the TargetCoordinates table in
+Python (as would be necessary after a plain SQL query), and against a brute-force
+NumPy scan over all unit vectors.
+
+Run it from the python folder:
+
+```shell
+python -m benchmarks.sky_index
+```
+"""
+import math
+import random
+import timeit
+from typing import List, Tuple
+
+import numpy as np
+
+from app.util.sky import SkyIndex, sexagesimal_to_degrees, unit_vectors
+
+Row = Tuple[int, int, int, float, str, int, int, float]
+
+
+def fake_rows(count: int) -> List[Row]:
+    """Generate rows resembling those of the TargetCoordinates table."""
+    random.seed(42)
+    rows = []
+    for i in range(count):
+        dec = random.uniform(-75, 10)
+        rows.append(
+            (
+                i,
+                random.randint(0, 23),
+                random.randint(0, 59),
+                60 * random.random(),
+                "-" if dec < 0 else "+",
+                int(abs(dec)),
+                random.randint(0, 59),
+                60 * random.random(),
+            )
+        )
+    return rows
+
+
+def naive_scan(rows: List[Row], ra: float, dec: float, radius: float) -> List[int]:
+    """Find the targets in a cone by converting and checking row by row."""
+    ra0, dec0 = math.radians(ra), math.radians(dec)
+    min_cos = math.cos(math.radians(radius))
+    found = []
+    for id_, ra_h, ra_m, ra_s, dec_sign, dec_d, dec_m, dec_s in rows:
+        target_ra = math.radians(15 * (ra_h + ra_m / 60 + ra_s / 3600))
+        target_dec = math.radians(
+            (-1 if dec_sign == "-" else 1) * (dec_d + dec_m / 60 + dec_s / 3600)
+        )
+        cos_separation = math.sin(dec0) * math.sin(target_dec) + math.cos(
+            dec0
+        ) * math.cos(target_dec) * math.cos(target_ra - ra0)
+        if cos_separation >= min_cos:
+            found.append(id_)
+    return found
+
+
+def main() -> None:
+    radius = 0.5
+    queries = [(15 * h + 0.3, -60 + 5 * h) for h in range(0, 14)]
+    header = (
+        f"{'targets':>8} {'build (ms)':>11} {'naive (ms)':>11} {'numpy (ms)':>11} "
+        f"{'index (ms)':>11}"
+    )
+    print(header)  # noqa
+    for count in (10000, 100000, 500000):
+        rows = fake_rows(count)
+
+        def build() -> Tuple[np.ndarray, SkyIndex]:
+            columns = list(zip(*rows))
+            ra, dec = sexagesimal_to_degrees(*columns[1:])
+            ids = np.array(columns[0])
+            return unit_vectors(ra, dec), SkyIndex.from_coordinates(ids, ra, dec)
+
+        build_time = min(timeit.repeat(build, number=1, repeat=3))
+        vectors, index = build()
+
+        def numpy_scan() -> None:
+            for ra, dec in queries:
+                np.nonzero(vectors @ unit_vectors(ra, dec) >= np.cos(np.radians(0.5)))
+
+        def indexed() -> None:
+            for ra, dec in queries:
+                index.cone_search(ra, dec, radius)
+
+        def naive() -> None:
+            for ra, dec in queries:
+                naive_scan(rows, ra, dec, radius)
+
+        n = len(queries)
+        naive_time = min(timeit.repeat(naive, number=1, repeat=3)) / n
+        numpy_time = min(timeit.repeat(numpy_scan, number=5, repeat=3)) / (5 * n)
+        index_time = min(timeit.repeat(indexed, number=50, repeat=3)) / (50 * n)
+        print(  # noqa
+            f"{count:>8} {1000 * build_time:>11.1f} {1000 * naive_time:>11.2f} "
+            f"{1000 * numpy_time:>11.3f} {1000 * index_time:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
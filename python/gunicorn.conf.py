@@ -0,0 +1,38 @@
+"""
+Gunicorn configuration for running the Web Manager in preload mode.
+
+The app is imported and initialised once in the master process, and the worker
+processes are forked from it. The workers thus share the imported modules and the
+initialised settings and authentication backends (copy-on-write), and they start
+almost instantly.
+
+```shell
+gunicorn -c gunicorn.conf.py app.main:app
+```
+
+The number of workers and the address to bind to can be set with the environment
+variables WEB_CONCURRENCY and BIND. Unless the SHARED_CACHE_FILE environment variable
+is set, the workers share a cache in /dev/shm/web-manager-cache. Similarly, unless the
+PERMISSION_STORE_FILE environment variable is set, the workers share the permission
+versions of access tokens in /dev/shm/web-manager-permissions.sqlite, so that a token
+issued by one worker is accepted by all of them.
+"""
+import os
+from typing import Any
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")  # nosec
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+os.environ.setdefault("SHARED_CACHE_FILE", "/dev/shm/web-manager-cache")  # nosec
+os.environ.setdefault(
+    "PERMISSION_STORE_FILE", "/dev/shm/web-manager-permissions.sqlite"  # nosec
+)
+
+
+def on_starting(server: Any) -> None:
+    """Initialise the app in the master process, before any workers are forked."""
+    from app.main import preload
+
+    preload()
@@ -17,7 +17,8 @@ def mock_get_settings() -> Settings:
 def client() -> Generator[Session, None, None]:
     app.dependency_overrides[get_settings] = mock_get_settings
 
-    with TestClient(app) as client:
+    # session cookies are secure, and so they are only sent over HTTPS
+    with TestClient(app, base_url="https://testserver") as client:
         yield client
 
         app.dependency_overrides = {}
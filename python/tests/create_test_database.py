@@ -1,20 +1,33 @@
 import asyncio
+import hashlib
+import io
 import os
-import pathlib
 import random
+import re
 import subprocess
-import tempfile
+import time
 from random import randint
-from typing import Dict, List
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 import click
 import pydantic
 from aiomysql import connect
 from faker import Faker
 
+# The seed for the fake values
+FAKE_SEED = 4321
+
 fake = Faker()
-Faker.seed(4321)
-random.seed(4321)
 
 
 class Database(pydantic.BaseModel):
@@ -24,229 +37,415 @@ class Database(pydantic.BaseModel):
     password: str
 
 
-class TargetCoordinates(pydantic.BaseModel):
-    """Right ascension and declination."""
-
-    id: int
-    ra_h: int
-    ra_m: int
-    ra_s: float
-    dec_sign: str
-    dec_deg: int
-    dec_m: int
-    dec_s: float
+_used_email_users: Dict[str, int] = {}
+_used_usernames: Dict[str, int] = {}
 
 
-class InvestigatorDetails(pydantic.BaseModel):
-    """Investigator details."""
+def fake_investigator_details() -> Tuple[str, str, str, str]:
+    """Return a fake first name, last name, email address and phone number."""
 
-    id: int
-    first_name: str
-    last_name: str
-    email: str
-    phone: str
+    global _used_email_users
 
+    first_name = fake.first_name()
+    last_name = fake.last_name()
+    email_user = f"{first_name.lower()}.{last_name.lower()}"
+    if email_user in _used_email_users:
+        _used_email_users[email_user] += 1
+        email = (
+            f"{first_name.lower()}.{last_name.lower()}"
+            f"{_used_email_users.get(email_user)}@email.com"
+        )
+    else:
+        _used_email_users[email_user] = 1
+        email = f"{first_name.lower()}.{last_name.lower()}@email.com"
 
-async def get_all_investigator_ids(test_db_connection: connect) -> List[int]:
-    """
-    Get all the investigators ids.
+    return first_name, last_name, email, fake.phone_number()
 
-    Parameters
-    ----------
-    test_db_connection:
-        The test database connection.
 
-    Returns
-    -------
-    list
-        The List of investigators ids.
-
-    """
+def fake_pipt_user(pipt_user_id: int) -> Tuple[str, str]:
+    """Return a fake username and the MD5 hash of a password for a PIPT user."""
+    username = fake.user_name()
+    if username in _used_usernames:
+        _used_usernames[username] += 1
+        username = f"{username}{_used_usernames[username]}"
+    else:
+        _used_usernames[username] = 1
 
-    async with test_db_connection.cursor() as cur:
-        await cur.execute("SELECT Investigator_Id FROM Investigator")
-        results = await cur.fetchall()
-        return [investigator[0] for investigator in results]
+    passphrase = os.getenv("TEST_DB_USER_PASSPHRASE")
+    password = f"user-{pipt_user_id}-{passphrase}"
+    # this is the same hash as that computed by MySQL's MD5 function
+    password_hash = hashlib.md5(password.encode("utf-8")).hexdigest()  # nosec
+    return username, password_hash
 
 
-async def get_all_pipt_user_ids(test_db_connection: connect) -> List[int]:
+def fake_target_coordinates() -> Tuple[int, int, float, str, int, int, float]:
     """
-    Get all the PIPT user ids.
-
-    Parameters
-    ----------
-    test_db_connection:
-        The test database connection.
-
-    Returns
-    -------
-    list
-        The List of PIPT user ids.
+    Generate fake target coordinates.
 
+    The right ascension hours, minutes and seconds and the declination sign, degrees,
+    minutes and seconds are returned.
     """
+    dec_deg = randint(-75, 10)
+    sign = "-" if dec_deg < 0 else "+"
+    return (
+        randint(0, 23),
+        randint(0, 59),
+        60 * random.random(),
+        sign,
+        abs(dec_deg),
+        randint(0, 59),
+        60 * random.random(),
+    )
 
-    async with test_db_connection.cursor() as cur:
-        await cur.execute("SELECT PiptUser_Id FROM PiptUser")
-        results = await cur.fetchall()
-        return [pipt_user[0] for pipt_user in results]
 
+def reset_fake_values(table: str) -> None:
+    """
+    Reset the generators of fake values for a table.
 
-async def get_all_target_coordinate_ids(test_db_connection: connect) -> List[int]:
+    The generators are seeded with the table name, so that a table always gets the
+    same fake values, irrespective of which other tables have been copied before.
     """
-    Get all the target coordinate ids.
+    seed = f"{FAKE_SEED}-{table}"
+    fake.seed_instance(seed)
+    random.seed(seed)
+    _used_email_users.clear()
+    _used_usernames.clear()
 
-    Parameters
-    ----------
-    test_db_connection:
-        The database connection that have table TargetCoordinates as the table.
 
-    Returns
-    -------
-    list
-        The list of target coordinates ids.
+# Replacement values for the sensitive columns of a row, keyed by column name. The
+# function is called with the row's primary key.
+Anonymiser = Callable[[int], Dict[str, Any]]
 
-    """
 
-    async with test_db_connection.cursor() as cur:
-        await cur.execute("SELECT TargetCoordinates_Id FROM TargetCoordinates")
-        results = await cur.fetchall()
-        return [target_coordinates[0] for target_coordinates in results]
+def anonymise_investigator(investigator_id: int) -> Dict[str, Any]:
+    columns = ("FirstName", "Surname", "Email", "Phone")
+    return dict(zip(columns, fake_investigator_details()))
 
 
-_used_email_users: Dict[str, int] = {}
+def anonymise_pipt_user(pipt_user_id: int) -> Dict[str, Any]:
+    username, password_hash = fake_pipt_user(pipt_user_id)
+    return {"Username": username, "Password": password_hash}
 
 
-def fake_investigator_details(investigator_id: int) -> InvestigatorDetails:
-    """Return fake investigator details."""
+def anonymise_target_coordinates(target_coordinates_id: int) -> Dict[str, Any]:
+    columns = ("RaH", "RaM", "RaS", "DecSign", "DecD", "DecM", "DecS")
+    return dict(zip(columns, fake_target_coordinates()))
 
-    global _used_email_users
 
-    first_name = fake.first_name()
-    last_name = fake.last_name()
-    email_user = f"{first_name.lower()}.{last_name.lower()}"
-    if email_user in _used_email_users:
-        _used_email_users[email_user] += 1
-        email = (
-            f"{first_name.lower()}.{last_name.lower()}"
-            f"{_used_email_users.get(email_user)}@email.com"
-        )
-    else:
-        _used_email_users[email_user] = 1
-        email = f"{first_name.lower()}.{last_name.lower()}@email.com"
+# The tables with sensitive information, and the functions for anonymising their rows
+ANONYMISERS: Dict[str, Anonymiser] = {
+    "Investigator": anonymise_investigator,
+    "PiptUser": anonymise_pipt_user,
+    "TargetCoordinates": anonymise_target_coordinates,
+}
 
-    return InvestigatorDetails(
-        id=investigator_id,
-        first_name=first_name,
-        last_name=last_name,
-        email=email,
-        phone=fake.phone_number(),
-    )
+_CREATE_TABLE = re.compile(r"^CREATE TABLE `([^`]+)` \(")
+_COLUMN = re.compile(r"^  `([^`]+)` ")
+_INSERT = re.compile(r"^INSERT INTO `([^`]+)` VALUES ")
+# a value in an INSERT statement, i.e. a (possibly prefixed) string or a literal
+_VALUE = re.compile(r"(?:_\w+ ?)?'(?:[^'\\]|\\.)*'|[^,()']*", re.DOTALL)
+
+_ESCAPES = {
+    "\\": "\\\\",
+    "'": "\\'",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\0": "\\0",
+    "\x1a": "\\Z",
+}
 
 
-async def update_investigators(test_db_connection: connect) -> None:
+def parse_rows(values: str) -> List[List[str]]:
     """
-    Replace the sensitive data in the Investigator table with fake data.
+    Parse the rows of an INSERT statement.
 
     Parameters
     ----------
-    test_db_connection
-        The test database connection.
+    values:
+        The part of the statement following "VALUES", without the final semicolon.
 
-    """
+    Returns
+    -------
+    list
+        The rows, as lists of SQL literals.
 
-    investigator_ids = await get_all_investigator_ids(test_db_connection)
-    investigator_details_list = [
-        fake_investigator_details(investigator_id)
-        for investigator_id in investigator_ids
-    ]
-    data = [
-        (
-            details.first_name,
-            details.last_name,
-            details.email,
-            details.phone,
-            details.id,
-        )
-        for details in investigator_details_list
-    ]
-    sql = """
-UPDATE Investigator
-SET  FirstName = %s, Surname = %s, Email = %s, Phone = %s
-WHERE Investigator_Id = %s;
     """
-    cursor = await test_db_connection.cursor()
-    await cursor.executemany(sql, data)
-
-
-async def update_pipt_users(test_db_connection: connect) -> None:
+    rows: List[List[str]] = []
+    pos = 0
+    while pos < len(values):
+        if values[pos] != "(":
+            raise ValueError(f"Expected a row at position {pos}.")
+        pos += 1
+        row: List[str] = []
+        while True:
+            match = _VALUE.match(values, pos)
+            row.append(match.group())  # type: ignore
+            pos = match.end()  # type: ignore
+            separator = values[pos : pos + 1]  # noqa: E203
+            pos += 1
+            if separator == ")":
+                break
+            if separator != ",":
+                raise ValueError(f"Unexpected character at position {pos - 1}.")
+        rows.append(row)
+        if values[pos : pos + 1] == ",":  # noqa: E203
+            pos += 1
+    return rows
+
+
+def format_rows(rows: Iterable[Sequence[str]]) -> str:
+    """Format rows of SQL literals for an INSERT statement."""
+    return ",".join(f"({','.join(row)})" for row in rows)
+
+
+def sql_literal(value: Any) -> str:
+    """Convert a value to an SQL literal."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + "".join(_ESCAPES.get(c, c) for c in str(value)) + "'"
+
+
+class DumpAnonymiser:
     """
-    Replace the sensitive data in the PiptUser table with fake data.
+    A filter replacing sensitive values in a mysqldump output stream.
+
+    The column names of a table are taken from its CREATE TABLE statement, which
+    mysqldump writes before the INSERT statements for the table. The values of the
+    rows in INSERT statements for tables with an anonymiser are replaced, all other
+    lines are passed on unchanged. The first column of these tables must be the
+    primary key.
 
     Parameters
     ----------
-    test_db_connection
-        The test database connection.
+    anonymisers:
+        The functions for anonymising rows, keyed by table name.
 
     """
 
-    pipt_user_ids = await get_all_pipt_user_ids(test_db_connection)
-    passphrase = os.getenv("TEST_DB_USER_PASSPHRASE")
-    data = [
-        (fake.user_name(), f"user-{pipt_user_id}-{passphrase}", pipt_user_id)
-        for pipt_user_id in pipt_user_ids
-    ]
-    sql = """
-UPDATE PiptUser
-SET Username = %s, Password = MD5(%s)
-WHERE PiptUser_Id = %s;
+    def __init__(self, anonymisers: Optional[Dict[str, Anonymiser]] = None) -> None:
+        self.anonymisers = anonymisers if anonymisers is not None else ANONYMISERS
+        self.columns: Dict[str, List[str]] = {}
+        self.anonymised_rows: Dict[str, int] = {}
+        self._current_table: Optional[str] = None
+
+    def transform(self, lines: Iterable[str]) -> Iterator[str]:
+        """Transform the lines of a dump."""
+        for line in lines:
+            yield self.transform_line(line)
+
+    def transform_line(self, line: str) -> str:
+        """Transform a line of a dump."""
+        if self._current_table is not None:
+            column = _COLUMN.match(line)
+            if column:
+                self.columns[self._current_table].append(column.group(1))
+            else:
+                self._current_table = None
+            return line
+
+        if line.startswith("CREATE TABLE"):
+            create_table = _CREATE_TABLE.match(line)
+            if create_table and create_table.group(1) in self.anonymisers:
+                self._current_table = create_table.group(1)
+                self.columns[self._current_table] = []
+            return line
+
+        if line.startswith("INSERT INTO"):
+            insert = _INSERT.match(line)
+            if insert and insert.group(1) in self.anonymisers:
+                return self._anonymise_insert(insert.group(1), line, insert.end())
+        return line
+
+    def _anonymise_insert(self, table: str, line: str, values_start: int) -> str:
+        columns = self.columns.get(table)
+        if not columns:
+            raise ValueError(f"No CREATE TABLE statement found for table {table}.")
+        indices = {column: index for index, column in enumerate(columns)}
+        anonymiser = self.anonymisers[table]
+
+        statement = line.rstrip("\r\n")
+        if not statement.endswith(";"):
+            raise ValueError(f"Incomplete INSERT statement for table {table}.")
+        rows = parse_rows(statement[values_start:-1])
+        for row in rows:
+            for column, value in anonymiser(int(row[0])).items():
+                row[indices[column]] = sql_literal(value)
+        self.anonymised_rows[table] = self.anonymised_rows.get(table, 0) + len(rows)
+
+        line_ending = line[len(statement) :]  # noqa: E203
+        return line[:values_start] + format_rows(rows) + ";" + line_ending
+
+
+# The views which are not copied to the test database
+EXCLUDED_VIEWS = ("V_P1ProposalInstruments", "V_ProposalInstruments")
+
+# The MySQL data types of integer columns
+_INTEGER_TYPES = {"tinyint", "smallint", "mediumint", "int", "bigint"}
+
+
+class PhaseState(pydantic.BaseModel):
     """
-    cursor = await test_db_connection.cursor()
-    await cursor.executemany(sql, data)
+    The state of a phase of a createtestdb run.
 
+    The status is "started" or "done". The time (in seconds) and the size of the
+    streamed dump (in characters) are summed over all attempts, whereas the number of
+    rows is that of the table after the last attempt.
+    """
 
-def fake_target_coordinates(target_coordinates_id: int) -> TargetCoordinates:
-    """Generate fake target coordinates."""
-    dec_deg = randint(-75, 10)
-    sign = "-" if dec_deg < 0 else "+"
-    return TargetCoordinates(
-        id=target_coordinates_id,
-        ra_h=randint(0, 23),
-        ra_m=randint(0, 59),
-        ra_s=60 * random.random(),
-        dec_sign=sign,
-        dec_deg=abs(dec_deg),
-        dec_m=randint(0, 59),
-        dec_s=60 * random.random(),
-    )
+    status: str
+    seconds: float = 0
+    rows: Optional[int] = None
+    size: int = 0
+
+
+class RunState(pydantic.BaseModel):
+    """The state of a createtestdb run."""
+
+    source: str
+    test: str
+    phases: Dict[str, PhaseState] = {}
+
+
+def database_id(db: Database) -> str:
+    """Return an identifier for a database, which doesn't include the password."""
+    return f"{db.username}@{db.host}/{db.database}"
 
 
-async def update_target_coordinates(test_db_connection: connect) -> None:
+class Checkpoint:
     """
-    Replace the sensitive data in the TargetCoordinates table with fake data.
+    The phases of a createtestdb run, recorded in a state file.
+
+    The state file is a JSON file, which is rewritten whenever a phase starts or
+    finishes, so that an interrupted run can be resumed.
 
     Parameters
     ----------
-    test_db_connection
-        A test database connection.
+    path:
+        The path of the state file.
+    source_db:
+        The source database.
+    test_db:
+        The test database.
+    resume:
+        Whether to resume the run recorded in the state file. If False, any existing
+        state file is ignored (and overwritten).
 
     """
 
-    target_coordinate_ids = await get_all_target_coordinate_ids(test_db_connection)
-    target_coordinate_list = [
-        fake_target_coordinates(target_coordinate_id)
-        for target_coordinate_id in target_coordinate_ids
-    ]
-    data = [
-        (tc.ra_h, tc.ra_m, tc.ra_s, tc.dec_sign, tc.dec_deg, tc.dec_m, tc.dec_s, tc.id)
-        for tc in target_coordinate_list
-    ]
-    sql = """
-UPDATE TargetCoordinates
-SET RaH=%s, RaM=%s, RaS=%s, DecSign=%s, DecD=%s, DecM=%s, DecS=%s
-WHERE TargetCoordinates_Id=%s;
+    def __init__(
+        self, path: str, source_db: Database, test_db: Database, resume: bool = False
+    ) -> None:
+        self.path = path
+        self.skipped: List[str] = []
+        source = database_id(source_db)
+        test = database_id(test_db)
+        if resume and os.path.exists(path):
+            self.state = RunState.parse_file(path)
+            if self.state.source != source or self.state.test != test:
+                raise click.ClickException(
+                    f"The state file {path} is for copying {self.state.source} to "
+                    f"{self.state.test}, not {source} to {test}."
+                )
+        else:
+            self.state = RunState(source=source, test=test)
+
+    def status(self, phase: str) -> Optional[str]:
+        """Return the status of a phase, or None if the phase hasn't started yet."""
+        state = self.state.phases.get(phase)
+        return state.status if state is not None else None
+
+    def is_done(self, phase: str) -> bool:
+        """Check whether a phase is done."""
+        return self.status(phase) == "done"
+
+    def skip(self, phase: str) -> None:
+        """Record that a phase is skipped, as it was done in a previous run."""
+        self.skipped.append(phase)
+
+    def reset(self) -> None:
+        """Forget all phases."""
+        self.state.phases = {}
+        self.save()
+
+    def start(self, phase: str) -> None:
+        """Record that a phase has started."""
+        state = self.state.phases.setdefault(phase, PhaseState(status="started"))
+        state.status = "started"
+        self.save()
+
+    def finish(
+        self, phase: str, seconds: float, rows: Optional[int] = None, size: int = 0
+    ) -> None:
+        """Record that a phase is done."""
+        state = self.state.phases[phase]
+        state.status = "done"
+        state.seconds += seconds
+        state.rows = rows
+        state.size += size
+        self.save()
+
+    def fail(self, phase: str, seconds: float, size: int = 0) -> None:
+        """Record the time and dump size of a failed attempt at a phase."""
+        state = self.state.phases[phase]
+        state.seconds += seconds
+        state.size += size
+        self.save()
+
+    def save(self) -> None:
+        """Write the state file."""
+        # write to a temporary file first, so that the state file is never corrupt
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as f:
+            f.write(self.state.json(indent=2))
+        os.replace(temporary_path, self.path)
+
+
+def format_summary(checkpoint: Checkpoint) -> str:
     """
-    cursor = await test_db_connection.cursor()
-    await cursor.executemany(sql, data)
+    Format a table with the time, rows and throughput of the phases of a run.
+
+    Phases done in a previous run are marked as skipped, and phases which haven't
+    been completed as failed.
+    """
+    header = (
+        f"{'Phase':<40} {'Status':<8} {'Time (s)':>10} {'Rows':>12} "
+        f"{'Rows/s':>10} {'MB/s':>8}"
+    )
+    lines = [header, "-" * len(header)]
+    total_seconds = 0.0
+    total_rows = 0
+    total_size = 0
+    for phase, state in checkpoint.state.phases.items():
+        if phase in checkpoint.skipped:
+            status = "skipped"
+        elif state.status == "done":
+            status = "done"
+        else:
+            status = "failed"
+        rows = f"{state.rows:,}" if state.rows is not None else "-"
+        if state.seconds > 0 and state.rows is not None:
+            rows_per_second = f"{state.rows / state.seconds:,.0f}"
+        else:
+            rows_per_second = "-"
+        if state.seconds > 0 and state.size:
+            megabytes_per_second = f"{state.size / state.seconds / 1e6:.2f}"
+        else:
+            megabytes_per_second = "-"
+        lines.append(
+            f"{phase:<40} {status:<8} {state.seconds:>10.1f} {rows:>12} "
+            f"{rows_per_second:>10} {megabytes_per_second:>8}"
+        )
+        total_seconds += state.seconds
+        total_rows += state.rows or 0
+        total_size += state.size
+    lines.append("-" * len(header))
+    lines.append(
+        f"{'Total':<40} {'':<8} {total_seconds:>10.1f} {total_rows:>12,} "
+        f"{'':>10} {total_size / max(total_seconds, 1e-9) / 1e6:>8.2f}"
+    )
+    return "\n".join(lines)
 
 
 async def create_empty_test_database(
@@ -280,92 +479,319 @@ async def create_empty_test_database(
         await cur.execute(create_query)
 
 
-async def replace_sensitive_info(test_db_connection: connect) -> None:
-    """Replace sensitive information in the test database with fake data."""
-    await update_investigators(test_db_connection)
-    await update_pipt_users(test_db_connection)
-    await update_target_coordinates(test_db_connection)
+async def list_tables(source_db_connection: connect) -> Tuple[List[str], List[str]]:
+    """
+    Return the names of the base tables and views of the source database.
 
+    The views in EXCLUDED_VIEWS are omitted.
+    """
+    async with source_db_connection.cursor() as cur:
+        await cur.execute("""
+SELECT TABLE_NAME, TABLE_TYPE
+FROM information_schema.TABLES
+WHERE TABLE_SCHEMA = DATABASE()
+ORDER BY TABLE_NAME
+        """)
+        rows = await cur.fetchall()
+    tables = [name for name, table_type in rows if table_type == "BASE TABLE"]
+    views = [
+        name
+        for name, table_type in rows
+        if table_type == "VIEW" and name not in EXCLUDED_VIEWS
+    ]
+    return tables, views
 
-def dump_database(
-    db_user: str, db_password: str, db_host: str, db_name: str, dump_file: pathlib.Path
-) -> None:
-    subprocess.run(
-        [
-            "mysqldump",
-            "-u",
-            db_user,
-            f"-p{db_password}",
-            "-h",
-            db_host,
-            "--default-character-set=utf8",
-            "--single-transaction",
-            "-r",
-            dump_file,
-            f"--ignore-table={db_name}.V_P1ProposalInstruments",
-            f"--ignore-table={db_name}.V_ProposalInstruments",
-            db_name,
-        ]
-    )
 
+async def integer_primary_key(db_connection: connect, table: str) -> Optional[str]:
+    """
+    Return the primary key column of a table.
 
-async def create_test_database(source_db: Database, test_db: Database) -> None:
-    """Create the test database."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        dump_file = pathlib.Path(tmp_dir) / "dump.sql"
+    None is returned if the table doesn't exist, or if its primary key is not a
+    single integer column.
+    """
+    async with db_connection.cursor() as cur:
+        await cur.execute(
+            """
+SELECT k.COLUMN_NAME, c.DATA_TYPE
+FROM information_schema.KEY_COLUMN_USAGE AS k
+JOIN information_schema.COLUMNS AS c
+     ON k.TABLE_SCHEMA = c.TABLE_SCHEMA
+     AND k.TABLE_NAME = c.TABLE_NAME
+     AND k.COLUMN_NAME = c.COLUMN_NAME
+WHERE k.TABLE_SCHEMA = DATABASE()
+      AND k.TABLE_NAME = %(table)s
+      AND k.CONSTRAINT_NAME = 'PRIMARY'
+        """,
+            {"table": table},
+        )
+        rows = await cur.fetchall()
+    if len(rows) != 1 or rows[0][1] not in _INTEGER_TYPES:
+        return None
+    return str(rows[0][0])
 
-        # dump the source database
-        dump_database(
-            db_user=source_db.username,
-            db_password=source_db.password,
-            db_host=source_db.host,
-            db_name=source_db.database,
-            dump_file=dump_file,
+
+async def resume_point(
+    test_db_connection: connect, table: str
+) -> Optional[Tuple[str, int]]:
+    """
+    Return the primary key column and largest key of a partially copied table.
+
+    As tables are dumped ordered by primary key and every INSERT statement is
+    committed separately, all rows up to the largest key in the test database have
+    been copied. None is returned if copying cannot be continued, and the table must
+    be copied from scratch.
+    """
+    if table in ANONYMISERS:
+        # duplicate fake values are avoided by generating all the values in one go
+        return None
+    primary_key = await integer_primary_key(test_db_connection, table)
+    if primary_key is None:
+        return None
+    async with test_db_connection.cursor() as cur:
+        await cur.execute(f"SELECT MAX(`{primary_key}`) FROM `{table}`")
+        (largest_key,) = await cur.fetchone()
+    if largest_key is None:
+        return None
+    return primary_key, int(largest_key)
+
+
+async def count_rows(db_connection: connect, table: str) -> int:
+    """Return the number of rows in a table."""
+    async with db_connection.cursor() as cur:
+        await cur.execute(f"SELECT COUNT(*) FROM `{table}`")
+        (count,) = await cur.fetchone()
+    return int(count)
+
+
+def dump_command(
+    db: Database, tables: Sequence[str], options: Sequence[str] = ()
+) -> List[str]:
+    """
+    Return the mysqldump command for dumping tables or views to stdout.
+
+    The dump uses --single-transaction, so that the dumped tables are consistent with
+    each other. This only holds for the tables of a single dump, though.
+    """
+    return [
+        "mysqldump",
+        "-u",
+        db.username,
+        f"-p{db.password}",
+        "-h",
+        db.host,
+        "--default-character-set=utf8",
+        "--single-transaction",
+        *options,
+        db.database,
+        *tables,
+    ]
+
+
+def import_command(db: Database) -> List[str]:
+    """Return the mysql command for importing a dump from stdin."""
+    return [
+        "mysql",
+        "-u",
+        db.username,
+        f"-p{db.password}",
+        "-h",
+        db.host,
+        "--default-character-set=utf8",
+        db.database,
+    ]
+
+
+class DumpStream:
+    """
+    A stream of a dump from mysqldump through a DumpAnonymiser into mysql.
+
+    The stream counts the characters passed on to mysql, so that the size is known
+    even if the stream fails.
+    """
+
+    def __init__(self, anonymiser: Optional[DumpAnonymiser] = None) -> None:
+        self.anonymiser = anonymiser if anonymiser is not None else DumpAnonymiser()
+        self.size = 0
+
+    def run(self, dump_args: List[str], import_args: List[str]) -> None:
+        """Run the dump and import commands, replacing sensitive information."""
+        dump = subprocess.Popen(dump_args, stdout=subprocess.PIPE)
+        mysql = subprocess.Popen(import_args, stdin=subprocess.PIPE)
+        assert dump.stdout is not None and mysql.stdin is not None  # nosec
+
+        # Binary column values need not be valid UTF-8; surrogateescape passes them
+        # on unchanged.
+        dump_output = io.TextIOWrapper(
+            dump.stdout, encoding="utf-8", errors="surrogateescape", newline=""
         )
+        mysql_input = io.TextIOWrapper(
+            mysql.stdin, encoding="utf-8", errors="surrogateescape", newline=""
+        )
+        try:
+            for line in self.anonymiser.transform(dump_output):
+                mysql_input.write(line)
+                self.size += len(line)
+        except BaseException:
+            dump.kill()
+            raise
+        finally:
+            mysql_input.close()
+            dump.wait()
+            mysql.wait()
+
+        if dump.returncode != 0:
+            raise click.ClickException(
+                f"mysqldump failed with exit code {dump.returncode}."
+            )
+        if mysql.returncode != 0:
+            raise click.ClickException(
+                f"mysql failed with exit code {mysql.returncode}."
+            )
+
+
+def copy_table(
+    source_db: Database,
+    test_db: Database,
+    table: str,
+    stream: DumpStream,
+    after: Optional[Tuple[str, int]] = None,
+) -> None:
+    """
+    Copy a table, replacing sensitive information on the fly.
+
+    The output of mysqldump is piped through a DumpAnonymiser into mysql, so that no
+    sensitive information is ever written to the test database (or to disk). The
+    table is dropped and recreated, unless `after` is given. In this case only the
+    rows with a primary key greater than the given value are copied into the
+    existing table.
+
+    Every table is dumped in a transaction of its own, so that the copy of a table is
+    consistent in itself, but not necessarily with the copies of other tables (or
+    with the part of the table copied before resuming).
+
+    Parameters
+    ----------
+    source_db:
+        The source database.
+    test_db:
+        The test database.
+    table:
+        The table name.
+    stream:
+        The stream for the dump.
+    after:
+        The primary key column and the key after which to continue copying.
+
+    """
+    options = ["--order-by-primary"]
+    if after is not None:
+        primary_key, largest_key = after
+        options += ["--no-create-info", f"--where=`{primary_key}` > {largest_key}"]
+    if table in stream.anonymiser.anonymisers:
+        reset_fake_values(table)
+    stream.run(dump_command(source_db, [table], options), import_command(test_db))
+
+
+async def create_test_database(
+    source_db: Database, test_db: Database, checkpoint: Checkpoint
+) -> None:
+    """
+    Create the test database.
+
+    The database is created in phases: creating the empty database, copying each
+    table and copying the views. Phases recorded as done in the checkpoint are
+    skipped, and a partially copied table is continued where possible.
 
-        # create the test database
-        # Note: The name of the test database name must not be passed, as the database
-        #       might not exist yet.
+    Copying table by table makes resuming possible, but it comes at a price: the
+    tables are not taken from a single consistent snapshot of the source database.
+    If the source database is modified during a run, the test database may thus
+    contain, for example, rows referencing rows which have not been copied.
+    """
+    if checkpoint.is_done("create"):
+        checkpoint.skip("create")
+    else:
+        # Note: The name of the test database name must not be passed, as the
+        #       database might not exist yet.
+        checkpoint.reset()
+        checkpoint.start("create")
+        start = time.perf_counter()
         test_db_server_connection = await connect(
             host=test_db.host, user=test_db.username, password=test_db.password
         )
-        await create_empty_test_database(test_db_server_connection, test_db.database)
-        test_db_server_connection.close()
-
-        # import the MySQL dump file
-        with open(dump_file) as f:
-            subprocess.run(
-                [
-                    "mysql",
-                    "-u",
-                    test_db.username,
-                    f"-p{test_db.password}",
-                    "-h",
-                    test_db.host,
-                    "--default-character-set=utf8",
-                    test_db.database,
-                ],
-                stdin=f,
+        try:
+            await create_empty_test_database(
+                test_db_server_connection, test_db.database
+            )
+        finally:
+            test_db_server_connection.close()
+        checkpoint.finish("create", time.perf_counter() - start)
+
+    source_db_connection = await connect(
+        host=source_db.host,
+        user=source_db.username,
+        password=source_db.password,
+        db=source_db.database,
+    )
+    test_db_connection = await connect(
+        host=test_db.host,
+        user=test_db.username,
+        password=test_db.password,
+        db=test_db.database,
+        autocommit=True,
+    )
+    try:
+        tables, views = await list_tables(source_db_connection)
+        for table in tables:
+            phase = f"table {table}"
+            if checkpoint.is_done(phase):
+                checkpoint.skip(phase)
+                continue
+            after = None
+            if checkpoint.status(phase) == "started":
+                after = await resume_point(test_db_connection, table)
+            await _run_phase(
+                checkpoint,
+                phase,
+                lambda stream: copy_table(source_db, test_db, table, stream, after),
+                test_db_connection,
+                table,
             )
 
-        # connect to the new test database (now we have to pass the name)...
-        test_db_connection = await connect(
-            host=test_db.host,
-            user=test_db.username,
-            password=test_db.password,
-            db=test_db.database,
-        )
+        if views:
+            if checkpoint.is_done("views"):
+                checkpoint.skip("views")
+            else:
+                await _run_phase(
+                    checkpoint,
+                    "views",
+                    lambda stream: stream.run(
+                        dump_command(source_db, views), import_command(test_db)
+                    ),
+                )
+    finally:
+        source_db_connection.close()
+        test_db_connection.close()
 
-        # ... and get rid of the sensitive information
-        try:
-            await replace_sensitive_info(test_db_connection)
-        except Exception as e:
-            await test_db_connection.rollback()
-            raise e
-        else:
-            await test_db_connection.commit()
 
-        test_db_connection.close()
+async def _run_phase(
+    checkpoint: Checkpoint,
+    phase: str,
+    copy: Callable[[DumpStream], None],
+    test_db_connection: Optional[connect] = None,
+    table: Optional[str] = None,
+) -> None:
+    checkpoint.start(phase)
+    stream = DumpStream()
+    start = time.perf_counter()
+    try:
+        copy(stream)
+        rows = None
+        if test_db_connection is not None and table is not None:
+            rows = await count_rows(test_db_connection, table)
+    except BaseException:
+        checkpoint.fail(phase, time.perf_counter() - start, stream.size)
+        raise
+    checkpoint.finish(phase, time.perf_counter() - start, rows, stream.size)
 
 
 @click.command()
@@ -413,6 +839,18 @@ async def create_test_database(source_db: Database, test_db: Database) -> None:
     required=True,
     help="The name of the test database. This name must start with 'test'.",
 )
+@click.option(
+    "--state-file",
+    type=click.Path(dir_okay=False),
+    help="The file for recording the progress of the run. The default is "
+    "<test-db-name>.createtestdb.json in the current directory.",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Resume the run recorded in the state file, skipping completed phases. "
+    "Rows copied before and after resuming are not taken from the same snapshot.",
+)
 def cli(
     source_db_host: str,
     source_db_user: str,
@@ -422,6 +860,8 @@ def cli(
     test_db_user: str,
     test_db_password: str,
     test_db_name: str,
+    state_file: Optional[str],
+    resume: bool,
 ) -> None:
     """
     Generate a test database with sensitive information replaced.
@@ -429,14 +869,25 @@ def cli(
     createtestdb copies a source database to a test database, which is created if need.
     The source database must be a copy of the SALT Science Database.
 
-    The test database is deleted and recreated if it exists already. Sensitive content
-    such as names, contact details and target coordinates are replaced with fake values.
+    The test database is deleted and recreated if it exists already (unless a run is
+    resumed). Sensitive content such as names, contact details and target coordinates
+    are replaced with fake values.
 
     The fake values are deterministic; repeated uses of the command will always give the
     same fake values, as long as the original database does not change.
 
     The name of the test database must start with "test".
 
+    The database is copied in phases (creating the empty test database, copying each
+    table and copying the views), and the progress is recorded in a state file. If a
+    run fails, it can be continued with the --resume flag; completed phases are then
+    skipped, and a partially copied table is continued where possible. A summary of
+    the time, rows and throughput of every phase is output at the end of a run.
+
+    As every table is dumped on its own, the tables are not taken from a single
+    consistent snapshot of the source database. Do not use a source database which is
+    being modified.
+
     Even though the most sensitive information in the database is replaced, the
     resulting test database should still be considered confidential, and should only be
     shared with people you would share the source database with.
@@ -455,7 +906,14 @@ def cli(
         password=test_db_password,
     )
 
-    asyncio.run(create_test_database(source_db, test_db))
+    if state_file is None:
+        state_file = f"{test_db_name}.createtestdb.json"
+    checkpoint = Checkpoint(state_file, source_db, test_db, resume=resume)
+
+    try:
+        asyncio.run(create_test_database(source_db, test_db, checkpoint))
+    finally:
+        click.echo(format_summary(checkpoint))
 
 
 if __name__ == "__main__":
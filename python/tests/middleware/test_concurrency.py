@@ -0,0 +1,154 @@
+import asyncio
+from typing import Any, List
+
+import pytest
+from starlette import status
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from app.middleware.concurrency import (
+    AdaptiveLimit,
+    ConcurrencyLimiter,
+    ConcurrencyLimitMiddleware,
+    RouteLimit,
+)
+
+
+def _limiter() -> ConcurrencyLimiter:
+    return ConcurrencyLimiter(
+        [
+            RouteLimit("login", "/login", max_limit=1, target_latency=1),
+            RouteLimit("default", "/", max_limit=10, target_latency=1),
+        ]
+    )
+
+
+def test_limiter_matches_route_groups() -> None:
+    """Requests are counted against the limit of the first matching route group."""
+    limiter = ConcurrencyLimiter(
+        [
+            RouteLimit("login", "/login", 1, 1, methods=frozenset(["POST"])),
+            RouteLimit("default", "/", 10, 1),
+        ]
+    )
+
+    def name(method: str, path: str) -> Any:
+        limit = limiter.limit_for(method, path)
+        return limit.route.name if limit else None
+
+    assert name("POST", "/login") == "login"
+    assert name("DELETE", "/login") == "default"
+    assert name("GET", "/api/targets") == "default"
+    assert name("GET", "/status/cache") is None
+
+
+def test_limit_rejects_excess_requests() -> None:
+    """Requests exceeding the limit are rejected."""
+    limit = AdaptiveLimit(RouteLimit("test", "/", max_limit=2, target_latency=1))
+
+    assert limit.try_acquire()
+    assert limit.try_acquire()
+    assert not limit.try_acquire()
+
+    limit.release(0.1)
+    assert limit.try_acquire()
+    assert limit.stats()["accepted"] == 3
+    assert limit.stats()["rejected"] == 1
+
+
+def test_limit_decreases_multiplicatively_and_increases_additively() -> None:
+    """The limit decreases for slow requests and recovers for fast ones."""
+    limit = AdaptiveLimit(
+        RouteLimit("test", "/", max_limit=10, target_latency=0, min_limit=2),
+        backoff=0.5,
+    )
+    for _ in range(5):
+        limit.try_acquire()
+        limit.release(1)
+    assert limit.stats()["limit"] == 2
+
+    # the limit is only increased while it is in use
+    for _ in range(20):
+        limit.try_acquire()
+        limit.release(-1)
+    assert limit.stats()["limit"] == 2
+
+    for _ in range(100):
+        acquired = 0
+        while limit.try_acquire():
+            acquired += 1
+        for _ in range(acquired):
+            limit.release(-1)
+    assert limit.stats()["limit"] == 10
+
+
+def _app(limiter: ConcurrencyLimiter, started: List[int]) -> Starlette:
+    app = Starlette()
+    release = asyncio.Event()
+
+    @app.route("/login")
+    async def login(request: Request) -> PlainTextResponse:
+        started.append(1)
+        if len(started) == 1:
+            await release.wait()
+        return PlainTextResponse("ok")
+
+    @app.route("/release")
+    async def release_login(request: Request) -> PlainTextResponse:
+        release.set()
+        return PlainTextResponse("released")
+
+    app.add_middleware(ConcurrencyLimitMiddleware, limiter=limiter, retry_after=3)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_middleware_rejects_requests_with_503() -> None:
+    """Requests exceeding a limit get a 503 response with a Retry-After header."""
+    limiter = _limiter()
+    started: List[int] = []
+    app = _app(limiter, started)
+    messages: List[Any] = []
+
+    async def receive() -> Any:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Any) -> None:
+        messages.append(message)
+
+    def scope(path: str) -> Any:
+        return {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "root_path": "",
+            "scheme": "http",
+            "query_string": b"",
+            "headers": [],
+            "server": ("testserver", 80),
+        }
+
+    first = asyncio.ensure_future(app(scope("/login"), receive, send))
+    await asyncio.sleep(0.01)
+
+    await app(scope("/login"), receive, send)
+    assert messages[0]["status"] == 503
+    assert (b"retry-after", b"3") in messages[0]["headers"]
+
+    await app(scope("/release"), receive, send)
+    await first
+    assert [m["status"] for m in messages if "status" in m] == [503, 200, 200]
+    assert limiter.stats()["login"]["rejected"] == 1
+    assert limiter.stats()["login"]["in_flight"] == 0
+
+
+def test_middleware_passes_requests_within_the_limit() -> None:
+    """Requests within the limit are passed on."""
+    app = _app(_limiter(), [1])
+    client = TestClient(app)
+
+    resp = client.get("/login")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.text == "ok"
@@ -0,0 +1,174 @@
+import gzip
+from typing import Generator
+
+import pytest
+from fastapi import FastAPI
+from requests import Session
+from starlette import status
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.testclient import TestClient
+
+from app.middleware.response import CompressionCache, ETagCompressionMiddleware
+
+LARGE_TEXT = "The Southern African Large Telescope. " * 100
+HUGE_TEXT = LARGE_TEXT * 10
+
+
+@pytest.fixture()
+def cache() -> CompressionCache:
+    return CompressionCache()
+
+
+@pytest.fixture()
+def client(cache: CompressionCache) -> Generator[Session, None, None]:
+    app = FastAPI()
+    app.add_middleware(
+        ETagCompressionMiddleware,
+        minimum_size=100,
+        maximum_size=len(LARGE_TEXT) * 2,
+        cache=cache,
+    )
+
+    @app.get("/small")
+    def small() -> PlainTextResponse:
+        return PlainTextResponse("small")
+
+    @app.get("/large")
+    def large() -> PlainTextResponse:
+        return PlainTextResponse(LARGE_TEXT)
+
+    @app.get("/huge")
+    def huge() -> PlainTextResponse:
+        return PlainTextResponse(HUGE_TEXT)
+
+    @app.get("/static/large.txt")
+    def static_large() -> PlainTextResponse:
+        return PlainTextResponse(LARGE_TEXT)
+
+    @app.get("/stream")
+    def stream() -> StreamingResponse:
+        return StreamingResponse(iter([b"a", b"b"]), media_type="text/plain")
+
+    @app.get("/missing")
+    def missing() -> PlainTextResponse:
+        return PlainTextResponse("missing", status_code=404)
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_etag_is_added(client: Session) -> None:
+    """Responses with a known length get a strong ETag."""
+    resp = client.get("/small")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["ETag"].startswith('"')
+    assert not resp.headers["ETag"].startswith("W/")
+
+    # the ETag is stable
+    assert client.get("/small").headers["ETag"] == resp.headers["ETag"]
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    ["{etag}", "W/{etag}", '"abc", {etag}', "*"],
+)
+def test_matching_if_none_match_gives_304(client: Session, if_none_match: str) -> None:
+    """A matching If-None-Match header results in a 304 response without body."""
+    etag = client.get("/small").headers["ETag"]
+
+    resp = client.get(
+        "/small", headers={"If-None-Match": if_none_match.format(etag=etag)}
+    )
+
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+    assert resp.content == b""
+    assert resp.headers["ETag"] == etag
+    assert "Content-Type" not in resp.headers
+    assert "Content-Length" not in resp.headers
+
+
+def test_non_matching_if_none_match_gives_full_response(client: Session) -> None:
+    """A non-matching If-None-Match header results in a full response."""
+    resp = client.get("/small", headers={"If-None-Match": '"abc"'})
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.text == "small"
+
+
+def test_error_responses_get_no_etag(client: Session) -> None:
+    """Only successful responses get an ETag."""
+    resp = client.get("/missing")
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert "ETag" not in resp.headers
+
+
+def test_large_responses_are_compressed(client: Session) -> None:
+    """Responses above the size threshold are compressed."""
+    resp = client.get("/large", headers={"Accept-Encoding": "gzip"}, stream=True)
+    raw = resp.raw.read(decode_content=False)
+
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert gzip.decompress(raw).decode() == LARGE_TEXT
+    assert int(resp.headers["Content-Length"]) == len(raw)
+
+
+@pytest.mark.parametrize("accept_encoding", ["identity", "gzip;q=0", ""])
+def test_no_compression_if_not_accepted(client: Session, accept_encoding: str) -> None:
+    """Responses are not compressed if the client does not accept gzip."""
+    resp = client.get("/large", headers={"Accept-Encoding": accept_encoding})
+
+    assert "Content-Encoding" not in resp.headers
+    assert resp.text == LARGE_TEXT
+
+
+def test_small_responses_are_not_compressed(client: Session) -> None:
+    """Responses below the size threshold are not compressed."""
+    resp = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in resp.headers
+
+
+def test_responses_above_the_maximum_size_are_passed_through(client: Session) -> None:
+    """Responses above the maximum size are neither buffered nor compressed."""
+    resp = client.get("/huge", headers={"Accept-Encoding": "gzip"}, stream=True)
+    raw = resp.raw.read(decode_content=False)
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert "ETag" not in resp.headers
+    assert "Content-Encoding" not in resp.headers
+    assert raw == HUGE_TEXT.encode()
+
+
+def test_streaming_responses_are_passed_through(client: Session) -> None:
+    """Streaming responses are neither buffered nor compressed."""
+    resp = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert resp.text == "ab"
+    assert "ETag" not in resp.headers
+    assert "Content-Encoding" not in resp.headers
+
+
+def test_immutable_assets_are_cached(client: Session, cache: CompressionCache) -> None:
+    """Compressed bodies of immutable assets are cached."""
+    client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert len(cache) == 0
+
+    client.get("/static/large.txt", headers={"Accept-Encoding": "gzip"})
+    client.get("/static/large.txt", headers={"Accept-Encoding": "gzip"})
+    assert len(cache) == 1
+
+
+def test_compression_cache_is_bounded() -> None:
+    """The compression cache evicts the least recently used entries."""
+    cache = CompressionCache(max_bytes=10)
+    cache.put("a", "gzip", b"12345")
+    cache.put("b", "gzip", b"12345")
+    cache.get("a", "gzip")
+    cache.put("c", "gzip", b"12345")
+
+    assert cache.get("a", "gzip") == b"12345"
+    assert cache.get("b", "gzip") is None
+    assert cache.get("c", "gzip") == b"12345"
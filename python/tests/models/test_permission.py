@@ -0,0 +1,39 @@
+from app.models.permission import (
+    ROLE_PERMISSIONS,
+    Permission,
+    Role,
+    permissions_for_roles,
+)
+from app.models.principal import Principal
+
+
+def test_permissions_for_roles() -> None:
+    """The permissions of roles are combined."""
+    assert permissions_for_roles([]) == Permission.NONE
+    assert (
+        permissions_for_roles([Role.INVESTIGATOR])
+        == ROLE_PERMISSIONS[Role.INVESTIGATOR]
+    )
+    assert permissions_for_roles([Role.INVESTIGATOR, Role.TAC_MEMBER]) == (
+        ROLE_PERMISSIONS[Role.INVESTIGATOR] | ROLE_PERMISSIONS[Role.TAC_MEMBER]
+    )
+
+
+def test_has_permission() -> None:
+    """A principal must have all the required permissions."""
+    principal = Principal("jane", Permission.VIEW_TARGETS | Permission.EXPORT_DATA)
+
+    assert principal.has_permission(Permission.NONE)
+    assert principal.has_permission(Permission.VIEW_TARGETS)
+    assert principal.has_permission(Permission.VIEW_TARGETS | Permission.EXPORT_DATA)
+    assert not principal.has_permission(Permission.MANAGE_USERS)
+    assert not principal.has_permission(
+        Permission.VIEW_TARGETS | Permission.MANAGE_USERS
+    )
+
+
+def test_only_staff_may_view_and_export_investigators() -> None:
+    """Investigators and TAC members may neither view nor export investigators."""
+    for role in (Role.INVESTIGATOR, Role.TAC_MEMBER):
+        assert not ROLE_PERMISSIONS[role] & Permission.VIEW_INVESTIGATORS
+        assert not ROLE_PERMISSIONS[role] & Permission.EXPORT_DATA
@@ -0,0 +1,17 @@
+import dataclasses
+
+import pytest
+
+from app.models.permission import Permission
+from app.models.principal import Principal
+
+
+def test_principal_is_immutable() -> None:
+    """A Principal cannot be changed and has no instance dictionary."""
+    principal = Principal("jane", Permission.VIEW_TARGETS)
+
+    assert principal.username == "jane"
+    assert principal == Principal("jane", Permission.VIEW_TARGETS)
+    assert not hasattr(principal, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        principal.username = "john"  # type: ignore
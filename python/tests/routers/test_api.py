@@ -2,12 +2,17 @@ from typing import Optional
 
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
+from fastapi import HTTPException
 from requests import Session
 from starlette import status
 
-from app.models.pydantic import User
-from app.settings import Settings
+from app.main import app
+from app.models.permission import Permission
+from app.models.principal import Principal
+from app.service import user as user_service
+from app.settings import SessionSettings, Settings
 from app.util import auth
+from app.util.session import get_session_settings
 
 
 @pytest.mark.parametrize(
@@ -26,9 +31,9 @@ def test_token_for_incorrect_credentials(
 ) -> None:
     """Calling /api/token with incorrect credentials gives a 401 error."""
 
-    def mock_authenticate_user(username: str, password: str) -> Optional[User]:
+    def mock_authenticate_user(username: str, password: str) -> Optional[Principal]:
         if username + "-pwd" == password:
-            return User(username=username)
+            return Principal(username, Permission.VIEW_TARGETS)
         return None
 
     monkeypatch.setattr(auth, "authenticate_user", mock_authenticate_user)
@@ -46,9 +51,9 @@ def test_token_returns_authentication_token(
 ) -> None:
     """/api/token returns a valid authentication token."""
 
-    def mock_authenticate_user(username: str, password: str) -> Optional[User]:
+    def mock_authenticate_user(username: str, password: str) -> Optional[Principal]:
         if username + "-pwd" == password:
-            return User(username=username)
+            return Principal(username, Permission.VIEW_TARGETS)
         return None
 
     monkeypatch.setattr(auth, "authenticate_user", mock_authenticate_user)
@@ -60,3 +65,60 @@ def test_token_returns_authentication_token(
     # ... and check that it is valid
     user = auth.get_current_user(settings.secret_key, token)
     assert user.username == "jane"
+    assert user.permissions == user_service.get_permissions("jane")
+
+
+def test_session_login_and_logout(client: Session, monkeypatch: MonkeyPatch) -> None:
+    """/api/session sets a session cookie, which is revoked when logging out."""
+
+    def mock_authenticate_user(username: str, password: str) -> Optional[Principal]:
+        if username + "-pwd" == password:
+            return Principal(username, Permission.VIEW_TARGETS)
+        return None
+
+    monkeypatch.setattr(auth, "authenticate_user", mock_authenticate_user)
+
+    # incorrect credentials
+    resp = client.post("/api/session", data={"username": "jane", "password": "wrong"})
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # log in...
+    resp = client.post(
+        "/api/session", data={"username": "jane", "password": "jane-pwd"}
+    )
+    assert resp.status_code == status.HTTP_204_NO_CONTENT
+    session_id = resp.cookies[auth.SESSION_COOKIE]
+    assert session_id is not None
+    assert "Secure" in resp.headers["set-cookie"]
+    assert "HttpOnly" in resp.headers["set-cookie"]
+    assert auth.get_current_user_from_session(session_id).username == "jane"
+
+    # ... and log out again
+    resp = client.delete("/api/session")
+    assert resp.status_code == status.HTTP_204_NO_CONTENT
+    with pytest.raises(HTTPException) as excinfo:
+        auth.get_current_user_from_session(session_id)
+    assert excinfo.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_session_cookie_may_be_insecure(
+    client: Session, monkeypatch: MonkeyPatch
+) -> None:
+    """The Secure flag of the session cookie can be disabled for development."""
+    monkeypatch.setattr(
+        auth,
+        "authenticate_user",
+        lambda username, password: Principal(username, Permission.NONE),
+    )
+    app.dependency_overrides[get_session_settings] = lambda: SessionSettings(
+        session_cookie_secure=False
+    )
+    try:
+        resp = client.post(
+            "/api/session", data={"username": "jane", "password": "jane-pwd"}
+        )
+        assert resp.status_code == status.HTTP_204_NO_CONTENT
+        assert "Secure" not in resp.headers["set-cookie"]
+    finally:
+        del app.dependency_overrides[get_session_settings]
+        client.cookies.clear()
@@ -0,0 +1,37 @@
+from _pytest.monkeypatch import MonkeyPatch
+from requests import Session
+from starlette import status
+
+from app.util import auth
+
+
+def test_live(client: Session) -> None:
+    """/health/live succeeds."""
+    resp = client.get("/health/live")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {"status": "ok"}
+
+
+def test_ready(client: Session) -> None:
+    """/health/ready succeeds and reports saturation signals for an idle process."""
+    resp = client.get("/health/ready")
+
+    assert resp.status_code == status.HTTP_200_OK
+    report = resp.json()
+    assert report["status"] == "ok"
+    assert report["failures"] == []
+    assert report["hashing_backlog"] == 0
+    assert "cache" in report["cache_hit_rates"]
+
+
+def test_ready_fails_if_a_threshold_is_exceeded(
+    client: Session, monkeypatch: MonkeyPatch
+) -> None:
+    """/health/ready fails if a saturation signal exceeds its threshold."""
+    monkeypatch.setattr(auth, "hashing_backlog", lambda: 1000)
+
+    resp = client.get("/health/ready")
+
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert resp.json()["failures"] == ["hashing_backlog"]
@@ -0,0 +1,193 @@
+from typing import (
+    Any,
+    AsyncIterator,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from requests import Session
+from starlette import status
+
+from app.db import get_pool
+from app.dependencies import get_authenticated_user
+from app.main import app
+from app.models.permission import Permission, Role, permissions_for_roles
+from app.models.principal import Principal
+from app.models.pydantic import Investigator
+from app.service import investigator as investigator_service
+from app.service import user as user_service
+from app.util import auth
+
+INVESTIGATORS = [
+    Investigator(id=i, first_name=f"First{i}", surname=f"Surname{i}", email=None)
+    for i in range(1, 6)
+]
+
+
+@pytest.fixture()
+def authenticated(client: Session) -> Generator[None, None, None]:
+    async def mock_get_pool() -> None:
+        return None
+
+    app.dependency_overrides[get_pool] = mock_get_pool
+    app.dependency_overrides[get_authenticated_user] = lambda: Principal(
+        "jane", Permission.VIEW_INVESTIGATORS | Permission.EXPORT_DATA
+    )
+    yield
+    del app.dependency_overrides[get_pool]
+    del app.dependency_overrides[get_authenticated_user]
+
+
+@pytest.fixture()
+def mock_service(monkeypatch: MonkeyPatch) -> None:
+    async def mock_list_investigators(
+        pool: Any, after: int, limit: int
+    ) -> List[Investigator]:
+        return [i for i in INVESTIGATORS if i.id > after][:limit]
+
+    async def mock_stream_investigators(
+        pool: Any,
+    ) -> AsyncIterator[Sequence[Tuple[Any, ...]]]:
+        for start in range(0, len(INVESTIGATORS), 2):
+            yield [
+                (i.id, i.first_name, i.surname, i.email)
+                for i in INVESTIGATORS[start : start + 2]  # noqa: E203
+            ]
+
+    monkeypatch.setattr(
+        investigator_service, "list_investigators", mock_list_investigators
+    )
+    monkeypatch.setattr(
+        investigator_service, "stream_investigators", mock_stream_investigators
+    )
+
+
+def test_investigators_require_authentication(client: Session) -> None:
+    """The investigator endpoints require authentication."""
+    assert client.get("/api/investigators").status_code == 401
+    assert client.get("/api/investigators/export").status_code == 401
+
+
+@pytest.mark.usefixtures("authenticated", "mock_service")
+def test_investigators_require_permissions(client: Session) -> None:
+    """The investigator endpoints require the respective permissions."""
+    app.dependency_overrides[get_authenticated_user] = lambda: Principal(
+        "jane", Permission.VIEW_INVESTIGATORS
+    )
+
+    assert client.get("/api/investigators").status_code == 200
+    assert client.get("/api/investigators/export").status_code == 403
+
+
+@pytest.mark.usefixtures("authenticated", "mock_service")
+def test_investigators_cannot_export_investigators(client: Session) -> None:
+    """A user with the investigator role may neither list nor export investigators."""
+    app.dependency_overrides[get_authenticated_user] = lambda: Principal(
+        "jane", permissions_for_roles([Role.INVESTIGATOR])
+    )
+
+    assert client.get("/api/investigators").status_code == 403
+    assert client.get("/api/investigators/export").status_code == 403
+
+
+@pytest.mark.usefixtures("authenticated", "mock_service")
+def test_list_investigators_is_paginated(client: Session) -> None:
+    """Investigators can be listed page by page."""
+    ids: List[int] = []
+    after = 0
+    while True:
+        resp = client.get("/api/investigators", params={"after": after, "limit": 2})
+        assert resp.status_code == status.HTTP_200_OK
+        page = resp.json()
+        ids.extend(item["id"] for item in page["items"])
+        if page["next_cursor"] is None:
+            break
+        after = page["next_cursor"]
+
+    assert ids == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.usefixtures("authenticated", "mock_service")
+def test_list_investigators_limits_page_size(client: Session) -> None:
+    """The page size must be between 1 and 1000."""
+    assert client.get("/api/investigators", params={"limit": 0}).status_code == 422
+    assert client.get("/api/investigators", params={"limit": 1001}).status_code == 422
+
+
+@pytest.mark.usefixtures("authenticated", "mock_service")
+def test_export_investigators_as_ndjson(client: Session) -> None:
+    """Investigators can be exported as newline delimited JSON."""
+    resp = client.get("/api/investigators/export")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = resp.text.splitlines()
+    assert len(lines) == 5
+    assert lines[0] == (
+        '{"id":1,"first_name":"First1","surname":"Surname1","email":null}'
+    )
+
+
+@pytest.mark.usefixtures("authenticated", "mock_service")
+def test_export_investigators_as_csv(client: Session) -> None:
+    """Investigators can be exported as CSV."""
+    resp = client.get("/api/investigators/export", params={"format": "csv"})
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"].startswith("text/csv")
+    lines = resp.text.splitlines()
+    assert lines[0] == "id,first_name,surname,email"
+    assert lines[1] == "1,First1,Surname1,"
+    assert len(lines) == 6
+
+
+@pytest.mark.usefixtures("authenticated")
+def test_export_investigators_rejects_unknown_formats(client: Session) -> None:
+    """Only ndjson and csv are supported export formats."""
+    resp = client.get("/api/investigators/export", params={"format": "xml"})
+
+    assert resp.status_code == 422
+
+
+@pytest.mark.usefixtures("mock_service")
+def test_investigators_accept_session_cookies(
+    client: Session, monkeypatch: MonkeyPatch
+) -> None:
+    """A user logged in with a session cookie can access the endpoints."""
+
+    def mock_authenticate_user(username: str, password: str) -> Optional[Principal]:
+        if username + "-pwd" == password:
+            return Principal(username, Permission.NONE)
+        return None
+
+    async def mock_get_pool() -> None:
+        return None
+
+    monkeypatch.setattr(auth, "authenticate_user", mock_authenticate_user)
+    monkeypatch.setattr(
+        user_service, "get_roles", lambda username: frozenset([Role.SALT_ASTRONOMER])
+    )
+    app.dependency_overrides[get_pool] = mock_get_pool
+    try:
+        resp = client.post(
+            "/api/session", data={"username": "jane", "password": "jane-pwd"}
+        )
+        assert resp.status_code == status.HTTP_204_NO_CONTENT
+        assert auth.SESSION_COOKIE in client.cookies
+        assert "Authorization" not in client.cookies
+
+        resp = client.get("/api/investigators")
+        assert resp.status_code == status.HTTP_200_OK
+        assert len(resp.json()["items"]) == 5
+
+        # the session cannot be used after logging out
+        client.delete("/api/session")
+        assert client.get("/api/investigators").status_code == 401
+    finally:
+        client.cookies.clear()
+        del app.dependency_overrides[get_pool]
@@ -0,0 +1,68 @@
+from typing import Generator
+
+import pytest
+from requests import Session
+from starlette import status
+
+from app.dependencies import get_authenticated_user
+from app.main import app
+from app.models.permission import ROLE_PERMISSIONS, Role
+from app.models.principal import Principal
+
+STATUS_PATHS = ["/status/cache", "/status/concurrency", "/status/logging"]
+
+
+@pytest.fixture()
+def administrator(client: Session) -> Generator[None, None, None]:
+    app.dependency_overrides[get_authenticated_user] = lambda: Principal(
+        "jane", ROLE_PERMISSIONS[Role.ADMINISTRATOR]
+    )
+    yield
+    del app.dependency_overrides[get_authenticated_user]
+
+
+@pytest.mark.parametrize("path", STATUS_PATHS)
+def test_status_requires_authentication(client: Session, path: str) -> None:
+    """The status endpoints require authentication."""
+    assert client.get(path).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.parametrize("path", STATUS_PATHS)
+def test_status_requires_administrator(client: Session, path: str) -> None:
+    """Only administrators may access the status endpoints."""
+    app.dependency_overrides[get_authenticated_user] = lambda: Principal(
+        "jane", ROLE_PERMISSIONS[Role.SALT_ASTRONOMER]
+    )
+    try:
+        assert client.get(path).status_code == status.HTTP_403_FORBIDDEN
+    finally:
+        del app.dependency_overrides[get_authenticated_user]
+
+
+@pytest.mark.usefixtures("administrator")
+def test_cache_status(client: Session) -> None:
+    """/status/cache returns cache statistics."""
+    resp = client.get("/status/cache")
+
+    assert resp.status_code == status.HTTP_200_OK
+    stats = resp.json()
+    assert "hit_rate" in stats["cache"]
+    assert "hit_rate" in stats["reference_data"]
+
+
+@pytest.mark.usefixtures("administrator")
+def test_concurrency_status(client: Session) -> None:
+    """/status/concurrency returns the concurrency limits."""
+    resp = client.get("/status/concurrency")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["login"]["max_limit"] >= 1
+
+
+@pytest.mark.usefixtures("administrator")
+def test_logging_status(client: Session) -> None:
+    """/status/logging returns the log queue statistics."""
+    resp = client.get("/status/logging")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert "dropped" in resp.json()
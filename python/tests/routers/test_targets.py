@@ -0,0 +1,310 @@
+import datetime
+import pathlib
+from typing import Any, AsyncIterator, Generator, List, Sequence, Tuple
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from requests import Session
+from starlette import status
+
+from app import db
+from app.db import get_pool
+from app.dependencies import get_authenticated_user
+from app.main import app
+from app.models.permission import Permission
+from app.models.principal import Principal
+from app.models.pydantic import Semester
+from app.service import target as target_service
+from app.settings import CacheSettings
+from app.util.sky import SkyIndex
+from app.util.visibility import VisibilityCache
+
+SEMESTER = Semester(
+    year=2021,
+    semester=1,
+    start=datetime.date(2021, 5, 1),
+    end=datetime.date(2021, 10, 31),
+)
+
+# Target rows as returned by the database, with sexagesimal coordinates. Target i has
+# a right ascension of i degrees and a declination of 0.5 or -0.5 degrees.
+TARGET_ROWS = [
+    (i, f"Target{i}", 0, 4 * i, 0, "-" if i % 2 == 0 else "+", 0, 30, 0)
+    for i in range(1, 6)
+]
+
+
+@pytest.fixture()
+def authenticated(client: Session) -> Generator[None, None, None]:
+    async def mock_get_pool() -> None:
+        return None
+
+    app.dependency_overrides[get_pool] = mock_get_pool
+    app.dependency_overrides[get_authenticated_user] = lambda: Principal(
+        "jane", Permission.VIEW_TARGETS | Permission.EXPORT_DATA
+    )
+    yield
+    del app.dependency_overrides[get_pool]
+    del app.dependency_overrides[get_authenticated_user]
+
+
+@pytest.fixture()
+def mock_db(monkeypatch: MonkeyPatch) -> None:
+    async def mock_fetch_all(
+        pool: Any, sql: str, args: Sequence[Any] = ()
+    ) -> Sequence[Tuple[Any, ...]]:
+        if "IN (" in sql:
+            return [row for row in TARGET_ROWS if row[0] in args]
+        after, limit = args
+        return [row for row in TARGET_ROWS if row[0] > after][:limit]
+
+    async def mock_stream_rows(
+        pool: Any, sql: str, args: Sequence[Any] = (), batch_size: int = 1000
+    ) -> AsyncIterator[Sequence[Tuple[Any, ...]]]:
+        for start in range(0, len(TARGET_ROWS), 2):
+            yield TARGET_ROWS[start : start + 2]  # noqa: E203
+
+    async def mock_get_sky_index() -> SkyIndex:
+        ids = [row[0] for row in TARGET_ROWS]
+        ra = [float(i) for i in ids]
+        dec = [-0.5 if i % 2 == 0 else 0.5 for i in ids]
+        return SkyIndex.from_coordinates(ids, ra, dec)
+
+    monkeypatch.setattr(db, "fetch_all", mock_fetch_all)
+    monkeypatch.setattr(db, "stream_rows", mock_stream_rows)
+    monkeypatch.setattr(target_service, "get_sky_index", mock_get_sky_index)
+
+
+@pytest.fixture()
+def visibility_cache(tmp_path: pathlib.Path, monkeypatch: MonkeyPatch) -> None:
+    async def mock_get_semesters() -> List[Semester]:
+        return [SEMESTER]
+
+    monkeypatch.setattr(target_service, "get_semesters", mock_get_semesters)
+    monkeypatch.setattr(
+        target_service,
+        "get_cache_settings",
+        lambda: CacheSettings(visibility_cache_directory=str(tmp_path)),
+    )
+    monkeypatch.setattr(target_service, "_visibility_caches", {})
+
+
+def test_targets_require_authentication(client: Session) -> None:
+    """The target endpoints require authentication."""
+    assert client.get("/api/targets").status_code == 401
+    assert (
+        client.get(
+            "/api/targets/1/visibility", params={"night": "2021-05-01"}
+        ).status_code
+        == 401
+    )
+    assert (
+        client.get(
+            "/api/targets/search", params={"ra": 3, "dec": 0, "radius": 1}
+        ).status_code
+        == 401
+    )
+    assert client.get("/api/targets/export").status_code == 401
+
+
+@pytest.mark.usefixtures("authenticated", "mock_db")
+def test_targets_require_permissions(client: Session) -> None:
+    """The target endpoints require the respective permissions."""
+    app.dependency_overrides[get_authenticated_user] = lambda: Principal(
+        "jane", Permission.VIEW_TARGETS
+    )
+    search_params = {"ra": 3, "dec": 0, "radius": 1}
+
+    assert client.get("/api/targets").status_code == 200
+    assert client.get("/api/targets/search", params=search_params).status_code == 200
+    assert client.get("/api/targets/export").status_code == 403
+
+    app.dependency_overrides[get_authenticated_user] = lambda: Principal(
+        "jane", Permission.VIEW_INVESTIGATORS | Permission.EXPORT_DATA
+    )
+
+    assert client.get("/api/targets").status_code == 403
+    assert client.get("/api/targets/search", params=search_params).status_code == 403
+    assert client.get("/api/targets/export").status_code == 403
+
+
+@pytest.mark.usefixtures("authenticated", "mock_db")
+def test_list_targets_is_paginated(client: Session) -> None:
+    """Targets can be listed page by page, with coordinates in degrees."""
+    items: List[Any] = []
+    after = 0
+    while True:
+        resp = client.get("/api/targets", params={"after": after, "limit": 2})
+        assert resp.status_code == status.HTTP_200_OK
+        page = resp.json()
+        items.extend(page["items"])
+        if page["next_cursor"] is None:
+            break
+        after = page["next_cursor"]
+
+    assert [item["id"] for item in items] == [1, 2, 3, 4, 5]
+    assert items[1] == {"id": 2, "name": "Target2", "ra": 2.0, "dec": -0.5}
+
+
+@pytest.mark.usefixtures("authenticated", "mock_db")
+def test_list_targets_limits_page_size(client: Session) -> None:
+    """The page size must be between 1 and 1000."""
+    assert client.get("/api/targets", params={"limit": 0}).status_code == 422
+    assert client.get("/api/targets", params={"limit": 1001}).status_code == 422
+
+
+@pytest.mark.usefixtures("authenticated", "mock_db")
+def test_search_targets(client: Session) -> None:
+    """A cone search returns the targets within the radius, nearest first."""
+    resp = client.get(
+        "/api/targets/search", params={"ra": 3.2, "dec": 0.5, "radius": 1.5}
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == [
+        {"id": 3, "name": "Target3", "ra": 3.0, "dec": 0.5},
+        {"id": 4, "name": "Target4", "ra": 4.0, "dec": -0.5},
+    ]
+
+
+@pytest.mark.usefixtures("authenticated", "mock_db")
+def test_search_targets_limits_results(client: Session) -> None:
+    """A cone search returns at most the requested number of targets."""
+    resp = client.get(
+        "/api/targets/search",
+        params={"ra": 3.2, "dec": 0.5, "radius": 10, "limit": 1},
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert [target["id"] for target in resp.json()] == [3]
+
+
+@pytest.mark.usefixtures("authenticated", "mock_db")
+def test_search_targets_without_results(client: Session) -> None:
+    """A cone search without any targets in the radius returns an empty list."""
+    resp = client.get(
+        "/api/targets/search", params={"ra": 180, "dec": -60, "radius": 5}
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == []
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"dec": 0, "radius": 1},
+        {"ra": 3, "radius": 1},
+        {"ra": 3, "dec": 0},
+        {"ra": -1, "dec": 0, "radius": 1},
+        {"ra": 360, "dec": 0, "radius": 1},
+        {"ra": 3, "dec": -91, "radius": 1},
+        {"ra": 3, "dec": 91, "radius": 1},
+        {"ra": 3, "dec": 0, "radius": 0},
+        {"ra": 3, "dec": 0, "radius": 11},
+        {"ra": 3, "dec": 0, "radius": 1, "limit": 0},
+        {"ra": 3, "dec": 0, "radius": 1, "limit": 1001},
+    ],
+)
+@pytest.mark.usefixtures("authenticated", "mock_db")
+def test_search_targets_validates_parameters(client: Session, params: Any) -> None:
+    """The position, radius and limit of a cone search must be valid."""
+    assert client.get("/api/targets/search", params=params).status_code == 422
+
+
+@pytest.mark.usefixtures("authenticated", "mock_db")
+def test_export_targets_as_ndjson(client: Session) -> None:
+    """Targets can be exported as newline delimited JSON."""
+    resp = client.get("/api/targets/export")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = resp.text.splitlines()
+    assert len(lines) == 5
+    assert lines[0] == '{"id":1,"name":"Target1","ra":1.0,"dec":0.5}'
+    assert lines[3] == '{"id":4,"name":"Target4","ra":4.0,"dec":-0.5}'
+
+
+@pytest.mark.usefixtures("authenticated", "mock_db")
+def test_export_targets_as_csv(client: Session) -> None:
+    """Targets can be exported as CSV."""
+    resp = client.get("/api/targets/export", params={"format": "csv"})
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"].startswith("text/csv")
+    lines = resp.text.splitlines()
+    assert lines[0] == "id,name,ra,dec"
+    assert lines[1] == "1,Target1,1.0,0.5"
+    assert lines[2] == "2,Target2,2.0,-0.5"
+    assert len(lines) == 6
+
+
+@pytest.mark.usefixtures("authenticated")
+def test_export_targets_rejects_unknown_formats(client: Session) -> None:
+    """Only ndjson and csv are supported export formats."""
+    resp = client.get("/api/targets/export", params={"format": "xml"})
+
+    assert resp.status_code == 422
+
+
+@pytest.mark.usefixtures("authenticated", "visibility_cache")
+def test_visibility_windows_are_read_from_the_cache(
+    client: Session, tmp_path: pathlib.Path
+) -> None:
+    """The visibility windows of a target are read from the semester's cache."""
+    night = datetime.date(2021, 5, 1)
+    cache = target_service.get_visibility_cache(SEMESTER)
+    assert cache.directory == tmp_path / "2021-1"
+    cache.update([1], [210], [-32.4])
+
+    resp = client.get("/api/targets/1/visibility", params={"night": "2021-05-01"})
+
+    assert resp.status_code == status.HTTP_200_OK
+    windows = cache.windows(1, night)
+    assert windows is not None and len(windows) == 2
+    assert resp.json() == [
+        {
+            "start": start.isoformat() + "+00:00",
+            "end": end.isoformat() + "+00:00",
+        }
+        for start, end in windows
+    ]
+
+
+@pytest.mark.usefixtures("authenticated", "visibility_cache")
+def test_visibility_windows_are_reloaded_after_a_rebuild(
+    client: Session, tmp_path: pathlib.Path
+) -> None:
+    """Windows built by another process (such as updatevisibility) are used."""
+    target_service.get_visibility_cache(SEMESTER).update([1], [210], [-32.4])
+    params = {"night": "2021-05-01"}
+    assert client.get("/api/targets/2/visibility", params=params).status_code == 404
+
+    nights = (SEMESTER.end - SEMESTER.start).days + 1
+    VisibilityCache(tmp_path / "2021-1", SEMESTER.start, nights).update(
+        [1, 2], [210, 150], [-32.4, -60]
+    )
+
+    assert client.get("/api/targets/2/visibility", params=params).status_code == 200
+
+
+@pytest.mark.usefixtures("authenticated", "visibility_cache")
+def test_missing_visibility_windows(client: Session) -> None:
+    """A 404 error is returned if the cache has no windows for a target and night."""
+    # the cache has not been built yet
+    params = {"night": "2021-05-01"}
+    assert client.get("/api/targets/1/visibility", params=params).status_code == 404
+
+    target_service.get_visibility_cache(SEMESTER).update([1], [210], [-32.4])
+    assert client.get("/api/targets/1/visibility", params=params).status_code == 200
+    # unknown target
+    assert client.get("/api/targets/2/visibility", params=params).status_code == 404
+    # night outside all semesters
+    assert (
+        client.get(
+            "/api/targets/1/visibility", params={"night": "2022-01-01"}
+        ).status_code
+        == 404
+    )
+    # missing night
+    assert client.get("/api/targets/1/visibility").status_code == 422
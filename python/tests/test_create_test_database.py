@@ -0,0 +1,241 @@
+import hashlib
+from pathlib import Path
+from typing import Any, Dict
+
+import click
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from tests.create_test_database import (
+    Checkpoint,
+    Database,
+    DumpAnonymiser,
+    RunState,
+    anonymise_investigator,
+    anonymise_target_coordinates,
+    format_rows,
+    format_summary,
+    parse_rows,
+    reset_fake_values,
+    sql_literal,
+)
+
+DUMP = """\
+DROP TABLE IF EXISTS `Investigator`;
+CREATE TABLE `Investigator` (
+  `Investigator_Id` int(10) unsigned NOT NULL AUTO_INCREMENT,
+  `FirstName` varchar(50) NOT NULL,
+  `Surname` varchar(50) NOT NULL,
+  `Email` varchar(100) DEFAULT NULL,
+  `Phone` varchar(32) DEFAULT NULL,
+  `Comment` text,
+  PRIMARY KEY (`Investigator_Id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+LOCK TABLES `Investigator` WRITE;
+INSERT INTO `Investigator` VALUES (1,'John','O\\'Hara','john@example.com','123','a, (b)'),(2,'Jane','Doe',NULL,NULL,NULL);
+UNLOCK TABLES;
+CREATE TABLE `Partner` (
+  `Partner_Id` int(10) unsigned NOT NULL AUTO_INCREMENT,
+  `Partner_Name` varchar(50) NOT NULL,
+  PRIMARY KEY (`Partner_Id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+INSERT INTO `Partner` VALUES (1,'South Africa'),(2,'Poland');
+"""  # noqa: E501
+
+
+def _anonymise_investigator(investigator_id: int) -> Dict[str, Any]:
+    return {"FirstName": f"First{investigator_id}", "Surname": "Sur'name"}
+
+
+def _values(insert_statement: str) -> str:
+    return insert_statement.split(" VALUES ", 1)[1].rstrip(";\n")
+
+
+def test_parse_and_format_rows() -> None:
+    """Rows are parsed into SQL literals and formatted unchanged."""
+    values = "(1,'a,b','c\\'d)',NULL,1.5e3,_binary 'x\\\\'),(2,'','(',-1,0x1F,'')"
+
+    rows = parse_rows(values)
+
+    assert rows == [
+        ["1", "'a,b'", "'c\\'d)'", "NULL", "1.5e3", "_binary 'x\\\\'"],
+        ["2", "''", "'('", "-1", "0x1F", "''"],
+    ]
+    assert format_rows(rows) == values
+
+
+def test_parse_rows_rejects_invalid_values() -> None:
+    """An error is raised for values which aren't rows."""
+    with pytest.raises(ValueError):
+        parse_rows("1,2")
+
+
+@pytest.mark.parametrize(
+    "value,literal",
+    [
+        (None, "NULL"),
+        (42, "42"),
+        (1.5, "1.5"),
+        ("O'Hara", "'O\\'Hara'"),
+        ("a\\b\nc", "'a\\\\b\\nc'"),
+    ],
+)
+def test_sql_literal(value: Any, literal: str) -> None:
+    """Values are converted to SQL literals."""
+    assert sql_literal(value) == literal
+
+
+def test_dump_anonymiser_replaces_sensitive_values() -> None:
+    """Values of the sensitive columns are replaced, everything else is unchanged."""
+    anonymiser = DumpAnonymiser({"Investigator": _anonymise_investigator})
+
+    lines = list(anonymiser.transform(DUMP.splitlines(keepends=True)))
+
+    original_lines = DUMP.splitlines(keepends=True)
+    assert len(lines) == len(original_lines)
+    changed = [i for i, (a, b) in enumerate(zip(lines, original_lines)) if a != b]
+    assert len(changed) == 1
+    assert lines[changed[0]] == (
+        "INSERT INTO `Investigator` VALUES "
+        "(1,'First1','Sur\\'name','john@example.com','123','a, (b)'),"
+        "(2,'First2','Sur\\'name',NULL,NULL,NULL);\n"
+    )
+    assert anonymiser.columns["Investigator"][:3] == [
+        "Investigator_Id",
+        "FirstName",
+        "Surname",
+    ]
+    assert "Partner" not in anonymiser.columns
+    assert anonymiser.anonymised_rows == {"Investigator": 2}
+
+
+def test_dump_anonymiser_requires_create_table_statements() -> None:
+    """An error is raised if the columns of a table are unknown."""
+    anonymiser = DumpAnonymiser({"Investigator": _anonymise_investigator})
+
+    with pytest.raises(ValueError):
+        anonymiser.transform_line("INSERT INTO `Investigator` VALUES (1,'a','b');\n")
+
+
+def test_default_anonymisers(monkeypatch: MonkeyPatch) -> None:
+    """The default anonymisers replace names, passwords and coordinates."""
+    monkeypatch.setenv("TEST_DB_USER_PASSPHRASE", "secret")
+    dump = """\
+CREATE TABLE `PiptUser` (
+  `PiptUser_Id` int(10) unsigned NOT NULL AUTO_INCREMENT,
+  `Username` varchar(32) NOT NULL,
+  `Password` varchar(32) NOT NULL,
+  PRIMARY KEY (`PiptUser_Id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+INSERT INTO `PiptUser` VALUES (7,'realuser','abc');
+CREATE TABLE `TargetCoordinates` (
+  `TargetCoordinates_Id` int(10) unsigned NOT NULL AUTO_INCREMENT,
+  `RaH` tinyint(3) unsigned NOT NULL,
+  `RaM` tinyint(3) unsigned NOT NULL,
+  `RaS` double NOT NULL,
+  `DecSign` enum('+','-') NOT NULL,
+  `DecD` tinyint(3) unsigned NOT NULL,
+  `DecM` tinyint(3) unsigned NOT NULL,
+  `DecS` double NOT NULL,
+  PRIMARY KEY (`TargetCoordinates_Id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+INSERT INTO `TargetCoordinates` VALUES (3,1,2,3.5,'+',4,5,6.5);
+"""
+
+    anonymiser = DumpAnonymiser()
+    lines = list(anonymiser.transform(dump.splitlines(keepends=True)))
+
+    pipt_user = parse_rows(_values(lines[6]))[0]
+    assert pipt_user[0] == "7"
+    assert pipt_user[1] != "'realuser'"
+    assert pipt_user[2] == f"'{hashlib.md5(b'user-7-secret').hexdigest()}'"
+
+    coordinates = parse_rows(_values(lines[-1]))[0]
+    assert coordinates[0] == "3"
+    assert coordinates[4] in ("'+'", "'-'")
+    assert coordinates[1:] != ["1", "2", "3.5", "'+'", "4", "5", "6.5"]
+
+
+SOURCE_DB = Database(host="source", database="sdb", username="user", password="a")
+TEST_DB = Database(host="test", database="test_sdb", username="user", password="b")
+
+
+def test_checkpoint_records_phases(tmp_path: Path) -> None:
+    """Phases are recorded in the state file and can be resumed."""
+    path = str(tmp_path / "state.json")
+    checkpoint = Checkpoint(path, SOURCE_DB, TEST_DB)
+    checkpoint.start("create")
+    checkpoint.finish("create", 0.5)
+    checkpoint.start("table Investigator")
+    checkpoint.fail("table Investigator", 2, size=100)
+
+    resumed = Checkpoint(path, SOURCE_DB, TEST_DB, resume=True)
+    assert resumed.is_done("create")
+    assert resumed.status("table Investigator") == "started"
+    assert resumed.status("views") is None
+
+    resumed.start("table Investigator")
+    resumed.finish("table Investigator", 3, rows=10, size=50)
+    state = RunState.parse_file(path).phases["table Investigator"]
+    assert state.status == "done"
+    assert state.seconds == 5
+    assert state.rows == 10
+    assert state.size == 150
+    assert "password" not in Path(path).read_text()
+
+
+def test_checkpoint_ignores_state_file_unless_resumed(tmp_path: Path) -> None:
+    """A run which isn't resumed starts from scratch."""
+    path = str(tmp_path / "state.json")
+    checkpoint = Checkpoint(path, SOURCE_DB, TEST_DB)
+    checkpoint.start("create")
+    checkpoint.finish("create", 1)
+
+    assert Checkpoint(path, SOURCE_DB, TEST_DB).status("create") is None
+
+
+def test_checkpoint_rejects_state_file_for_other_databases(tmp_path: Path) -> None:
+    """A run can only be resumed for the same databases."""
+    path = str(tmp_path / "state.json")
+    Checkpoint(path, SOURCE_DB, TEST_DB).save()
+    other_test_db = TEST_DB.copy(update={"database": "test_other"})
+
+    with pytest.raises(click.ClickException):
+        Checkpoint(path, SOURCE_DB, other_test_db, resume=True)
+
+
+def test_format_summary(tmp_path: Path) -> None:
+    """The summary includes the status, rows and throughput of every phase."""
+    checkpoint = Checkpoint(str(tmp_path / "state.json"), SOURCE_DB, TEST_DB)
+    checkpoint.start("create")
+    checkpoint.finish("create", 0.5)
+    checkpoint.skip("create")
+    checkpoint.start("table Investigator")
+    checkpoint.finish("table Investigator", 2, rows=1000, size=4_000_000)
+    checkpoint.start("table Proposal")
+
+    lines = format_summary(checkpoint).splitlines()
+
+    assert lines[2].split() == ["create", "skipped", "0.5", "-", "-", "-"]
+    assert lines[3].split() == [
+        "table",
+        "Investigator",
+        "done",
+        "2.0",
+        "1,000",
+        "500",
+        "2.00",
+    ]
+    assert lines[4].split()[2] == "failed"
+    assert lines[-1].split() == ["Total", "2.5", "1,000", "1.60"]
+
+
+def test_reset_fake_values() -> None:
+    """A table always gets the same fake values."""
+    reset_fake_values("Investigator")
+    first = [anonymise_investigator(i) for i in range(5)]
+    anonymise_target_coordinates(1)
+    reset_fake_values("Investigator")
+    second = [anonymise_investigator(i) for i in range(5)]
+
+    assert first == second
@@ -1,6 +1,11 @@
+import pytest
 from _pytest.monkeypatch import MonkeyPatch
+from fastapi import HTTPException
+from starlette import status
 
-from app.dependencies import get_settings
+from app.dependencies import get_settings, require_permission
+from app.models.permission import Permission
+from app.models.principal import Principal
 
 
 def test_get_settings(monkeypatch: MonkeyPatch) -> None:
@@ -10,3 +15,22 @@ def test_get_settings(monkeypatch: MonkeyPatch) -> None:
     settings = get_settings()
 
     assert settings.secret_key == "very-secret"
+
+
+@pytest.mark.asyncio
+async def test_require_permission() -> None:
+    """require_permission rejects users without the required permissions."""
+    dependency = require_permission(Permission.VIEW_TARGETS | Permission.EXPORT_DATA)
+    allowed = Principal("jane", Permission.VIEW_TARGETS | Permission.EXPORT_DATA)
+    denied = Principal("john", Permission.VIEW_TARGETS)
+
+    assert await dependency(user=allowed) is allowed
+    with pytest.raises(HTTPException) as excinfo:
+        await dependency(user=denied)
+    assert excinfo.value.status_code == status.HTTP_403_FORBIDDEN
+
+    # routes requiring the same permissions share the dependency
+    assert (
+        require_permission(Permission.VIEW_TARGETS | Permission.EXPORT_DATA)
+        is dependency
+    )
@@ -0,0 +1,85 @@
+import datetime
+import decimal
+import enum
+import json
+from typing import Any, List
+
+import pytest
+from pydantic import BaseModel
+
+from app.responses import FastJSONResponse, dumps
+
+
+class Colour(enum.Enum):
+    RED = "red"
+
+
+class Target(BaseModel):
+    name: str
+    magnitude: float
+
+
+class Proposal(BaseModel):
+    code: str
+    targets: List[Target]
+
+
+@pytest.mark.parametrize(
+    "content,expected",
+    [
+        ({"a": 1, "b": [True, None]}, {"a": 1, "b": [True, None]}),
+        (Target(name="M42", magnitude=4.0), {"name": "M42", "magnitude": 4.0}),
+        (
+            [
+                Proposal(
+                    code="2021-1-SCI-001", targets=[Target(name="M42", magnitude=4)]
+                )
+            ],
+            [
+                {
+                    "code": "2021-1-SCI-001",
+                    "targets": [{"name": "M42", "magnitude": 4.0}],
+                }
+            ],
+        ),
+        (decimal.Decimal("1.5"), 1.5),
+        (Colour.RED, "red"),
+        (datetime.date(2021, 5, 1), "2021-05-01"),
+        (datetime.datetime(2021, 5, 1, 12, 30), "2021-05-01T12:30:00"),
+        ({"€": "Ω"}, {"€": "Ω"}),
+        ({1: "a", 2: ["b"]}, {"1": "a", "2": ["b"]}),
+        ({"ids": {1, 2}}, {"ids": [1, 2]}),
+        (datetime.timedelta(minutes=1), 60.0),
+    ],
+)
+def test_dumps(content: Any, expected: Any) -> None:
+    """dumps serialises content as JSON."""
+    assert json.loads(dumps(content)) == expected
+
+
+def test_dumps_uses_model_field_values() -> None:
+    """Models are serialised from their field values, also if they are constructed."""
+    proposal = Proposal.construct(
+        code="2021-1-SCI-001", targets=[Target.construct(name="M42", magnitude=4.0)]
+    )
+
+    assert json.loads(dumps({"proposal": proposal})) == {
+        "proposal": {
+            "code": "2021-1-SCI-001",
+            "targets": [{"name": "M42", "magnitude": 4.0}],
+        }
+    }
+
+
+def test_dumps_rejects_unknown_types() -> None:
+    """dumps raises an error for objects it cannot serialise."""
+    with pytest.raises(TypeError):
+        dumps(object())
+
+
+def test_fast_json_response() -> None:
+    """FastJSONResponse renders its content as JSON."""
+    response = FastJSONResponse([Target(name="M42", magnitude=4.0)])
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == [{"name": "M42", "magnitude": 4.0}]
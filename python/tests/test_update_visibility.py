@@ -0,0 +1,52 @@
+import datetime
+from typing import List
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from app import update_visibility
+from app.models.pydantic import Semester
+from app.service import target as target_service
+
+SEMESTERS = [
+    Semester(
+        year=2021,
+        semester=1,
+        start=datetime.date(2021, 5, 1),
+        end=datetime.date(2021, 10, 31),
+    ),
+    Semester(
+        year=2021,
+        semester=2,
+        start=datetime.date(2021, 11, 1),
+        end=datetime.date(2022, 4, 30),
+    ),
+]
+
+
+@pytest.fixture()
+def semesters(monkeypatch: MonkeyPatch) -> None:
+    async def mock_get_semesters() -> List[Semester]:
+        return SEMESTERS
+
+    monkeypatch.setattr(update_visibility, "get_semesters", mock_get_semesters)
+    monkeypatch.setattr(target_service, "get_semesters", mock_get_semesters)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("semesters")
+async def test_find_semester() -> None:
+    """Semesters are found by year and semester."""
+    assert await update_visibility.find_semester("2021-2") == SEMESTERS[1]
+    with pytest.raises(ValueError):
+        await update_visibility.find_semester("2021-3")
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("semesters")
+async def test_get_semester() -> None:
+    """The semester of a night is the one containing the night's date."""
+    get_semester = target_service.get_semester
+    assert await get_semester(datetime.date(2021, 10, 31)) == SEMESTERS[0]
+    assert await get_semester(datetime.date(2022, 1, 15)) == SEMESTERS[1]
+    assert await get_semester(datetime.date(2023, 1, 1)) is None
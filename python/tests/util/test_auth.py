@@ -1,5 +1,8 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from time import time
+from pathlib import Path
+from time import sleep, time
 from typing import Any, Dict, Optional, cast
 
 import pytest
@@ -10,10 +13,12 @@ from pydantic import BaseModel
 from starlette import status
 from starlette.requests import Request
 
+from app.models.permission import Permission
 from app.models.pydantic import UserInDB
 from app.service import user as user_service
-from app.util import auth
+from app.util import auth, permission_version
 from app.util.auth import OAuth2TokenOrCookiePasswordBearer
+from app.util.permission_version import PermissionVersionStore
 
 
 class RequestMock(BaseModel):
@@ -245,3 +250,166 @@ def test_get_current_user_returns_user(monkeypatch: MonkeyPatch) -> None:
     user = auth.get_current_user(secret_key, token)
     assert user.username == "johndoe"
     assert not hasattr(user, "hashed_password")
+
+
+def test_preload() -> None:
+    """preload initialises the password hashing backend."""
+    auth.preload()
+
+    assert auth.get_password_context() is auth.get_password_context()
+    assert auth.get_password_context().handler().has_backend()
+
+
+def test_verify_token() -> None:
+    """verify_token returns the username for valid tokens only."""
+    secret_key = "very-secret"
+    token = auth.create_jwt_token(secret_key=secret_key, payload={"sub": "johndoe"})
+
+    # the result is the same whether it is cached or not
+    assert auth.verify_token(secret_key, token) == "johndoe"
+    assert auth.verify_token(secret_key, token) == "johndoe"
+
+    assert auth.verify_token("another-secret", token) is None
+    assert auth.verify_token(secret_key, "corrupted-token") is None
+
+
+def test_concurrent_user_lookups_are_coalesced(monkeypatch: MonkeyPatch) -> None:
+    """Concurrent requests for the same user share a single user lookup."""
+    lookups = []
+    barrier = threading.Barrier(5)
+
+    def mock_get_user(username: str) -> UserInDB:
+        lookups.append(username)
+        sleep(0.1)
+        return UserInDB(username=username, hashed_password="whatever")
+
+    monkeypatch.setattr(user_service, "get_user", mock_get_user)
+    secret_key = "very-secret"
+    token = auth.create_jwt_token(secret_key=secret_key, payload={"sub": "johndoe"})
+
+    def get_current_user() -> str:
+        barrier.wait()
+        return auth.get_current_user(secret_key, token).username
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        usernames = list(executor.map(lambda _: get_current_user(), range(5)))
+
+    assert usernames == ["johndoe"] * 5
+    assert lookups == ["johndoe"]
+
+
+def test_get_current_user_uses_token_permissions(monkeypatch: MonkeyPatch) -> None:
+    """The permissions in a token are used without looking up the user."""
+
+    def mock_get_user(username: str) -> UserInDB:
+        raise AssertionError("The user should not be looked up.")
+
+    monkeypatch.setattr(user_service, "get_user", mock_get_user)
+    secret_key = "very-secret"
+    version = user_service.get_permission_version("permitted-user")
+    token = auth.create_jwt_token(
+        secret_key=secret_key,
+        payload=auth.token_payload("permitted-user", Permission.VIEW_TARGETS, version),
+    )
+
+    # the result is the same whether the claims are cached or not
+    for _ in range(2):
+        user = auth.get_current_user(secret_key, token)
+        assert user.username == "permitted-user"
+        assert user.permissions == Permission.VIEW_TARGETS
+
+
+def test_get_current_user_looks_up_permissions_for_tokens_without_them() -> None:
+    """The permissions are looked up for tokens issued without them."""
+    secret_key = "very-secret"
+    token = auth.create_jwt_token(secret_key=secret_key, payload={"sub": "johndoe"})
+
+    user = auth.get_current_user(secret_key, token)
+
+    assert user.permissions == user_service.get_permissions("johndoe")
+
+
+def test_changed_permissions_invalidate_tokens() -> None:
+    """Tokens issued before a user's permissions changed are rejected."""
+    secret_key = "very-secret"
+    username = "user-with-changing-permissions"
+    old_version = user_service.get_permission_version(username)
+    old_token = auth.create_jwt_token(
+        secret_key=secret_key,
+        payload=auth.token_payload(username, Permission.VIEW_TARGETS, old_version),
+    )
+    assert auth.get_current_user(secret_key, old_token).username == username
+
+    user_service.permissions_changed(username)
+
+    with pytest.raises(HTTPException) as excinfo:
+        auth.get_current_user(secret_key, old_token)
+    assert excinfo.value.status_code == 401
+
+    new_version = user_service.get_permission_version(username)
+    assert new_version > old_version
+    new_token = auth.create_jwt_token(
+        secret_key=secret_key,
+        payload=auth.token_payload(username, Permission.NONE, new_version),
+    )
+    assert auth.get_current_user(secret_key, new_token).permissions == Permission.NONE
+
+
+def test_tokens_are_revoked_in_all_workers(
+    tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    """A permission change in one worker invalidates tokens in the other workers."""
+    database = str(tmp_path / "permissions.sqlite3")
+    worker1 = PermissionVersionStore(database=database, revalidate_interval=0)
+    worker2 = PermissionVersionStore(database=database, revalidate_interval=0)
+    secret_key = "very-secret"
+    username = "user-in-two-workers"
+
+    monkeypatch.setattr(user_service, "get_permission_version_store", lambda: worker1)
+    token = auth.create_jwt_token(
+        secret_key=secret_key,
+        payload=auth.token_payload(
+            username,
+            Permission.VIEW_TARGETS,
+            user_service.get_permission_version(username),
+        ),
+    )
+
+    monkeypatch.setattr(user_service, "get_permission_version_store", lambda: worker2)
+    assert auth.get_current_user(secret_key, token).username == username
+
+    worker1.change(username)
+    with pytest.raises(HTTPException) as excinfo:
+        auth.get_current_user(secret_key, token)
+    assert excinfo.value.status_code == 401
+
+
+def test_tokens_are_rejected_if_the_version_is_lost(monkeypatch: MonkeyPatch) -> None:
+    """Tokens are rejected if their user's permission version cannot be found."""
+    secret_key = "very-secret"
+    username = "user-with-lost-version"
+    epochs = iter([1, 2])
+    monkeypatch.setattr(permission_version, "_new_epoch", lambda: next(epochs))
+    store = PermissionVersionStore()
+    monkeypatch.setattr(user_service, "get_permission_version_store", lambda: store)
+    token = auth.create_jwt_token(
+        secret_key=secret_key,
+        payload=auth.token_payload(
+            username,
+            Permission.VIEW_TARGETS,
+            user_service.get_permission_version(username),
+        ),
+    )
+    assert auth.get_current_user(secret_key, token).username == username
+
+    # the version store is lost, e.g. because its database file has been removed
+    new_store = PermissionVersionStore()
+    monkeypatch.setattr(user_service, "get_permission_version_store", lambda: new_store)
+    with pytest.raises(HTTPException) as excinfo:
+        auth.get_current_user(secret_key, token)
+    assert excinfo.value.status_code == 401
+
+    # ... and a version from the new store doesn't make the old token valid again
+    new_store.change(username)
+    with pytest.raises(HTTPException):
+        auth.get_current_user(secret_key, token)
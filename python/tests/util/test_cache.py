@@ -0,0 +1,183 @@
+import multiprocessing
+import pathlib
+import sys
+import threading
+import time
+from typing import List
+
+import pytest
+
+from app.util.cache import LRUCache, SharedMemoryCache, TieredCache
+
+
+def test_lru_cache_stores_values() -> None:
+    """LRUCache stores and deletes values."""
+    cache = LRUCache()
+    assert cache.get("a") is None
+
+    cache.set("a", b"1")
+    assert cache.get("a") == b"1"
+
+    cache.delete("a")
+    assert cache.get("a") is None
+
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_cache_evicts_least_recently_used_values() -> None:
+    """LRUCache evicts the least recently used values."""
+    cache = LRUCache(max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    assert cache.get("c") == b"3"
+
+
+def test_lru_cache_values_expire() -> None:
+    """Values in an LRUCache expire."""
+    cache = LRUCache()
+    cache.set("a", b"1", ttl=-1)
+    cache.set("b", b"2", ttl=100)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == b"2"
+
+
+def test_shared_memory_cache_stores_values(tmp_path: pathlib.Path) -> None:
+    """SharedMemoryCache stores and deletes values."""
+    cache = SharedMemoryCache(tmp_path / "cache", slots=16, slot_size=64)
+    assert cache.get("a") is None
+
+    cache.set("a", b"1")
+    cache.set("b", b"2", ttl=-1)
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+
+    generation = cache.generation()
+    cache.delete("a")
+    assert cache.get("a") is None
+    assert cache.generation() == generation + 1
+
+    cache.set("a", b"3")
+    cache.clear()
+    assert cache.get("a") is None
+
+
+def test_shared_memory_cache_handles_full_tables(tmp_path: pathlib.Path) -> None:
+    """SharedMemoryCache overwrites values if there is no free slot."""
+    cache = SharedMemoryCache(tmp_path / "cache", slots=4, slot_size=64)
+    for i in range(20):
+        cache.set(str(i), str(i).encode())
+
+    assert cache.get("19") == b"19"
+    assert sum(cache.get(str(i)) is not None for i in range(20)) <= 4
+
+
+def test_shared_memory_cache_ignores_large_values(tmp_path: pathlib.Path) -> None:
+    """SharedMemoryCache does not store values too large for a slot."""
+    cache = SharedMemoryCache(tmp_path / "cache", slots=4, slot_size=64)
+    cache.set("a", b"x" * 100)
+
+    assert cache.get("a") is None
+
+
+def test_shared_memory_cache_rejects_incompatible_files(
+    tmp_path: pathlib.Path,
+) -> None:
+    """SharedMemoryCache raises an error if the file has different dimensions."""
+    SharedMemoryCache(tmp_path / "cache", slots=4, slot_size=64)
+    with pytest.raises(ValueError):
+        SharedMemoryCache(tmp_path / "cache", slots=8, slot_size=64)
+
+
+def _set_value(path: pathlib.Path) -> None:
+    SharedMemoryCache(path, slots=16, slot_size=64).set("a", b"from another process")
+
+
+def test_shared_memory_cache_is_shared_between_processes(
+    tmp_path: pathlib.Path,
+) -> None:
+    """SharedMemoryCache values are visible to other processes."""
+    path = tmp_path / "cache"
+    cache = SharedMemoryCache(path, slots=16, slot_size=64)
+
+    process = multiprocessing.Process(target=_set_value, args=(path,))
+    process.start()
+    process.join()
+
+    assert cache.get("a") == b"from another process"
+
+
+def test_shared_memory_cache_is_thread_safe(tmp_path: pathlib.Path) -> None:
+    """Threads sharing a cache never read partially written values."""
+    # switch threads often, so that a missing lock is likely to be noticed
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    cache = SharedMemoryCache(tmp_path / "cache", slots=4, slot_size=128)
+    errors: List[bytes] = []
+    stop = threading.Event()
+
+    def write() -> None:
+        for i in range(20000):
+            # a value of n bytes, all equal to n
+            n = 1 + i % 90
+            cache.set(f"key{i % 2}", bytes([n]) * n)
+        stop.set()
+
+    def read() -> None:
+        while not stop.is_set():
+            for key in ("key0", "key1"):
+                value = cache.get(key)
+                if value is not None and value != bytes([len(value)]) * len(value):
+                    errors.append(value)
+
+    threads = [threading.Thread(target=write) for _ in range(2)]
+    threads += [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert errors == []
+
+
+def test_tiered_cache_copies_values_to_faster_layers(tmp_path: pathlib.Path) -> None:
+    """TieredCache copies values found in slower layers to the faster layers."""
+    local = LRUCache()
+    shared = SharedMemoryCache(tmp_path / "cache", slots=16, slot_size=64)
+    shared.set("a", b"1", ttl=100)
+    cache = TieredCache([local, shared])
+
+    assert cache.get("a") == b"1"
+    entry = local.get_entry("a")
+    assert entry is not None
+    assert entry[0] == b"1"
+    assert entry[1] is not None and abs(entry[1] - time.time() - 100) < 5
+
+
+def test_tiered_cache_invalidations_reach_all_workers(tmp_path: pathlib.Path) -> None:
+    """Deleting a value in one worker removes it from the caches of all workers."""
+    path = tmp_path / "cache"
+    worker1 = TieredCache([LRUCache(), SharedMemoryCache(path, slots=16, slot_size=64)])
+    worker2 = TieredCache([LRUCache(), SharedMemoryCache(path, slots=16, slot_size=64)])
+
+    worker1.set("a", b"1")
+    assert worker2.get("a") == b"1"
+
+    worker2.delete("a")
+    assert worker1.get("a") is None
+    assert worker2.get("a") is None
+
+
+def test_tiered_cache_needs_layers() -> None:
+    """TieredCache needs at least one layer."""
+    with pytest.raises(ValueError):
+        TieredCache([])
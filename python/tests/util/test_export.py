@@ -0,0 +1,48 @@
+from typing import Any, AsyncIterator, List, Sequence
+
+import pytest
+
+from app.util.export import encode
+
+
+async def _batches(
+    batches: List[Sequence[Sequence[Any]]],
+) -> AsyncIterator[Sequence[Sequence[Any]]]:
+    for batch in batches:
+        yield batch
+
+
+@pytest.mark.asyncio
+async def test_encode_ndjson() -> None:
+    """Rows are encoded as one JSON object per line, with one chunk per batch."""
+    batches = _batches([[(1, "a")], [(2, "b"), (3, None)]])
+    chunks = [chunk async for chunk in encode(batches, ["id", "name"], "ndjson")]
+
+    assert chunks == [
+        b'{"id":1,"name":"a"}\n',
+        b'{"id":2,"name":"b"}\n{"id":3,"name":null}\n',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_encode_csv() -> None:
+    """Rows are encoded as CSV with a header line."""
+    batches = _batches([[(1, "a,b")], [(2, "c")]])
+    chunks = [chunk async for chunk in encode(batches, ["id", "name"], "csv")]
+
+    assert b"".join(chunks) == b'id,name\n1,"a,b"\n2,c\n'
+    assert len(chunks) == 2
+
+
+@pytest.mark.asyncio
+async def test_encode_csv_without_rows() -> None:
+    """The header line is returned even if there are no rows."""
+    chunks = [chunk async for chunk in encode(_batches([]), ["id", "name"], "csv")]
+
+    assert chunks == [b"id,name\n"]
+
+
+def test_encode_rejects_unknown_formats() -> None:
+    """An error is raised for an unknown export format."""
+    with pytest.raises(ValueError):
+        encode(_batches([]), ["id"], "xml")
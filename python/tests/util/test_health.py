@@ -0,0 +1,25 @@
+import asyncio
+import time
+
+import pytest
+
+from app.util.health import EventLoopLagProbe
+
+
+@pytest.mark.asyncio
+async def test_event_loop_lag_probe_measures_lag() -> None:
+    """The probe measures how long the event loop has been blocked."""
+    probe = EventLoopLagProbe(interval=0.01)
+    assert probe.lag is None
+
+    task = asyncio.ensure_future(probe.run())
+    while probe.lag is None:
+        await asyncio.sleep(0.01)
+    # generous, as a busy machine may delay the event loop anyway
+    assert probe.max_lag is not None and probe.max_lag < 0.15
+
+    time.sleep(0.3)  # block the event loop
+    await asyncio.sleep(0.03)
+    task.cancel()
+
+    assert probe.max_lag is not None and probe.max_lag >= 0.25
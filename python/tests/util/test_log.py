@@ -0,0 +1,185 @@
+import json
+import logging
+import queue
+from typing import Any, Generator, List, Optional
+
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from app.util.log import (
+    BoundedQueueHandler,
+    JSONFormatter,
+    RequestLoggingMiddleware,
+    RequestSampler,
+    request_id,
+)
+
+
+@pytest.fixture()
+def records() -> Generator[List[logging.LogRecord], None, None]:
+    """Capture the records logged by the request logging middleware."""
+    captured: List[logging.LogRecord] = []
+
+    class Handler(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            captured.append(record)
+
+    logger = logging.getLogger("app.requests")
+    handler = Handler()
+    logger.addHandler(handler)
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    yield captured
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+def test_json_formatter() -> None:
+    """Records are formatted as JSON objects with the extra fields."""
+    record = logging.makeLogRecord(
+        {
+            "name": "test",
+            "levelname": "INFO",
+            "msg": "Hello %s",
+            "args": ("world",),
+            "status": 200,
+            "request_id": "abc",
+            "obj": object(),
+        }
+    )
+
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert entry["message"] == "Hello world"
+    assert entry["level"] == "INFO"
+    assert entry["status"] == 200
+    assert entry["request_id"] == "abc"
+    assert entry["obj"].startswith("<object")
+
+
+def test_bounded_queue_handler_drops_records() -> None:
+    """Records are dropped rather than blocking if the queue is full."""
+    log_queue: "queue.Queue[Any]" = queue.Queue(maxsize=2)
+    handler = BoundedQueueHandler(log_queue)
+    token = request_id.set("abc")
+    try:
+        for i in range(5):
+            handler.handle(logging.makeLogRecord({"msg": "%d", "args": (i,)}))
+    finally:
+        request_id.reset(token)
+
+    assert handler.dropped == 3
+    record = log_queue.get_nowait()
+    assert record.msg == "0"
+    assert record.request_id == "abc"
+
+
+def test_bounded_queue_handler_keeps_exceptions_separate() -> None:
+    """The exception is formatted, but not added to the message."""
+    log_queue: "queue.Queue[Any]" = queue.Queue()
+    handler = BoundedQueueHandler(log_queue)
+    try:
+        raise ValueError("failed")
+    except ValueError:
+        logger = logging.getLogger("test_bounded_queue_handler")
+        logger.addHandler(handler)
+        logger.exception("Something failed.")
+        logger.removeHandler(handler)
+
+    record = log_queue.get_nowait()
+    assert record.msg == "Something failed."
+    assert "ValueError: failed" in record.exc_text
+    assert "ValueError" in json.loads(JSONFormatter().format(record))["exception"]
+
+
+def test_sampler() -> None:
+    """Successful requests are sampled, failed and slow requests are always logged."""
+    sampler = RequestSampler(
+        rates={"/health/": 0, "/api/": 0, "/api/token": 1}, slow_request_threshold=1
+    )
+
+    assert sampler.should_log("/health/ready", 500, 0.1)
+    assert sampler.should_log("/health/ready", 200, 2)
+    assert not sampler.should_log("/health/ready", 200, 0.1)
+    assert not sampler.should_log("/api/targets", 200, 0.1)
+    assert sampler.should_log("/api/token", 200, 0.1)
+    assert sampler.should_log("/other", 404, 0.1)
+    # client errors are not sampled either
+    assert sampler.should_log("/api/targets", 401, 0.1)
+    assert sampler.should_log("/api/targets", 404, 0.1)
+
+
+def test_sampler_status_threshold() -> None:
+    """The status code from which on requests are always logged can be changed."""
+    sampler = RequestSampler(default_rate=0, min_unsampled_status=500)
+
+    assert not sampler.should_log("/api/targets", 404, 0.1)
+    assert sampler.should_log("/api/targets", 503, 0.1)
+
+
+def _app(sampler: Optional[RequestSampler] = None) -> Starlette:
+    app = Starlette()
+
+    @app.route("/hello")
+    async def hello(request: Request) -> PlainTextResponse:
+        logging.getLogger("app.requests").info("in request")
+        return PlainTextResponse(request_id.get() or "")
+
+    @app.route("/fail")
+    async def fail(request: Request) -> PlainTextResponse:
+        raise ValueError("failed")
+
+    app.add_middleware(RequestLoggingMiddleware, sampler=sampler)
+    return app
+
+
+def test_middleware_assigns_request_ids(records: List[logging.LogRecord]) -> None:
+    """Every request gets a request id, which is logged and returned."""
+    client = TestClient(_app())
+
+    resp = client.get("/hello")
+    generated_id = resp.headers["X-Request-ID"]
+    assert len(generated_id) == 32
+    assert resp.text == generated_id
+
+    resp = client.get("/hello", headers={"X-Request-ID": "my-id"})
+    assert resp.headers["X-Request-ID"] == "my-id"
+
+    resp = client.get("/hello", headers={"X-Request-ID": "invalid id!"})
+    assert resp.headers["X-Request-ID"] != "invalid id!"
+
+    request_records = [r for r in records if getattr(r, "path", None) == "/hello"]
+    assert len(request_records) == 3
+    assert request_records[0].status == 200  # type: ignore
+    assert request_records[0].method == "GET"  # type: ignore
+
+
+def test_middleware_logs_client_errors_of_sampled_out_paths(
+    records: List[logging.LogRecord],
+) -> None:
+    """Client errors are logged even if successful requests are not."""
+    client = TestClient(_app(sampler=RequestSampler(default_rate=0)))
+
+    assert client.get("/hello").status_code == 200
+    assert client.get("/missing").status_code == 404
+
+    logged_paths = [
+        getattr(r, "path", None) for r in records if r.name == "app.requests"
+    ]
+    assert "/missing" in logged_paths
+    assert "/hello" not in logged_paths
+
+
+def test_middleware_logs_errors(records: List[logging.LogRecord]) -> None:
+    """Failing requests are logged as errors."""
+    client = TestClient(_app(), raise_server_exceptions=False)
+
+    resp = client.get("/fail")
+
+    assert resp.status_code == 500
+    error_records = [r for r in records if r.levelno == logging.ERROR]
+    assert len(error_records) == 1
+    assert error_records[0].exc_info is not None
@@ -0,0 +1,77 @@
+import pathlib
+import time
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.util import permission_version
+from app.util.permission_version import PermissionVersionStore, version_epoch
+
+
+def test_versions_are_created_and_changed() -> None:
+    """A user gets a version, which increases whenever it is changed."""
+    store = PermissionVersionStore()
+
+    assert store.get("johndoe") is None
+    version = store.get_or_create("johndoe")
+    assert store.get("johndoe") == version
+    assert store.get_or_create("johndoe") == version
+
+    new_version = store.change("johndoe")
+    assert new_version > version
+    assert store.get("johndoe") == new_version
+    assert store.get("janedoe") is None
+
+
+def test_versions_are_shared(tmp_path: pathlib.Path, monkeypatch: MonkeyPatch) -> None:
+    """Other stores using the same database see a change after revalidating."""
+    database = str(tmp_path / "permissions.sqlite3")
+    store1 = PermissionVersionStore(database=database, revalidate_interval=5)
+    store2 = PermissionVersionStore(database=database, revalidate_interval=5)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+
+    version = store1.get_or_create("johndoe")
+    assert store2.get("johndoe") == version
+
+    new_version = store1.change("johndoe")
+    assert store1.get("johndoe") == new_version
+    # store2 still uses the version it has read recently...
+    assert store2.get("johndoe") == version
+
+    # ... but rereads it after the revalidation interval
+    monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+    assert store2.get("johndoe") == new_version
+
+
+def test_versions_are_persisted(tmp_path: pathlib.Path) -> None:
+    """Versions survive a restart."""
+    database = str(tmp_path / "permissions.sqlite3")
+    store = PermissionVersionStore(database=database)
+    version = store.change("johndoe")
+    store.close()
+
+    assert PermissionVersionStore(database=database).get("johndoe") == version
+
+
+def test_versions_of_a_new_database_differ(monkeypatch: MonkeyPatch) -> None:
+    """A replacement for a lost database never hands out a version of the old one."""
+    epochs = iter([7, 8])
+    monkeypatch.setattr(permission_version, "_new_epoch", lambda: next(epochs))
+    store = PermissionVersionStore()
+    versions = {store.get_or_create("johndoe"), store.change("johndoe")}
+    new_store = PermissionVersionStore()
+
+    assert new_store.get_or_create("johndoe") not in versions
+    assert new_store.change("johndoe") not in versions
+    assert {version_epoch(v) for v in versions} == {7}
+    assert version_epoch(new_store.change("johndoe")) == 8
+
+
+def test_epoch_is_shared(tmp_path: pathlib.Path) -> None:
+    """All stores using the same database use the same epoch."""
+    database = str(tmp_path / "permissions.sqlite3")
+    store1 = PermissionVersionStore(database=database)
+    store2 = PermissionVersionStore(database=database)
+
+    assert store1.epoch == store2.epoch
+    assert version_epoch(store2.change("johndoe")) == store1.epoch
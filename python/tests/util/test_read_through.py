@@ -0,0 +1,167 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Sequence
+
+import pytest
+
+from app.util.read_through import ReadThroughCache
+
+
+def _counting_loader(value: Any) -> Callable[[], Awaitable[Any]]:
+    calls: List[int] = []
+
+    async def load() -> Any:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return value
+
+    load.calls = calls  # type: ignore
+    return load
+
+
+@pytest.mark.asyncio
+async def test_values_are_loaded_once() -> None:
+    """Values are loaded on the first request and then taken from the cache."""
+    cache = ReadThroughCache()
+    load = _counting_loader("a")
+
+    assert await cache.get("key", load) == "a"
+    assert await cache.get("key", load) == "a"
+    assert len(load.calls) == 1  # type: ignore
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_a_load() -> None:
+    """Concurrent requests for a missing value share a single load."""
+    cache = ReadThroughCache()
+    load = _counting_loader("a")
+
+    async def get_many() -> List[Any]:
+        return list(await asyncio.gather(*(cache.get("key", load) for _ in range(10))))
+
+    assert await get_many() == ["a"] * 10
+    assert len(load.calls) == 1  # type: ignore
+    assert cache.stats()["shared_loads"] == 9
+
+
+@pytest.mark.asyncio
+async def test_load_errors_are_not_cached() -> None:
+    """Errors are raised for all waiting requests, and the value isn't cached."""
+    cache = ReadThroughCache()
+
+    async def fail() -> Any:
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def get_many() -> List[Any]:
+        return list(
+            await asyncio.gather(
+                *(cache.get("key", fail) for _ in range(3)), return_exceptions=True
+            )
+        )
+
+    results = await get_many()
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(cache) == 0
+    assert await cache.get("key", _counting_loader("a")) == "a"
+
+
+@pytest.mark.asyncio
+async def test_values_expire() -> None:
+    """Values are loaded again after their time to live."""
+    cache = ReadThroughCache(default_ttl=100)
+    load = _counting_loader("a")
+
+    await cache.get("key", load, ttl=-1)
+    await cache.get("key", load)
+    await cache.get("key", load)
+
+    assert len(load.calls) == 2  # type: ignore
+    assert cache.stats()["expirations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_values_are_evicted() -> None:
+    """The least recently used values are evicted if the cache is full."""
+    cache = ReadThroughCache(max_entries=2)
+    await cache.get("a", _counting_loader(1))
+    await cache.get("b", _counting_loader(2))
+    await cache.get("a", _counting_loader(1))
+    await cache.get("c", _counting_loader(3))
+
+    load_b = _counting_loader(2)
+    await cache.get("b", load_b)
+    assert len(load_b.calls) == 1  # type: ignore
+    assert cache.stats()["evictions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_changed_tables_invalidate_values() -> None:
+    """Values loaded from a changed table are removed when checking for changes."""
+    versions: Dict[str, Hashable] = {"A": 1, "B": 1}
+    probed: List[Sequence[str]] = []
+
+    async def probe(tables: Sequence[str]) -> Dict[str, Hashable]:
+        probed.append(list(tables))
+        return {table: versions[table] for table in tables}
+
+    cache = ReadThroughCache(probe=probe)
+    await cache.get("a", _counting_loader(1), tables=["A"])
+    await cache.get("ab", _counting_loader(2), tables=["A", "B"])
+    await cache.get("b", _counting_loader(3), tables=["B"])
+
+    assert await cache.check_for_changes() == 0
+
+    versions["A"] = 2
+    assert await cache.check_for_changes() == 2
+    assert len(cache) == 1
+
+    load = _counting_loader(3)
+    await cache.get("b", load, tables=["B"])
+    assert len(load.calls) == 0  # type: ignore
+
+    assert probed[0] == ["A"]
+    assert probed[-1] == ["A", "B"]
+
+
+@pytest.mark.asyncio
+async def test_changes_during_a_load_are_detected() -> None:
+    """A change made while a value is loaded invalidates the value."""
+    versions: Dict[str, Hashable] = {"A": 1}
+
+    async def probe(tables: Sequence[str]) -> Dict[str, Hashable]:
+        return {table: versions[table] for table in tables}
+
+    async def load() -> int:
+        versions["A"] = 2
+        return 1
+
+    cache = ReadThroughCache(probe=probe)
+    await cache.get("a", load, tables=["A"])
+
+    assert await cache.check_for_changes() == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidations_during_a_load_prevent_caching() -> None:
+    """A value isn't cached if the cache is invalidated while it is loaded."""
+    cache = ReadThroughCache()
+
+    async def load() -> int:
+        cache.clear()
+        return 1
+
+    assert await cache.get("a", load) == 1
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("key", ["a", "b"])
+@pytest.mark.asyncio
+async def test_invalidate(key: str) -> None:
+    """Single values can be invalidated."""
+    cache = ReadThroughCache()
+    await cache.get("a", _counting_loader(1))
+    cache.invalidate(key)
+
+    assert len(cache) == (0 if key == "a" else 1)
@@ -0,0 +1,113 @@
+import asyncio
+import pathlib
+import threading
+import time
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.util.session import SessionStore, collect_garbage
+
+
+def test_sessions_can_be_created_and_looked_up() -> None:
+    """A session id is mapped to the username of its session."""
+    store = SessionStore()
+    session_id = store.create("johndoe")
+
+    assert store.get_username(session_id) == "johndoe"
+    assert store.get_username("unknown-session-id") is None
+
+
+def test_sessions_can_be_revoked() -> None:
+    """Revoked sessions are not valid any longer."""
+    store = SessionStore()
+    session_id1 = store.create("johndoe")
+    session_id2 = store.create("johndoe")
+    session_id3 = store.create("janedoe")
+
+    store.revoke(session_id1)
+    assert store.get_username(session_id1) is None
+    assert store.get_username(session_id2) == "johndoe"
+
+    store.revoke_user("johndoe")
+    assert store.get_username(session_id2) is None
+    assert store.get_username(session_id3) == "janedoe"
+
+
+def test_sessions_have_a_sliding_expiry(monkeypatch: MonkeyPatch) -> None:
+    """Using a session extends its lifetime."""
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    store = SessionStore(lifetime=100)
+    session_id = store.create("johndoe")
+
+    # the session is used before it expires...
+    monkeypatch.setattr(time, "time", lambda: now + 90)
+    assert store.get_username(session_id) == "johndoe"
+
+    # ... so it is still valid after the original expiry time...
+    monkeypatch.setattr(time, "time", lambda: now + 180)
+    assert store.get_username(session_id) == "johndoe"
+
+    # ... but not if it hasn't been used for its lifetime
+    monkeypatch.setattr(time, "time", lambda: now + 281)
+    assert store.get_username(session_id) is None
+
+
+def test_sessions_are_persisted(tmp_path: pathlib.Path) -> None:
+    """Sessions are shared by stores using the same database file."""
+    database = str(tmp_path / "sessions.sqlite3")
+    store1 = SessionStore(database=database, revalidate_interval=0)
+    store2 = SessionStore(database=database, revalidate_interval=0)
+
+    session_id = store1.create("johndoe")
+    assert store2.get_username(session_id) == "johndoe"
+
+    store2.revoke(session_id)
+    assert store1.get_username(session_id) is None
+
+
+def test_remove_expired(monkeypatch: MonkeyPatch) -> None:
+    """remove_expired removes expired sessions only."""
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    store = SessionStore(lifetime=100)
+    store.create("johndoe")
+    monkeypatch.setattr(time, "time", lambda: now + 50)
+    store.create("janedoe")
+
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert store.remove_expired() == 1
+    assert len(store) == 1
+
+
+@pytest.mark.asyncio
+async def test_collect_garbage(monkeypatch: MonkeyPatch) -> None:
+    """collect_garbage removes expired sessions in the background."""
+    store = SessionStore(lifetime=-1)
+    store.create("johndoe")
+
+    task = asyncio.create_task(collect_garbage(store, 0.01))
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert len(store) == 0
+
+
+@pytest.mark.asyncio
+async def test_collect_garbage_does_not_block_the_event_loop() -> None:
+    """Expired sessions are removed in a thread rather than on the event loop."""
+    store = SessionStore()
+    threads = []
+
+    def remove_expired() -> int:
+        threads.append(threading.get_ident())
+        return 0
+
+    store.remove_expired = remove_expired  # type: ignore
+    task = asyncio.create_task(collect_garbage(store, 0.01))
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert threads
+    assert threading.get_ident() not in threads
@@ -0,0 +1,169 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+import pytest
+
+from app.util.single_flight import SingleFlight, ThreadSingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_a_computation() -> None:
+    """Concurrent calls with the same key share a computation."""
+    group: SingleFlight[int] = SingleFlight()
+    calls: List[str] = []
+
+    async def compute(key: str) -> int:
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def call_many() -> List[int]:
+        return list(
+            await asyncio.gather(
+                *(group.do(key, functools.partial(compute, key)) for key in "aaab")
+            )
+        )
+
+    assert await call_many() == [2, 2, 2, 2]
+    assert sorted(calls) == ["a", "b"]
+    assert group.stats() == {"calls": 4, "shared": 2, "in_flight": 0}
+
+    # results are not cached
+    await group.do("a", lambda: compute("a"))
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_errors_are_raised_for_all_callers() -> None:
+    """An error in the computation is raised for all callers."""
+    group: SingleFlight[int] = SingleFlight()
+
+    async def fail() -> int:
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def call_many() -> List[Any]:
+        return list(
+            await asyncio.gather(
+                *(group.do("a", fail) for _ in range(3)), return_exceptions=True
+            )
+        )
+
+    assert all(isinstance(result, ValueError) for result in await call_many())
+    assert len(group) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelling_a_caller_does_not_cancel_the_computation() -> None:
+    """The computation continues while there are callers which are not cancelled."""
+    group: SingleFlight[int] = SingleFlight()
+
+    async def compute() -> int:
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def call_and_cancel() -> int:
+        first = asyncio.ensure_future(group.do("a", compute))
+        second = asyncio.ensure_future(group.do("a", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert await call_and_cancel() == 42
+
+
+@pytest.mark.asyncio
+async def test_cancelling_all_callers_cancels_the_computation() -> None:
+    """The computation is cancelled if all its callers are cancelled."""
+    group: SingleFlight[int] = SingleFlight()
+    finished: List[bool] = []
+
+    async def compute() -> int:
+        await asyncio.sleep(0.05)
+        finished.append(True)
+        return 42
+
+    async def call_and_cancel() -> None:
+        callers = [asyncio.ensure_future(group.do("a", compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.sleep(0.1)
+
+    await call_and_cancel()
+    assert finished == []
+    assert len(group) == 0
+
+
+@pytest.mark.asyncio
+async def test_forget_starts_a_new_computation() -> None:
+    """Calls after forgetting a key start a new computation."""
+    group: SingleFlight[int] = SingleFlight()
+    calls: List[int] = []
+
+    async def compute() -> int:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def call_and_forget() -> List[int]:
+        first = asyncio.ensure_future(group.do("a", compute))
+        await asyncio.sleep(0)
+        group.forget("a")
+        second = asyncio.ensure_future(group.do("a", compute))
+        return [await first, await second]
+
+    assert await call_and_forget() == [2, 2]
+    assert len(calls) == 2
+
+
+def test_thread_single_flight_shares_computations() -> None:
+    """Concurrent calls from different threads share a computation."""
+    group: ThreadSingleFlight[int] = ThreadSingleFlight()
+    calls: List[int] = []
+    barrier = threading.Barrier(5)
+
+    def compute() -> int:
+        calls.append(1)
+        time.sleep(0.1)
+        return 42
+
+    def call() -> int:
+        barrier.wait()
+        return group.do("a", compute)
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(lambda _: call(), range(5)))
+
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert group.stats() == {"calls": 5, "shared": 4, "in_flight": 0}
+
+
+def test_thread_single_flight_raises_errors_for_all_callers() -> None:
+    """An error in the computation is raised in all threads."""
+    group: ThreadSingleFlight[int] = ThreadSingleFlight()
+    barrier = threading.Barrier(3)
+
+    def fail() -> int:
+        time.sleep(0.1)
+        raise ValueError("failed")
+
+    def call() -> Any:
+        barrier.wait()
+        try:
+            return group.do("a", fail)
+        except ValueError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(lambda _: call(), range(3)))
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(group) == 0
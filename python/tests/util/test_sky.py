@@ -0,0 +1,121 @@
+from typing import Tuple
+
+import numpy as np
+import pytest
+
+from app.util.sky import (
+    SkyIndex,
+    angular_separation,
+    sexagesimal_to_degrees,
+    unit_vectors,
+)
+
+
+def random_targets(count: int, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    ra = 360 * rng.random(count)
+    dec = np.degrees(np.arcsin(2 * rng.random(count) - 1))
+    return ra, dec
+
+
+def brute_force(
+    ra: np.ndarray, dec: np.ndarray, center_ra: float, center_dec: float, radius: float
+) -> np.ndarray:
+    separations = angular_separation(
+        unit_vectors(ra, dec), unit_vectors(center_ra, center_dec)
+    )
+    return np.sort(np.nonzero(separations <= radius)[0])
+
+
+def test_sexagesimal_to_degrees() -> None:
+    """sexagesimal_to_degrees converts sexagesimal coordinates."""
+    ra, dec = sexagesimal_to_degrees(
+        [0, 12, 23],
+        [0, 30, 59],
+        [0, 0, 60],
+        ["+", "-", "-"],
+        [0, 45, 0],
+        [0, 30, 0],
+        [0, 0, 36],
+    )
+
+    np.testing.assert_allclose(ra, [0, 187.5, 360])
+    np.testing.assert_allclose(dec, [0, -45.5, -0.01])
+
+
+@pytest.mark.parametrize(
+    "center_ra,center_dec,radius",
+    [
+        (10, 20, 1),
+        (180, -30, 5),
+        (0.1, 0, 2),  # wraps around RA = 0
+        (359.9, 45, 3),  # wraps around RA = 360
+        (50, -89.5, 2),  # includes the south pole
+        (200, 88, 5),  # includes the north pole
+        (100, 10, 0.01),
+        (100, 10, 60),
+    ],
+)
+def test_cone_search_agrees_with_brute_force(
+    center_ra: float, center_dec: float, radius: float
+) -> None:
+    """cone_search finds the same targets as a brute-force search."""
+    ra, dec = random_targets(20000)
+    ids = np.arange(len(ra))
+    index = SkyIndex.from_coordinates(ids, ra, dec)
+
+    found_ids, separations = index.cone_search(center_ra, center_dec, radius)
+
+    np.testing.assert_array_equal(
+        np.sort(found_ids), brute_force(ra, dec, center_ra, center_dec, radius)
+    )
+    assert np.all(np.diff(separations) >= 0)
+    assert np.all(separations <= radius)
+
+
+def test_nearest() -> None:
+    """nearest finds the nearest targets."""
+    ra, dec = random_targets(1000)
+    index = SkyIndex.from_coordinates(np.arange(len(ra)), ra, dec)
+
+    ids, separations = index.nearest(30, -40, count=5)
+
+    all_separations = angular_separation(unit_vectors(ra, dec), unit_vectors(30, -40))
+    np.testing.assert_array_equal(ids, np.argsort(all_separations)[:5])
+    np.testing.assert_allclose(separations, np.sort(all_separations)[:5])
+
+
+def test_updates() -> None:
+    """Targets can be added, moved and removed."""
+    index = SkyIndex.from_coordinates([1, 2, 3], [10, 10.1, 50], [0, 0, 0])
+    assert len(index) == 3
+
+    # move target 3 next to the others and add target 4
+    index.upsert([3, 4], [10.2, 10.3], [0, 0])
+    ids, _ = index.cone_search(10, 0, 1)
+    assert sorted(ids) == [1, 2, 3, 4]
+    assert len(index) == 4
+
+    # remove targets 1 and 4
+    index.remove([1, 4, 99])
+    ids, _ = index.cone_search(10, 0, 1)
+    assert sorted(ids) == [2, 3]
+    assert len(index) == 2
+
+    # the results don't change when the index is rebuilt
+    index.rebuild()
+    ids, _ = index.cone_search(10, 0, 1)
+    assert sorted(ids) == [2, 3]
+
+
+def test_large_updates_trigger_rebuild() -> None:
+    """The index is rebuilt when there are many updates."""
+    ra, dec = random_targets(2000)
+    index = SkyIndex.from_coordinates(np.arange(2000), ra, dec)
+
+    index.upsert(np.arange(2000, 3100), ra[:1100], dec[:1100])
+
+    assert len(index) == 3100
+    assert not index._delta
+    found_ids, _ = index.cone_search(ra[0], dec[0], 1e-6)
+    assert sorted(found_ids) == [0, 2000]
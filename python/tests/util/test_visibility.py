@@ -0,0 +1,136 @@
+import datetime
+import pathlib
+
+import numpy as np
+import pytest
+
+from app.util.visibility import (
+    MAX_ALTITUDE,
+    MIN_ALTITUDE,
+    NO_WINDOW,
+    VisibilityCache,
+    _julian_dates,
+    altitude,
+    compute_windows,
+    dark_time,
+    local_sidereal_time,
+    night_start,
+)
+
+FIRST_NIGHT = datetime.date(2021, 5, 1)
+
+
+def target_altitude(ra: float, dec: float, time: datetime.datetime) -> float:
+    minutes = np.array([(time - night_start(time.date())).total_seconds() / 60])
+    lst = local_sidereal_time(_julian_dates(night_start(time.date()), minutes))
+    return float(altitude(ra, dec, lst)[0])
+
+
+def test_local_sidereal_time() -> None:
+    """local_sidereal_time agrees with a reference value."""
+    # GMST at 2021-05-01 00:00 UTC is 14h 36m 35.6s
+    julian_date = np.array([2459335.5])
+    expected = (15 * (14 + 36 / 60 + 35.6 / 3600) + 20.8107) % 360
+    assert abs(local_sidereal_time(julian_date)[0] - expected) < 0.01
+
+
+@pytest.mark.parametrize("ra,dec", [(200, -32), (150, -60), (250, 0), (300, -70)])
+def test_windows_are_within_salt_altitude_range(ra: float, dec: float) -> None:
+    """Targets are within SALT's altitude range during their visibility windows."""
+    windows = compute_windows([ra], [dec], FIRST_NIGHT, 3)
+
+    found_window = False
+    for night in range(3):
+        start = night_start(FIRST_NIGHT + datetime.timedelta(days=night))
+        for window_start, window_end in windows[0, night]:
+            if window_start == NO_WINDOW:
+                continue
+            found_window = True
+            assert window_start < window_end
+            middle = start + datetime.timedelta(
+                minutes=(int(window_start) + int(window_end)) / 2
+            )
+            assert MIN_ALTITUDE <= target_altitude(ra, dec, middle) <= MAX_ALTITUDE
+    assert found_window
+
+
+def test_zenith_targets_have_two_windows() -> None:
+    """A target passing through the zenith is visible twice per night."""
+    # in May, an RA of 14h transits around midnight
+    windows = compute_windows([210], [-32.4], FIRST_NIGHT, 1)
+
+    assert np.all(windows[0, 0] != NO_WINDOW)
+
+
+def test_northern_targets_are_never_visible() -> None:
+    """A target too far north is never visible."""
+    windows = compute_windows([210], [40], FIRST_NIGHT, 5)
+
+    assert np.all(windows == NO_WINDOW)
+
+
+def test_windows_agree_with_time_grid() -> None:
+    """The computed windows agree with altitudes computed on a time grid."""
+    rng = np.random.default_rng(1)
+    ra = 360 * rng.random(200)
+    dec = -90 + 100 * rng.random(200)
+
+    windows = compute_windows(ra, dec, FIRST_NIGHT, 1)[:, 0]
+
+    dusk, dawn = dark_time(FIRST_NIGHT)
+    minutes = np.arange(dusk, dawn, dtype=np.float64) + 0.5
+    lst = local_sidereal_time(_julian_dates(night_start(FIRST_NIGHT), minutes))
+    altitudes = altitude(ra[:, np.newaxis], dec[:, np.newaxis], lst)
+    visible = (altitudes >= MIN_ALTITUDE) & (altitudes <= MAX_ALTITUDE)
+    for i in range(len(ra)):
+        in_window = np.zeros(len(minutes), dtype=bool)
+        for start, end in windows[i]:
+            if start != NO_WINDOW:
+                in_window |= (minutes >= start) & (minutes < end)
+        # allow for rounding to the nearest minute at the window edges
+        assert np.sum(in_window != visible[i]) <= 4
+
+
+def test_visibility_cache(tmp_path: pathlib.Path) -> None:
+    """VisibilityCache stores windows and recomputes them only when necessary."""
+    cache = VisibilityCache(tmp_path, FIRST_NIGHT, 3)
+    assert cache.update([1, 2, 3], [210, 150, 210], [-32.4, -60, 40]) == 3
+    assert cache.update([1, 2, 3], [210, 150, 210], [-32.4, -60, 40]) == 0
+
+    windows = cache.windows(1, FIRST_NIGHT)
+    assert windows is not None and len(windows) == 2
+    assert cache.windows(3, FIRST_NIGHT) == []
+    assert cache.windows(4, FIRST_NIGHT) is None
+    assert cache.windows(1, FIRST_NIGHT + datetime.timedelta(days=3)) is None
+
+    # the cache is persisted
+    cache = VisibilityCache(tmp_path, FIRST_NIGHT, 3)
+    assert cache.windows(1, FIRST_NIGHT) == windows
+
+    # only new and changed targets are recomputed, and removed targets are dropped
+    assert cache.update([1, 3, 4], [210, 200, 100], [-32.4, -40, -75]) == 2
+    assert cache.windows(1, FIRST_NIGHT) == windows
+    assert cache.windows(2, FIRST_NIGHT) is None
+    assert cache.windows(3, FIRST_NIGHT) != []
+
+    minutes = cache.visible_minutes(FIRST_NIGHT)
+    assert set(minutes.keys()) == {1, 3, 4}
+    assert minutes[1] == sum((end - start).seconds // 60 for start, end in windows)
+
+    # a cache for a different semester ignores the existing files
+    cache = VisibilityCache(tmp_path, datetime.date(2021, 11, 1), 3)
+    assert cache.windows(1, datetime.date(2021, 11, 1)) is None
+
+
+def test_visibility_cache_is_refreshed(tmp_path: pathlib.Path) -> None:
+    """A cache reloads the windows saved by another process."""
+    reader = VisibilityCache(tmp_path, FIRST_NIGHT, 3)
+    assert not reader.refresh()
+
+    writer = VisibilityCache(tmp_path, FIRST_NIGHT, 3)
+    writer.update([1], [210], [-32.4])
+    assert reader.windows(1, FIRST_NIGHT) is None
+
+    assert reader.refresh()
+    assert reader.windows(1, FIRST_NIGHT) == writer.windows(1, FIRST_NIGHT)
+    assert not reader.refresh()